@@ -19,7 +19,6 @@
 import re
 from datetime import datetime, timedelta, timezone
 from io import BytesIO
-import asyncio
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from main import Bot
@@ -29,7 +28,8 @@ from nextcord.ext import commands
 
 from config import *
 from utils.logger import Logger as log
-from utils.statistics import create_graph_async, create_stats_embed
+from utils.render_cache import render_key
+from utils.statistics import create_stats_embed
 
 
 class Advanced(commands.Cog):
@@ -48,16 +48,11 @@ class Advanced(commands.Cog):
         if user is None:
             user = interaction.user
 
-        summary_stats = await self.bot.store.get_user_summary_stats(interaction.guild.id, user.id)
-        if not summary_stats:
+        rollup, ranking, ranks = await self.bot.stats_rollups.get(interaction.guild, user.id)
+        if not rollup:
             return await interaction.response.send_message(f"No stats found for {user.mention}.", ephemeral=True)
 
-        recent_matches = await self.bot.store.get_recent_match_stats(interaction.guild.id, user.id, 10)
-        avg_stats = await self.bot.store.get_avg_stats_last_n_games(interaction.guild.id, user.id, 10)
-        leaderboard = await self.bot.store.get_leaderboard(interaction.guild.id)
-        ranks = await self.bot.store.get_ranks(interaction.guild.id)
-        user_data = await self.bot.store.get_user(interaction.guild.id, user.id)
-        embed = create_stats_embed(interaction.guild, user, user_data, leaderboard, summary_stats, avg_stats, recent_matches, ranks)
+        embed = create_stats_embed(interaction.guild, user, rollup.user, ranking, rollup.summary, rollup.avg_stats, rollup.recent, ranks)
 
         await interaction.response.send_message(
             embed=embed, ephemeral=interaction.channel.id != settings.mm_text_channel)
@@ -93,43 +88,48 @@ class Advanced(commands.Cog):
         await interaction.response.defer(ephemeral=ephemeral)
         user = user or interaction.user
 
-        # Parse the period
-        if period.endswith('g'):
-            game_limit = int(period[:-1])
-            match_stats = await self.bot.store.get_last_n_match_stats(interaction.guild.id, user.id, game_limit)
-        else:
-            period_match = re.match(r"(?:(\d+)y)?(?:(\d+)m)?(?:(\d+)d)?(?:(\d+)h)?", period)
-            if not period_match:
-                return await interaction.followup.send("Invalid period format. Use 0y0m0d0h (e.g., 1y6m for 1 year and 6 months) or Ng (e.g., 50g for last 50 games).", ephemeral=True)
-
-            years, months, days, hours = map(lambda x: int(x) if x else 0, period_match.groups())
-            start_date = datetime.now(timezone.utc) - timedelta(days=years*365 + months*30 + days, hours=hours)
-            end_date = datetime.now(timezone.utc)
-            match_stats = await self.bot.store.get_match_stats_in_period(interaction.guild.id, user.id, start_date, end_date)
-
-        if not match_stats:
-            return await interaction.followup.send(f"No data found for {user.mention} in the specified period `{period}`.", ephemeral=True)
-
-        ranks = None
-        if graph_type == "mmr_game":
-            ranks = await self.bot.store.get_ranks(interaction.guild.id)
-            ranks = { (r.name, r.color): rank for rank in ranks if (r := interaction.guild.get_role(rank.role_id)) }
-        
-        preferences = None
-        if graph_type == "pick_preferences":
-            preferences = await self.bot.store.get_user_pick_preferences(interaction.guild.id, user.id)
+        summary_stats = await self.bot.store.get_user_summary_stats(interaction.guild.id, user.id)
+        last_match_id = summary_stats.last_match_id if summary_stats else None
+        window = period if period.endswith('g') else (period, datetime.now(timezone.utc).date())
+        key = render_key("graph", graph_type, interaction.guild.id, user.id, window, last_match_id)
+        image = self.bot.render_cache.get(key) if last_match_id else None
+
+        if image is None:
+            # Parse the period
+            if period.endswith('g'):
+                game_limit = int(period[:-1])
+                match_stats = await self.bot.store.get_last_n_match_stats(interaction.guild.id, user.id, game_limit)
+            else:
+                period_match = re.match(r"(?:(\d+)y)?(?:(\d+)m)?(?:(\d+)d)?(?:(\d+)h)?", period)
+                if not period_match:
+                    return await interaction.followup.send("Invalid period format. Use 0y0m0d0h (e.g., 1y6m for 1 year and 6 months) or Ng (e.g., 50g for last 50 games).", ephemeral=True)
+
+                years, months, days, hours = map(lambda x: int(x) if x else 0, period_match.groups())
+                start_date = datetime.now(timezone.utc) - timedelta(days=years*365 + months*30 + days, hours=hours)
+                end_date = datetime.now(timezone.utc)
+                match_stats = await self.bot.store.get_match_stats_in_period(interaction.guild.id, user.id, start_date, end_date)
+
+            if not match_stats:
+                return await interaction.followup.send(f"No data found for {user.mention} in the specified period `{period}`.", ephemeral=True)
+
+            ranks = None
+            if graph_type == "mmr_game":
+                ranks = await self.bot.store.get_ranks(interaction.guild.id)
+                ranks = { (r.name, r.color): rank for rank in ranks if (r := interaction.guild.get_role(rank.role_id)) }
         
-        region = None
-        play_periods = None
-        if graph_type == "activity_hours":
-            region = (await self.bot.store.get_user(interaction.guild.id, user.id)).region
-            play_periods = await self.bot.store.get_player_play_periods(interaction.guild.id, user.id)
-        fig = await create_graph_async(asyncio.get_event_loop(), graph_type, match_stats, ranks, preferences, play_periods, region)
+            preferences = None
+            if graph_type == "pick_preferences":
+                preferences = await self.bot.store.get_user_pick_preferences(interaction.guild.id, user.id)
         
-        # Save the plot to a BytesIO object
-        img_bytes = BytesIO()
-        fig.write_image(img_bytes, format="png", scale=2)
-        img_bytes.seek(0)
+            region = None
+            play_periods = None
+            if graph_type == "activity_hours":
+                region = (await self.bot.store.get_user(interaction.guild.id, user.id)).region
+                play_periods = await self.bot.store.get_player_play_periods(interaction.guild.id, user.id)
+            image = await self.bot.graph_renderer.render(graph_type, match_stats, ranks, preferences, play_periods, region)
+            if last_match_id:
+                self.bot.render_cache.set(key, image, [(interaction.guild.id, user.id)])
+        img_bytes = BytesIO(image)
 
         # Create a Discord file from the BytesIO object
         file = nextcord.File(img_bytes, filename="graph.png")
@@ -33,6 +33,8 @@ from matches import cleanup_match, get_match, load_ongoing_matches
 from matches.functions import calculate_mmr_change
 from utils.logger import Logger as log
 from utils.models import BotSettings, Team
+from utils.message_scheduler import Lane
+from utils.render_cache import score_image_key
 from utils.utils import abandon_cooldown, format_duration, generate_score_image, log_moderation
 from views.match.abandon import AbandonView
 from views.match.accept import AcceptView
@@ -116,11 +118,10 @@ class Matches(commands.Cog):
         scores_channel = interaction.guild.get_channel(settings.mm_log_channel)
         if not scores_channel: return
         if match.log_message:
-            scores_message = await scores_channel.fetch_message(match.log_message)
-            if not scores_message: return
-        embed = scores_message.embeds[0]
-        embed.description = "Match canceled"
-        await scores_message.edit(embed=embed)
+            embed = (await self.bot.messages.embeds(scores_channel, match.log_message))[0]
+            embed.description = "Match canceled"
+            self.bot.messages.edit(scores_channel, match.log_message, Lane.CRITICAL, embed=embed)
+            self.bot.messages.forget(match.log_message)
 
         await log_moderation(interaction, settings.log_channel, f"Match canceled #{match_id}")
     
@@ -170,7 +171,9 @@ _You will have a cooldown of `{format_duration(cooldown)}` and lose `{str(mmr_lo
             return await interaction.followup.send("No stats found for the last match.", ephemeral=True)
 
         try:
-            leaderboard_image = await generate_score_image(self.bot.cache, interaction.guild, last_match, match_stats)
+            leaderboard_image = await self.bot.render_cache.cached(
+                score_image_key(last_match.id, match_stats),
+                lambda: generate_score_image(self.bot.avatars, interaction.guild, last_match, match_stats))
             file = nextcord.File(BytesIO(leaderboard_image), filename=f"Match_{last_match.id}_leaderboard.png")
             await interaction.followup.send(ephemeral=ephemeral, file=file)
 
@@ -185,6 +188,7 @@ _You will have a cooldown of `{format_duration(cooldown)}` and lose `{str(mmr_lo
         if cooldown == 0:
             return await interaction.response.send_message("This user is not currently in cooldown", ephemeral=True)
         await self.bot.store.ignore_abandon(interaction.guild.id, user.id)
+        self.bot.queue_manager.invalidate_user(user.id)
         log.debug(f"{interaction.user.display_name} revoked {user.display_name}'s abandon")
         await interaction.response.send_message(f"{user.mention} had their cooldown revoked successfully.", ephemeral=True)
 
@@ -261,6 +265,26 @@ _You will have a cooldown of `{format_duration(cooldown)}` and lose `{str(mmr_lo
 
         await log_moderation(interaction, settings.log_channel, "Map options changed", f"{size}")
     
+    @mm_settings.subcommand(name="team_weights", description="Set how teams are balanced")
+    async def set_team_weights(self, interaction: nextcord.Interaction, 
+        mmr: float=nextcord.SlashOption(min_value=0, max_value=100, required=False, description="Weight per MMR of team average difference"), 
+        variance: float=nextcord.SlashOption(min_value=0, max_value=100, required=False, description="Weight per MMR of team spread difference"), 
+        rtt: float=nextcord.SlashOption(min_value=0, max_value=100, required=False, description="Weight per ms of team average latency difference"), 
+        repeat: float=nextcord.SlashOption(min_value=0, max_value=100, required=False, description="Weight per recent repeat teammate")):
+        weights = { 
+            f"mm_team_{k}_weight": v for k, v in 
+            { "mmr": mmr, "variance": variance, "rtt": rtt, "repeat": repeat }.items() if v is not None }
+        settings = await self.bot.settings_cache(guild_id=interaction.guild.id, **weights)
+        summary = '\n'.join((
+            f"MMR: {settings.mm_team_mmr_weight}",
+            f"Variance: {settings.mm_team_variance_weight}",
+            f"RTT: {settings.mm_team_rtt_weight}",
+            f"Repeat teammates: {settings.mm_team_repeat_weight}"))
+        log.info(f"{interaction.user.display_name} set the team weights to: {summary}")
+        await interaction.response.send_message(f"Team weights set to\n```\n{summary}```", ephemeral=True)
+
+        await log_moderation(interaction, settings.log_channel, "Team weights changed", f"```\n{summary}```")
+    
     @mm_settings.subcommand(name="set_maps", description="Choose what maps go into the match making pool")
     async def set_map_pool(self, interaction: nextcord.Interaction, 
         maps: nextcord.Attachment=nextcord.SlashOption(description="Json string for map name and image url (ordered)")):
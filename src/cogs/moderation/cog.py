@@ -91,6 +91,7 @@ class Moderation(commands.Cog):
             description = "Updated "
         
         await self.bot.store.set_user_block(interaction.guild.id, user.id, expiration, reason, interaction.user.id)
+        self.bot.queue_manager.set_block(user.id, expiration)
         self.bot.queue_manager.remove_user(user.id)
         await self.bot.store.unqueue_user_guild(interaction.guild.id, user.id)
         settings = await self.bot.settings_cache(interaction.guild.id)
@@ -116,6 +117,7 @@ class Moderation(commands.Cog):
         
         expiration = datetime.now(timezone.utc)
         await self.bot.store.set_user_block(interaction.guild.id, user.id, expiration)
+        self.bot.queue_manager.set_block(user.id, expiration)
 
         log.info(f"{interaction.user.display_name} unblocked {user.display_name} from queue")
         await interaction.response.send_message(f"{user.mention} unblocked successfully.", ephemeral=True)
@@ -415,10 +417,7 @@ class Moderation(commands.Cog):
 
         await user.remove_roles(mute_role)
         await self.bot.store.update_mute(guild_id=interaction.guild_id, user_id=user.id, active=False)
-        self.mute_manager.active_mutes.pop(user.id, None)
-        if user.id in self.mute_manager.tasks:
-            self.mute_manager.tasks[user.id].cancel()
-            self.mute_manager.tasks.pop(user.id, None)
+        self.mute_manager.cancel_unmute(user.id)
 
         if not silent:
             embed = nextcord.Embed(title="You have been unmuted", color=0xff5500)
@@ -509,22 +508,15 @@ class Moderation(commands.Cog):
                 if mute_role in user.roles:
                     await user.remove_roles(mute_role)
                 await self.bot.store.update_mute(guild_id=interaction.guild_id, user_id=user.id, active=False)
-            self.mute_manager.active_mutes.pop(user.id, None)
-            if user.id in self.mute_manager.tasks:
-                self.mute_manager.tasks[user.id].cancel()
-                self.mute_manager.tasks.pop(user.id, None)
+            self.mute_manager.cancel_unmute(mute.user_id)
         
         await self.bot.store.update_mute(mute_id=mute_id, **values)
         
-        if mute.user_id in self.mute_manager.tasks:
-            self.mute_manager.tasks[mute['user_id']].cancel()
-        
         if new_duration and new_duration_seconds and not delete:
             expiry = datetime.now(timezone.utc) + timedelta(seconds=new_duration_seconds)
             self.mute_manager.schedule_unmute(mute.user_id, expiry)
         else:
-            self.mute_manager.active_mutes.pop(mute.user_id, None)
-            self.mute_manager.tasks.pop(mute.user_id, None)
+            self.mute_manager.cancel_unmute(mute.user_id)
 
         await interaction.response.send_message(f"Mute updated.\n{'\n'.join(f'{k.capitalize()}: {str(v)}' for k, v in values.items())}", ephemeral=True)
         await log_moderation(interaction, settings.log_channel, f"Mute Edited #{mute.id}", f"<@{mute.user_id}>\n{'\n'.join(f'{k.capitalize()}: {str(v)}' for k, v in values.items())}")
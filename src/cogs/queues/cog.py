@@ -30,7 +30,9 @@ from nextcord.ext import commands
 
 from config import *
 from utils.logger import Logger as log
-from utils.statistics import create_graph_async, create_stats_embed
+from utils.message_scheduler import Lane
+from utils.render_cache import render_key
+from utils.statistics import create_stats_embed
 from utils.utils import format_duration, create_queue_embed, log_moderation
 from views.queue.buttons import QueueButtonsView
 
@@ -71,16 +73,12 @@ class Queues(commands.Cog):
             return await interaction.response.send_message(f"`{user}` was not found as a queued user.", ephemeral=True)
         
         settings = await self.bot.settings_cache(interaction.guild.id)
-        await self.bot.store.unqueue_user(settings.mm_queue_channel, user_id)
-        self.bot.queue_manager.remove_user(user_id)
+        self.bot.queue_manager.unqueue_user(settings.mm_queue_channel, user_id)
         log.info(f"{user_id} was manually removed from queue")
 
-        queue_users = await self.bot.store.get_queue_users(interaction.channel.id)
+        queue_users = self.bot.queue_manager.queued_users(settings.mm_queue_channel)
         asyncio.create_task(self.bot.queue_manager.update_presence(len(queue_users)))
-        embed = create_queue_embed(queue_users)
-        channel = interaction.guild.get_channel(settings.mm_queue_channel)
-        message = await channel.fetch_message(settings.mm_queue_message)
-        await message.edit(embeds=[message.embeds[0], embed])
+        await self.bot.queue_manager.refresh_queue_message(settings, queue_users, Lane.CRITICAL)
 
         await interaction.response.send_message(f"<@{user_id}> was manually removed from queue", ephemeral=True)
 
@@ -151,16 +149,11 @@ class Queues(commands.Cog):
         settings = await self.bot.settings_cache(interaction.guild.id)
         user = user or interaction.user
 
-        summary_stats = await self.bot.store.get_user_summary_stats(interaction.guild.id, user.id)
-        if not summary_stats:
+        rollup, ranking, ranks = await self.bot.stats_rollups.get(interaction.guild, user.id)
+        if not rollup:
             return await interaction.response.send_message(f"No stats found for {user.mention}.", ephemeral=True)
 
-        recent_matches = await self.bot.store.get_recent_match_stats(interaction.guild.id, user.id, 10)
-        avg_stats = await self.bot.store.get_avg_stats_last_n_games(interaction.guild.id, user.id, 10)
-        leaderboard = await self.bot.store.get_leaderboard(interaction.guild.id)
-        ranks = await self.bot.store.get_ranks(interaction.guild.id)
-        user_data = await self.bot.store.get_user(interaction.guild.id, user.id)
-        embed = create_stats_embed(interaction.guild, user, user_data, leaderboard, summary_stats, avg_stats, recent_matches, ranks)
+        embed = create_stats_embed(interaction.guild, user, rollup.user, ranking, rollup.summary, rollup.avg_stats, rollup.recent, ranks)
 
         await interaction.response.send_message(
             embed=embed, ephemeral=interaction.channel.id != settings.mm_text_channel)
@@ -191,19 +184,23 @@ class Queues(commands.Cog):
         
         user = interaction.user
 
-        match_stats = await self.bot.store.get_last_n_match_stats(interaction.guild.id, user.id, 50)
+        summary_stats = await self.bot.store.get_user_summary_stats(interaction.guild.id, user.id)
+        last_match_id = summary_stats.last_match_id if summary_stats else None
+        key = render_key("graph", graph_type, interaction.guild.id, user.id, "50g", last_match_id)
+        image = self.bot.render_cache.get(key) if last_match_id else None
 
-        if not match_stats:
-            return await interaction.response.send_message(f"No data found for {user.mention}.", ephemeral=True)
+        if image is None:
+            match_stats = await self.bot.store.get_last_n_match_stats(interaction.guild.id, user.id, 50)
 
-        ranks = await self.bot.store.get_ranks(interaction.guild.id)
-        ranks = { (r.name, r.color): rank for rank in ranks if (r := interaction.guild.get_role(rank.role_id)) }
-        fig = await create_graph_async(asyncio.get_event_loop(), graph_type, match_stats, ranks)
-        
-        # Save the plot to a BytesIO object
-        img_bytes = BytesIO()
-        fig.write_image(img_bytes, format="png", scale=2)
-        img_bytes.seek(0)
+            if not match_stats:
+                return await interaction.response.send_message(f"No data found for {user.mention}.", ephemeral=True)
+
+            ranks = await self.bot.store.get_ranks(interaction.guild.id)
+            ranks = { (r.name, r.color): rank for rank in ranks if (r := interaction.guild.get_role(rank.role_id)) }
+            image = await self.bot.graph_renderer.render(graph_type, match_stats, ranks)
+            if last_match_id:
+                self.bot.render_cache.set(key, image, [(interaction.guild.id, user.id)])
+        img_bytes = BytesIO(image)
 
         # Create a Discord file from the BytesIO object
         file = nextcord.File(img_bytes, filename="graph.png")
@@ -307,6 +304,7 @@ class Queues(commands.Cog):
                 f"Failed...\nSet queue periods with {await self.bot.command_cache.get_command_mention(interaction.guild.id, 'queue settings set_queue_periods')}", ephemeral=True)
 
         msg = await self.send_queue_buttons(interaction)
+        self.bot.messages.remember(msg)
         await self.bot.settings_cache(guild_id=interaction.guild.id, mm_queue_message=msg.id, mm_queue_channel=interaction.channel.id)
         await interaction.response.send_message(f"Queue channel set!", ephemeral=True)
         await log_moderation(interaction, settings.log_channel, "Queue buttons set", f"In <#{interaction.channel.id}>")
@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import asyncio
 import json
 from io import BytesIO
 
@@ -30,8 +31,8 @@ from nextcord.ext import commands
 
 from config import *
 from utils.logger import Logger as log
+from matches.server_selection import solve_coordinates
 from utils.models import BotRegions, MMBotRanks, Platform, MMBotUsers, MMBotUserSummaryStats
-from utils.statistics import update_leaderboard
 from views.register import RegistryButtonView
 from utils.utils import log_moderation
 
@@ -169,6 +170,7 @@ class Settings(commands.Cog):
         removed_labels = {region.label for region in existing_regions} - set(regions_data.keys())
         for label in removed_labels:
             await self.bot.store.null_user_region(guild_id, label)
+            self.bot.queue_manager.invalidate_user()
             await self.bot.store.remove(BotRegions, guild_id=guild_id, label=label)
         
         for n, region in enumerate(new_regions):
@@ -257,6 +259,43 @@ class Settings(commands.Cog):
         matched_serveraddrs = [match[0] for match in matches]
         return matched_serveraddrs
     
+    @settings.subcommand(name="server_health", description="Show rcon connection state and command latencies")
+    async def server_health(self, interaction: nextcord.Interaction):
+        servers = self.bot.rcon_manager.servers
+        if not servers:
+            return await interaction.response.send_message("No rcon servers are connected", ephemeral=True)
+        lines = []
+        for addr, server in servers.items():
+            lines.append(f"{addr} {server.state.name} failures:{server.failures}")
+            for command, stats in sorted(server.latency_percentiles().items()):
+                lines.append(f"  {command:<20} p50 {stats['p50']:7.1f}ms  p90 {stats['p90']:7.1f}ms  p99 {stats['p99']:7.1f}ms  n={stats['count']:.0f}")
+        body = '\n'.join(lines)[:1900]
+        await interaction.response.send_message(f"```\n{body}```", ephemeral=True)
+    
+    @settings.subcommand(name="solve_coordinates", description="Refit all player and server coordinates from match ping history")
+    async def solve_coordinates(self, interaction: nextcord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        observations = await self.bot.store.get_ping_observations(interaction.guild.id)
+        if not observations:
+            return await interaction.followup.send("No ping history to solve from", ephemeral=True)
+        regions = await self.bot.store.get_regions(interaction.guild.id)
+        users = await self.bot.store.get_users(interaction.guild.id)
+        servers = await self.bot.store.get_servers()
+        user_coords, server_coords, rms = await asyncio.to_thread(
+            solve_coordinates, regions, users, servers, observations)
+        await self.bot.store.set_network_coords(interaction.guild.id, user_coords, server_coords)
+        log.info(f"Coordinates solved for {len(user_coords)} users and {len(server_coords)} servers from {len(observations)} pings, rms {rms:.1f}ms")
+        await interaction.followup.send(
+            f"Refreshed coordinates for `{len(user_coords)}` players and `{len(server_coords)}` servers from `{len(observations)}` pings\nRMS error `{rms:.1f}ms`", ephemeral=True)
+    
+    @settings.subcommand(name="backfill_last_match", description="Rebuild every player's latest match snapshot from match history")
+    async def backfill_last_match(self, interaction: nextcord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        count = await self.bot.store.backfill_last_match(interaction.guild.id)
+        self.bot.leaderboard.invalidate(interaction.guild.id)
+        log.info(f"{interaction.user.display_name} backfilled latest match snapshots for {count} players")
+        await interaction.followup.send(f"Latest match snapshot rebuilt for `{count}` players", ephemeral=True)
+    
     @settings.subcommand(name="get_ranks", description="Get the current MMR ranks")
     async def get_ranks(self, interaction: nextcord.Interaction):
         ranks = await self.bot.store.get_ranks(interaction.guild.id)
@@ -294,6 +333,8 @@ class Settings(commands.Cog):
         
         await self.bot.store.remove(MMBotRanks, guild_id=interaction.guild.id)
         await self.bot.store.set_ranks(interaction.guild.id, ranks)
+        self.bot.stats_rollups.invalidate(interaction.guild.id)
+        self.bot.render_cache.clear()
         log.debug(f"{interaction.user.display_name} set ranks to:")
         log.pretty(ranks)
 
@@ -306,7 +347,7 @@ class Settings(commands.Cog):
     async def set_leaderboard(self, interaction: nextcord.Interaction):
         await interaction.response.defer(ephemeral=True)
         settings = await self.bot.settings_cache(guild_id=interaction.guild.id, leaderboard_channel=interaction.channel.id)
-        await update_leaderboard(self.bot.store, interaction.guild)
+        await self.bot.leaderboard.refresh(interaction.guild)
         await interaction.followup.send(
             f"Match Making Leaderboard set", ephemeral=True)
         await log_moderation(interaction, settings.log_channel, "Leaderboard channel set", f"<#{interaction.channel.id}>")
@@ -350,6 +391,8 @@ class Settings(commands.Cog):
         new_mmr = max(0, new_mmr)
 
         await self.bot.store.update(MMBotUserSummaryStats, guild_id=interaction.guild.id, user_id=user.id, mmr=new_mmr)
+        self.bot.leaderboard.apply(interaction.guild.id, { user.id: { 'mmr': new_mmr } })
+        self.bot.stats_rollups.update_summaries(interaction.guild.id, { user.id: { 'mmr': new_mmr } })
 
         await interaction.response.send_message(
             f"Match Making Rating for {user.mention} {action} `{new_mmr}`. Previous MMR was `{old_mmr}`.", ephemeral=True)
@@ -385,6 +428,7 @@ class Settings(commands.Cog):
                 user_id=user.id,
                 platform=platform_enum,
                 platform_id=platform_id)
+            self.bot.queue_manager.invalidate_user(user.id)
             await self.bot.store.upsert(MMBotUserSummaryStats,
                 guild_id=interaction.guild.id,
                 user_id=user.id)
@@ -431,6 +475,9 @@ class Settings(commands.Cog):
         settings = await self.bot.settings_cache(interaction.guild.id)
         try:
             await self.bot.store.transfer_user(interaction.guild.id, int(old_user_id), int(new_user_id))
+            self.bot.leaderboard.invalidate(interaction.guild.id)
+            self.bot.stats_rollups.invalidate(interaction.guild.id)
+            self.bot.render_cache.invalidate_users(interaction.guild.id, [int(old_user_id), int(new_user_id)])
         except Exception as e:
             await log_moderation(interaction, settings.log_channel, "User data transfer", f"User <@{old_user_id}> FAILED to move to <@{new_user_id}>.")
             return await interaction.response.send_message(f"There was a failure in the transfer:\n{repr(e)}", ephemeral=True)
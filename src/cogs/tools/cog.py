@@ -77,6 +77,7 @@ class ModCommands(commands.Cog):
         message: str = nextcord.SlashOption(description="The message to display", max_length=512)
     ):
         await self.bot.store.update(MMBotUsers, guild_id=interaction.guild.id, user_id=user.id, role_message=message)
+        self.bot.stats_rollups.invalidate(interaction.guild.id, [user.id])
         await interaction.response.send_message(f"{user.mention}'s role message was set to:\n{message}", ephemeral=True)            
         settings = await self.bot.settings_cache(interaction.guild.id)
         await log_moderation(interaction, settings.log_channel, f"Role Status Set", f"{user.mention}'s role message changed to:\n```\n{message}```")
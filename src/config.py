@@ -50,6 +50,20 @@ BASE_MMR_CHANGE = 40
 MOMENTUM_CHANGE = 0.025
 MOMENTUM_RESET_FACTOR = 0.25
 PLACEMENT_MATCHES = 10
+MATCH_STATS_FLUSH_INTERVAL = 15
+QUEUE_ELIGIBILITY_TTL = 300
+SERVER_CHOICE_REFRESH = 60
+SERVER_PREWARM_COUNT = 2
+GRAPH_RENDER_WORKERS = 2
+RENDER_CACHE_MAX_ENTRIES = 500
+RENDER_CACHE_TTL = 86400
+AVATAR_CACHE_TTL = 86400
+AVATAR_MEMORY_ENTRIES = 256
+OUTBOX_BUCKET_SIZE = 5
+OUTBOX_BUCKET_PERIOD = 5.0
+OUTBOX_CRITICAL_RESERVE = 1
+PROVISION_CONCURRENCY = 4
+MATCH_SNAPSHOT_TTL = 604800
 
 REGION_TIMEZONES = {
     "EUW": "Europe/London",        # Western Europe
@@ -28,10 +28,22 @@ from nextcord.ext import commands
 from config import *
 from utils.database import Database
 from utils.queuemanager import QueueManager
+from matches.provisioning import MatchProvisioner
+from matches.state_machine import close_phase_windows
+from utils.timers import TimerScheduler
 from utils.pavlov import RCONManager
+from utils.rcon_poller import RCONPollScheduler
+from utils.server_choice import ServerChoiceCache
 from utils.command_ids import CommandCache
+from utils.leaderboard import LeaderboardEngine
+from utils.stats_rollup import StatsRollupCache
+from utils.graph_renderer import GraphRenderer
+from utils.render_cache import RenderCache
+from utils.avatars import AvatarService
 from utils.settings import SettingsCache
 from utils.edit_debounce import DebounceInterMsg
+from utils.message_scheduler import MessageScheduler
+from utils.message_registry import MessageRegistry
 
 def exit_cleanup(a: list):
     for b in a:
@@ -44,14 +56,33 @@ class Bot(commands.Bot):
 
         self.store: Database                = Database()
         self.cache: redis.StrictRedis       = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        self.render_cache: RenderCache      = RenderCache(self.cache)
+        self.avatars: AvatarService         = AvatarService()
+        self.timers: TimerScheduler         = TimerScheduler(self)
+        self.timers.register("match_phase", close_phase_windows)
         self.queue_manager: QueueManager    = QueueManager(self)
         self.rcon_manager: RCONManager      = RCONManager(self)
+        self.rcon_poller: RCONPollScheduler = RCONPollScheduler(self)
+        self.provisioner: MatchProvisioner  = MatchProvisioner(self)
+        self.server_choices: ServerChoiceCache = ServerChoiceCache(self)
         self.command_cache: CommandCache    = CommandCache(self)
         self.settings_cache: SettingsCache  = SettingsCache(self)
+        self.leaderboard: LeaderboardEngine = LeaderboardEngine(self)
+        self.stats_rollups: StatsRollupCache = StatsRollupCache(self)
+        self.graph_renderer: GraphRenderer  = GraphRenderer()
+        self.graph_renderer.start()
         self.debounce: DebounceInterMsg     = DebounceInterMsg()
+        self.outbox: MessageScheduler       = MessageScheduler()
+        self.messages: MessageRegistry      = MessageRegistry(self.outbox)
 
         self.match_stages = {}
     
+    async def close(self):
+        await self.avatars.close()
+        await self.timers.close()
+        self.graph_renderer.shutdown()
+        await super().close()
+    
     def __del__(self):
         del self.store
 
@@ -21,6 +21,7 @@ from typing import Optional
 
 from .match import Match
 from .match_states import MatchState
+from .snapshot import MatchSnapshot
 
 active_matches = {}
 running_matches = {}
@@ -40,8 +41,9 @@ def make_match(loop, bot, guild_id, match_id):
     running_matches[match.match_id] = task
 
 def load_ongoing_matches(loop, bot, guild_id, matches):
+    snapshots = MatchSnapshot.load_many(bot.cache, [match.id for match in matches])
     for match in matches:
-        match = Match(bot, guild_id, match.id, match.state)
+        match = Match(bot, guild_id, match.id, match.state, snapshots.get(match.id))
         task = loop.create_task(match.run())
         task.add_done_callback(_on_match_done(match.match_id))
 
@@ -42,8 +42,10 @@ from config import (
 )
 from utils.logger import Logger as log
 from utils.models import *
-from utils.utils import format_duration, format_mm_attendance, generate_score_image, generate_score_text, create_queue_embed, get_rank_role
-from utils.statistics import update_leaderboard
+from utils.utils import format_duration, format_mm_attendance, generate_score_image, generate_score_text, get_rank_role
+from utils.message_scheduler import Lane
+from utils.render_cache import score_image_key
+from utils.stats_buffer import MatchStatsBuffer
 from views.match.accept import AcceptView
 from views.match.banning import BanView, ChosenBansView
 from views.match.map_pick import ChosenMapView, MapPickView
@@ -52,22 +54,26 @@ from views.match.no_server_found import NoServerFoundView
 from views.match.force_abandon import ForceAbandonView
 from .functions import calculate_mmr_change, get_preferred_bans, get_preferred_map, get_preferred_side, calculate_placements_mmr, update_momentum
 from .match_states import MatchState
-from .ranked_teams import get_teams
-from .server_selection import get_server_scores, update_coordinates
+from .snapshot import MatchSnapshot
+from .state_machine import MatchStateMachine, StateHandler, VOTING_PHASES
+from .ranked_teams import get_teams, team_weights_from_settings
+from .server_selection import score_servers, update_coordinates
 
 
 class Match:
-    def __init__(self, bot: 'Bot', guild_id: int, match_id: int, state: MatchState=MatchState.NOT_STARTED):
+    def __init__(self, bot: 'Bot', guild_id: int, match_id: int, state: MatchState=MatchState.NOT_STARTED, snapshot: MatchSnapshot | None=None):
         self.subtasks = set()
         self.bot: 'Bot'  = bot
         self.guild_id  = guild_id
         self.match_id  = match_id
-        self.state     = state
+        self.machine   = MatchStateMachine(bot, match_id, state)
 
         self.players: List[MMBotMatchPlayers] = []
         self.persistent_player_stats: Dict[int, Dict[str, Any]] = {}
         self.user_platform_map: Dict[int, List[str]] = {}
         self.current_round: int = -1
+        self.stats_buffer = MatchStatsBuffer(bot.store, guild_id, match_id)
+        self.snapshot = snapshot or MatchSnapshot(bot.cache, match_id)
 
     def compute_user_platform_map(self):
         self.user_platform_map = {
@@ -76,15 +82,17 @@ class Match:
         }
 
     async def wait_for_snd_mode(self):
-        while True:
-            await asyncio.sleep(3)
-            try:
-                reply = (await self.bot.rcon_manager.server_info(str(self.match.serveraddr)))['ServerInfo']
-                log.debug(f"WAITING FOR SND {reply}")
-                if reply['GameMode'] == 'SND' and reply['PlayerCount'][0] != '0':
-                    break
-            except Exception as e:
-                log.error(f"Error while waiting for SND mode: {str(e)}")
+        async with self.machine.rcon_events(self.bot.rcon_poller.subscribe(str(self.match.serveraddr), inspect=False)):
+            while True:
+                event = await self.machine.next_event()
+                if event.kind != "rcon": continue
+                try:
+                    reply = event.payload.server_info['ServerInfo']
+                    log.debug(f"WAITING FOR SND {reply}")
+                    if reply['GameMode'] == 'SND' and reply['PlayerCount'][0] != '0':
+                        break
+                except Exception as e:
+                    log.error(f"Error while waiting for SND mode: {str(e)}")
     
     async def show_no_server_found_message(self):
         embed = nextcord.Embed(
@@ -166,7 +174,12 @@ class Match:
                 await self.bot.rcon_manager.kick_player(cast(str, self.match.serveraddr), platform_id)
         
         if changed_users:
-            await self.bot.store.upsert_users_match_stats(self.guild_id, self.match_id, changed_users)
+            self.stats_buffer.add(changed_users)
+            self.snapshot.save_stats(changed_users)
+        if is_new_round:
+            self.snapshot.save(round=self.current_round)
+        if is_new_round or self.stats_buffer.due():
+            await self.stats_buffer.flush()
     
 
     async def ensure_correct_team(self, player, platform_id, player_data):
@@ -237,6 +250,7 @@ class Match:
         rank_ids = { r.role_id for r in ranks }
 
         played_games = await self.bot.store.get_users_played_games([user.user_id for user in self.players], self.guild_id)
+        self.snapshot.save(finalizing=True)
         for player in self.players:
             user_id = player.user_id
             if user_id not in self.persistent_player_stats:
@@ -306,8 +320,13 @@ class Match:
         self.match.b_score = team_b_score
         await self.bot.store.update(MMBotMatches, id=self.match_id, a_score=team_a_score, b_score=team_b_score)
 
-        await self.bot.store.upsert_users_match_stats(self.guild_id, self.match_id, final_updates)
+        self.stats_buffer.add(final_updates)
+        await self.stats_buffer.flush()
         await self.bot.store.set_users_summary_stats(self.guild_id, users_summary_stats)
+        self.bot.leaderboard.apply(self.guild_id, users_summary_stats, 
+            { user_id: users_summary_data[user_id].mmr for user_id in users_summary_stats })
+        self.bot.stats_rollups.record_match(self.guild_id, self.match_id, users_summary_stats, final_updates)
+        self.bot.render_cache.invalidate_users(self.guild_id, list(users_summary_stats))
 
         users_placement_summary = {}
         guild_avg_scores = sorted([stats['avg_score'] for stats in await self.bot.store.get_leaderboard(self.guild_id)])
@@ -319,6 +338,8 @@ class Match:
             log.info(f"User {member.id} has completed their placements and received {new_mmr - mmr} mmr from being at {mmr} mmr")
         if users_placement_summary:
             await self.bot.store.set_users_summary_stats(self.guild_id, users_placement_summary)
+            self.bot.leaderboard.apply(self.guild_id, users_placement_summary)
+            self.bot.stats_rollups.update_summaries(self.guild_id, users_placement_summary)
 
     async def update_network_latencies(self):
         try:
@@ -346,66 +367,58 @@ class Match:
         guild = self.bot.get_guild(cast(int, settings.guild_id))
         assert(isinstance(guild, nextcord.Guild))
 
-        queue_users = await self.bot.store.get_queue_users(settings.mm_queue_channel)
-        queue_players = sorted(queue_users, key=lambda user: user.timestamp, reverse=True)
+        queue_manager = self.bot.queue_manager
+        queue_channel = cast(int, settings.mm_queue_channel)
+        queue_users = queue_manager.queued_users(queue_channel)
+        queue_players = queue_users[::-1]
         
         total_users_and_players = len(queue_players) + len(self.requeue_players)
         players_to_requeue = max(0, total_users_and_players - MATCH_PLAYER_COUNT)
         requeue_after = queue_players[:players_to_requeue]
 
         for user in requeue_after:
-            self.bot.queue_manager.remove_user(user.user_id)
-            await self.bot.store.unqueue_user(settings.mm_queue_channel, user.user_id)
+            queue_manager.unqueue_user(queue_channel, user.user_id)
         
         durations_left = await self.bot.store.get_user_last_queue_time_remaining(
             guild.id, self.match_id, self.requeue_players)
         for player_id in self.requeue_players:
-            self.bot.queue_manager.add_user(player_id, int(datetime.now(timezone.utc).timestamp()) + durations_left[player_id] + 300)
-            await self.bot.store.upsert_queue_user(
-                    user_id=player_id, 
-                    guild_id=settings.guild_id, 
-                    queue_channel=settings.mm_queue_channel, 
-                    queue_expiry=int(datetime.now(timezone.utc).timestamp()) + durations_left[player_id] + 300)
+            queue_manager.queue_user(guild.id, queue_channel, player_id, 
+                int(datetime.now(timezone.utc).timestamp()) + durations_left[player_id] + 300)
             log.debug(f"{member.display_name if (member := guild.get_member(player_id)) else player_id} has auto queued up")
             
         if total_users_and_players >= MATCH_PLAYER_COUNT:
-            for user in queue_users: self.bot.queue_manager.remove_user(user.user_id)
-
-            match_id = await self.bot.store.unqueue_add_match_users(settings, settings.mm_queue_channel)
+            requeued_later = { user.user_id for user in requeue_after }
+            matched = [user.user_id for user in queue_users if user.user_id not in requeued_later] + list(self.requeue_players)
+            self.bot.server_choices.hold_roster(matched)
+            for user_id in matched: queue_manager.remove_user(user_id)
+            queue_manager.hold_match_players(matched)
+
+            await queue_manager.flush()
+            match_id = await self.bot.store.unqueue_add_match_users(settings, queue_channel)
             loop = asyncio.get_event_loop()
             from matches import make_match
             make_match(loop, self.bot, settings.guild_id, match_id)
         
         for user in requeue_after:
-            self.bot.queue_manager.add_user(user.user_id, user.queue_expiry)
-            await self.bot.store.upsert_queue_user(
-                    user_id=user.user_id, 
-                    guild_id=settings.guild_id, 
-                    queue_channel=settings.mm_queue_channel, 
-                    queue_expiry=user.queue_expiry)
-            log.debug(f"{member.display_name if (member := guild.get_member(player_id)) else player_id} has auto requeued")
+            queue_manager.queue_user(guild.id, queue_channel, user.user_id, user.queue_expiry)
+            log.debug(f"{member.display_name if (member := guild.get_member(user.user_id)) else user.user_id} has auto requeued")
         
-        queue_users = await self.bot.store.get_queue_users(settings.mm_queue_channel)
+        queue_users = self.bot.queue_manager.queued_users(cast(int, settings.mm_queue_channel))
         asyncio.create_task(self.bot.queue_manager.update_presence(len(queue_users)))
-        embed = create_queue_embed(queue_users)
-
-        channel = guild.get_channel(cast(int, settings.mm_queue_channel))
-        assert(isinstance(channel, nextcord.TextChannel))
-        message = await channel.fetch_message(cast(int, settings.mm_queue_message))
-        await message.edit(embeds=[message.embeds[0], embed])
+        await self.bot.queue_manager.refresh_queue_message(settings, queue_users)
         asyncio.create_task(self.bot.queue_manager.notify_queue_count(self.guild_id, settings, len(queue_users)))
 
-    async def increment_state(self):
-        self.state = MatchState(self.state + 1)
-        log.debug(f"Match state -> {self.state}")
-        await self.bot.store.save_match_state(self.match_id, self.state)
+    @property
+    def state(self) -> MatchState:
+        return self.machine.state
 
-    async def load_state(self) -> MatchState:
-        return await self.bot.store.load_match_state(self.match_id)
+    @state.setter
+    def state(self, state: MatchState):
+        self.machine.state = state
 
     async def change_state(self, new_state: MatchState):
-        self.state = new_state
-        await self.bot.store.save_match_state(self.match_id, self.state)
+        self.machine.advance(new_state)
+        await self.machine.flush()
     
     def safe_exit(func):
         @functools.wraps(func)
@@ -424,6 +437,10 @@ class Match:
                     if match_channel:
                         await match_channel.send(f"```diff\n- An error occurred: {e}```\nThe match has been frozen.")
             finally:
+                try:
+                    await self.stats_buffer.flush()
+                except Exception as e:
+                    log.error(f"[{self.match_id}] Failed to flush match stats: {repr(e)}")
                 for task in self.subtasks:
                     if not task.done():
                         task.cancel()
@@ -436,591 +453,573 @@ class Match:
         if self.state > 0: log.info(
             f"Loaded ongoing match {self.match_id} state:{self.state}")
         
-        def check_state(state: MatchState):
-            return True if self.state == state else False
-        
         self.requeue_players = []
-        
-        self.state      = await self.load_state()
-        settings        = await self.bot.settings_cache(self.guild_id)
-        assert(isinstance(settings, BotSettings))
-        guild           = self.bot.get_guild(self.guild_id)
-        assert(isinstance(guild, nextcord.Guild))
-        match_category  = guild.get_channel(cast(int, settings.mm_match_category))
-        assert(isinstance(match_category, nextcord.CategoryChannel))
-        text_channel    = guild.get_channel(cast(int, settings.mm_text_channel))
-        assert(isinstance(text_channel, nextcord.TextChannel))
+        if await self.prepare():
+            await self.machine.run(self.state_handlers())
 
-        self.players: List[MMBotMatchPlayers]  = await self.bot.store.get_players(self.match_id)
+    def state_handlers(self) -> Dict[MatchState, StateHandler]:
+        return {
+            MatchState.NOT_STARTED:             self.on_not_started,
+            MatchState.CREATE_MATCH_CHANNEL:    self.on_create_match_channel,
+            MatchState.ACCEPT_PLAYERS:          self.on_accept_players,
+            MatchState.MAKE_TEAMS:              self.on_make_teams,
+            MatchState.LOG_MATCH:               self.on_log_match,
+            MatchState.MAKE_TEAM_VC_A:          self.on_make_team_channels,
+            MatchState.MAKE_TEAM_VC_B:          self.on_make_team_channels,
+            MatchState.MAKE_TEAM_CHANNEL_A:     self.on_make_team_channels,
+            MatchState.MAKE_TEAM_CHANNEL_B:     self.on_make_team_channels,
+            MatchState.BANNING_START:           self.on_banning_start,
+            MatchState.A_BANS:                  self.on_a_bans,
+            MatchState.BAN_SWAP:                self.on_ban_swap,
+            MatchState.B_BANS:                  self.on_b_bans,
+            MatchState.LOG_BANS:                self.on_log_bans,
+            MatchState.PICKING_START:           self.on_picking_start,
+            MatchState.A_PICK:                  self.on_a_pick,
+            MatchState.PICK_SWAP:               self.on_pick_swap,
+            MatchState.B_PICK:                  self.on_b_pick,
+            MatchState.MATCH_STARTING:          self.on_match_starting,
+            MatchState.LOG_PICKS:               self.on_log_picks,
+            MatchState.MATCH_FIND_SERVER:       self.on_find_server,
+            MatchState.SET_SERVER_MODS:         self.on_set_server_mods,
+            MatchState.MATCH_CHANGE_TO_LOBBY:   self.on_change_to_lobby,
+            MatchState.MATCH_WAIT_FOR_PLAYERS:  self.on_wait_for_players,
+            MatchState.MATCH_START_SND:         self.on_start_snd,
+            MatchState.LOG_MATCH_HAPPENING:     self.on_log_match_happening,
+            MatchState.MATCH_WAIT_FOR_END:      self.on_wait_for_end,
+            MatchState.MATCH_CLEANUP:           self.on_match_cleanup,
+            MatchState.LOG_END:                 self.on_log_end,
+            MatchState.CLEANUP:                 self.on_cleanup,
+            MatchState.FINISHED:                self.on_finished,
+        }
+
+    async def prepare(self) -> bool:
+        context = await self.bot.store.load_match_context(self.match_id)
+        if context is None:
+            log.error(f"[{self.match_id}] Match not found, not running it")
+            return False
+        self.context    = context
+        self.state      = MatchState(self.context.match.state)
+        self.settings   = await self.bot.settings_cache(self.guild_id)
+        assert(isinstance(self.settings, BotSettings))
+        self.guild      = self.bot.get_guild(self.guild_id)
+        assert(isinstance(self.guild, nextcord.Guild))
+        self.match_category = self.guild.get_channel(cast(int, self.settings.mm_match_category))
+        assert(isinstance(self.match_category, nextcord.CategoryChannel))
+        self.text_channel   = self.guild.get_channel(cast(int, self.settings.mm_text_channel))
+        assert(isinstance(self.text_channel, nextcord.TextChannel))
+
+        self.players: List[MMBotMatchPlayers]  = self.context.players
         self.compute_user_platform_map()
+        if self.state < MatchState.FINISHED:
+            self.bot.queue_manager.hold_match_players([cast(int, p.user_id) for p in self.players])
+            self.bot.stats_rollups.invalidate(self.guild_id, [cast(int, p.user_id) for p in self.players])
         for p in self.players:
-            if not guild.get_member(cast(int, p.user_id)):
+            if not self.guild.get_member(cast(int, p.user_id)):
                 self.state = MatchState.CLEANUP
-                await text_channel.send(
+                await self.text_channel.send(
                     "```diff\n- A player has left the discord server during match initialization. -\nMatch canceled```")
 
-        self.match: MMBotMatches = await self.bot.store.get_match(self.match_id)
+        self.match: MMBotMatches = self.context.match
         
         self.available_maps = self.match.map_options or []
         if cast(list, self.available_maps):
-            self.available_maps = await self.bot.store.get_maps(guild_id=self.guild_id, maps=self.available_maps)
+            self.available_maps = self.context.get_maps(self.available_maps)
         else:
-            maps = await self.bot.store.get_all_maps(self.guild_id)
-            last_maps = await self.bot.store.get_last_played_maps(self.match.queue_channel, 3)
-            self.available_maps = [m for m in maps if m.map not in last_maps][:settings.mm_maps_range]
+            self.available_maps = [m for m in self.context.active_maps if m.map not in self.context.last_maps][:self.settings.mm_maps_range]
             await self.bot.store.update(MMBotMatches, id=self.match_id, map_options=[m.map for m in self.available_maps])
         
-        match_map: MMBotMaps  = await self.bot.store.get_match_map(self.guild_id, self.match_id)
-        match_sides: Tuple[Side | None, Side | None]  = await self.bot.store.get_match_sides(self.match_id)
+        self.match_map: MMBotMaps | None  = self.context.match_map
+        self.match_sides: Tuple[str, str]  = self.context.match_sides
         
-        self.serveraddr: str | None = await self.bot.store.get_serveraddr(self.match_id)
-        if self.serveraddr:
-            host, port = self.serveraddr.split(':')
-            server = await self.bot.store.get_server(host, port)
-            await self.bot.rcon_manager.add_server(server.host, server.port, server.password)
+        self.serveraddr: str | None = self.match.serveraddr
+        self.server: RconServers | None = self.context.server
+        if self.serveraddr and self.server:
+            await self.bot.rcon_manager.add_server(self.server.host, self.server.port, self.server.password)
         
+        self.match_channel = self.guild.get_channel(cast(int, self.match.match_thread))
+        self.log_channel   = self.guild.get_channel(cast(int, self.settings.mm_log_channel))
         
+        self.a_channel     = self.guild.get_channel(cast(int, self.match.a_thread))
+        self.b_channel     = self.guild.get_channel(cast(int, self.match.b_thread))
+
+        self.a_vc          = self.guild.get_channel(cast(int, self.match.a_vc))
+        self.b_vc          = self.guild.get_channel(cast(int, self.match.b_vc))
         
-        self.match_channel = guild.get_channel(cast(int, self.match.match_thread))
-        log_channel   = guild.get_channel(cast(int, settings.mm_log_channel))
+        if self.a_vc:
+            self.bot.match_stages[self.a_vc.id] = [u.user_id for u in self.players if u.team == Team.A]
+        if self.b_vc:
+            self.bot.match_stages[self.b_vc.id] = [u.user_id for u in self.players if u.team == Team.B]
+        return True
+
+    async def on_not_started(self) -> MatchState:
+        return MatchState.CREATE_MATCH_CHANNEL
+
+    async def on_create_match_channel(self) -> MatchState:
+        guild = self.guild
+        overwrites = self.match_category.overwrites | {
+            guild.get_member(cast(int, player.user_id)):
+                nextcord.PermissionOverwrite(
+                    view_channel=True, send_messages=True, speak=True, stream=True, connect=True
+                ) for player in self.players
+        }
+        for overwrite, perms in reversed(overwrites.items()):
+            if isinstance(overwrite, nextcord.Role) and perms.view_channel:
+                overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=False) })
+                break
         
-        a_channel     = guild.get_channel(cast(int, self.match.a_thread))
-        b_channel     = guild.get_channel(cast(int, self.match.b_thread))
+        self.match_channel = await self.match_category.create_text_channel(
+            name=f"Match - #{self.match_id}",
+            overwrites=overwrites,
+            reason=f"Match - #{self.match_id}")
+        assert(isinstance(self.match_channel, nextcord.TextChannel))
+        self.machine.stage(match_thread=self.match_channel.id)
+        return MatchState.ACCEPT_PLAYERS
+
+    async def on_accept_players(self) -> MatchState:
+        settings = self.settings
+        add_mention = []
+        for player in self.players:
+            add_mention.append(f"<@{player.user_id}>")
+        embed = nextcord.Embed(title=f"Match - #{self.match_id}", color=VALORS_THEME2)
+        embed.add_field(name=f"Attendance - {format_duration(settings.mm_accept_period)} to accept", value=format_mm_attendance(self.players))
+        done_event = asyncio.Event()
+        view = AcceptView(self.bot, done_event)
+        await self.match_channel.send(''.join(add_mention), embed=embed, view=view)
+
+        async def notify_unaccepted_players(delay: int=30):
+            await asyncio.sleep(delay)
+            if not done_event.is_set():
+                unaccepted_players = await self.bot.store.get_unaccepted_players(self.match_id)
+                for player in unaccepted_players:
+                    member = self.guild.get_member(cast(int, player.user_id))
+                    if member:
+                        embed = nextcord.Embed(
+                            title="Queue Popped!", 
+                            description=f"{format_duration(settings.mm_accept_period - delay)} left to ACCEPT\n{self.match_channel.mention}!", 
+                            color=0x18ff18)
+                        try:
+                            await member.send(embed=embed)
+                        except (nextcord.Forbidden, nextcord.HTTPException):
+                            pass
 
-        a_vc          = guild.get_channel(cast(int, self.match.a_vc))
-        b_vc          = guild.get_channel(cast(int, self.match.b_vc))
-        
-        if a_vc:
-            self.bot.match_stages[a_vc.id] = [u.user_id for u in self.players if u.team == Team.A]
-        if b_vc:
-            self.bot.match_stages[b_vc.id] = [u.user_id for u in self.players if u.team == Team.B]
+        notify_tasks = [
+            asyncio.create_task(notify_unaccepted_players(30)),
+            asyncio.create_task(notify_unaccepted_players(cast(int, settings.mm_accept_period) - 30))
+        ]
 
         try:
-            if self.match.log_message:
-                log_message    = await log_channel.fetch_message(self.match.log_message)
-        except Exception: pass
-        try:
-            if self.match.match_message: 
-                match_message  = await self.match_channel.fetch_message(self.match.match_message)
-        except Exception: pass
-        try:
-            if self.match.a_message: 
-                a_message      = await self.match_channel.fetch_message(self.match.a_message)
-        except Exception: pass
-        try:
-            if self.match.b_message: 
-                b_message      = await self.match_channel.fetch_message(self.match.b_message)
-        except Exception: pass
-
-        if check_state(MatchState.NOT_STARTED):
-            await self.increment_state()
-        
-        if check_state(MatchState.CREATE_MATCH_CHANNEL):
-            overwrites = match_category.overwrites | {
-                guild.get_member(cast(int, player.user_id)):
-                    nextcord.PermissionOverwrite(
-                        view_channel=True, send_messages=True, speak=True, stream=True, connect=True
-                    ) for player in self.players
-            }
-            for overwrite, perms in reversed(overwrites.items()):
-                if isinstance(overwrite, nextcord.Role) and perms.view_channel:
-                    overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=False) })
-                    break
-            
-            self.match_channel = await match_category.create_text_channel(
-                name=f"Match - #{self.match_id}",
-                overwrites=overwrites,
-                reason=f"Match - #{self.match_id}")
-            assert(isinstance(self.match_channel, nextcord.TextChannel))
-            await self.bot.store.update(MMBotMatches, id=self.match_id, match_thread=self.match_channel.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.ACCEPT_PLAYERS):
-            add_mention = []
-            for player in self.players:
-                add_mention.append(f"<@{player.user_id}>")
-            embed = nextcord.Embed(title=f"Match - #{self.match_id}", color=VALORS_THEME2)
-            embed.add_field(name=f"Attendance - {format_duration(settings.mm_accept_period)} to accept", value=format_mm_attendance(self.players))
-            done_event = asyncio.Event()
-            view = AcceptView(self.bot, done_event)
-            await self.match_channel.send(''.join(add_mention), embed=embed, view=view)
-
-            async def notify_unaccepted_players(delay: int=30):
-                await asyncio.sleep(delay)
-                if not done_event.is_set():
-                    unaccepted_players = await self.bot.store.get_unaccepted_players(self.match_id)
-                    for player in unaccepted_players:
-                        member = guild.get_member(cast(int, player.user_id))
-                        if member:
-                            embed = nextcord.Embed(
-                                title="Queue Popped!", 
-                                description=f"{format_duration(settings.mm_accept_period - delay)} left to ACCEPT\n{self.match_channel.mention}!", 
-                                color=0x18ff18)
-                            try:
-                                await member.send(embed=embed)
-                            except (nextcord.Forbidden, nextcord.HTTPException):
-                                pass
-
-            notify_tasks = [
-                asyncio.create_task(notify_unaccepted_players(30)),
-                asyncio.create_task(notify_unaccepted_players(cast(int, settings.mm_accept_period) - 30))
-            ]
-
+            await asyncio.wait_for(done_event.wait(), timeout=float(cast(int, settings.mm_accept_period)))
+        except asyncio.TimeoutError:
+            self.requeue_players = view.accepted_players
+            embed = nextcord.Embed(title="Players failed to accept the match", color=VALORS_THEME1_2)
+            await self.match_channel.send(embed=embed)
+            player_ids = [p.user_id for p in self.players]
+            dodged_mentions = ' '.join((f'<@{userid}>' for userid in player_ids if userid not in view.accepted_players))
+            await self.text_channel.send(f"{dodged_mentions}\nDid not accept the last match in time.\nRemaining players will be re-queued automatically.")
+            return MatchState.CLEANUP
+        finally: [task.cancel() for task in notify_tasks]
+        return MatchState.MAKE_TEAMS
+
+    async def on_make_teams(self) -> MatchState:
+        users = await self.bot.store.get_users(self.guild_id, [player.user_id for player in self.players])
+        weights = team_weights_from_settings(self.settings)
+        rtts = None
+        if weights['rtt']:
+            regions = await self.bot.store.get_regions(self.guild_id)
+            rcon_servers = await self.bot.store.get_servers(free=True)
             try:
-                await asyncio.wait_for(done_event.wait(), timeout=float(cast(int, settings.mm_accept_period)))
-            except asyncio.TimeoutError:
-                self.requeue_players = view.accepted_players
-                self.state = MatchState.CLEANUP - 1
-                embed = nextcord.Embed(title="Players failed to accept the match", color=VALORS_THEME1_2)
-                await self.match_channel.send(embed=embed)
-                player_ids = [p.user_id for p in self.players]
-                dodged_mentions = ' '.join((f'<@{userid}>' for userid in player_ids if userid not in view.accepted_players))
-                await text_channel.send(f"{dodged_mentions}\nDid not accept the last match in time.\nRemaining players will be re-queued automatically.")
-            finally: [task.cancel() for task in notify_tasks]
-            await self.increment_state()
-
-        if check_state(MatchState.MAKE_TEAMS):
-            users = await self.bot.store.get_users(self.guild_id, [player.user_id for player in self.players])
-            start = perf_counter_ns()
-            a_players, b_players, a_mmr, b_mmr = get_teams(users)
-            stop = perf_counter_ns()
-            delay = (stop - start) / 1000000
-            log.debug(f"Teams generated in {delay:.6f}ms")
-            await self.bot.store.set_players_team(
-                match_id=self.match_id, 
-                user_teams={Team.A: a_players, Team.B: b_players})
-            self.players = await self.bot.store.get_players(self.match_id)
-            self.compute_user_platform_map()
-            self.match.a_mmr = a_mmr
-            self.match.b_mmr = b_mmr
-            await self.bot.store.update(MMBotMatches, id=self.match_id, a_mmr=a_mmr, b_mmr=b_mmr)
-            await self.increment_state()
-        
-        if check_state(MatchState.LOG_MATCH):
-            embed = nextcord.Embed(
-                title=f"Match #{self.match_id}",
-                description="Teams created\nInitiating team votes",
-                color=VALORS_THEME1)
-            embed.add_field(name=f"[{self.match.a_mmr:.0f}]Team A", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name=f"[{self.match.b_mmr:.0f}]Team B", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            embed.set_footer(text=f"Match started ")
-            embed.timestamp = datetime.now(timezone.utc)
-            log_message = await log_channel.send(embed=embed)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, log_message=log_message.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.MAKE_TEAM_VC_A):
-            overwrites = match_category.overwrites | {
-                guild.get_member(cast(int, player.user_id)):
-                    nextcord.PermissionOverwrite(
-                        view_channel=True, send_messages=True, speak=True, stream=True, connect=True
-                    ) for player in self.players if player.team == Team.A
-            }
-            for overwrite, perms in reversed(overwrites.items()):
-                if isinstance(overwrite, nextcord.Role) and perms.view_channel:
-                    overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=True, connect=True, speak=False, stream=False) })
-                    break
-            
-            a_vc = await match_category.create_voice_channel(
-                name=f"[{self.match_id}] Team A",
-                overwrites=overwrites,
-                reason=f"[{self.match_id}] Team A",
-                rtc_region=nextcord.VoiceRegion.us_east)
-            self.bot.match_stages[a_vc.id] = [u.user_id for u in self.players if u.team == Team.A]
-            await self.bot.store.update(MMBotMatches, id=self.match_id, a_vc=a_vc.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.MAKE_TEAM_VC_B):
-            overwrites = match_category.overwrites | {
-                guild.get_member(cast(int, player.user_id)):
-                    nextcord.PermissionOverwrite(
-                        view_channel=True, send_messages=True, speak=True, stream=True, connect=True
-                    ) for player in self.players if player.team == Team.B
-            }
-            for overwrite, perms in reversed(overwrites.items()):
-                if isinstance(overwrite, nextcord.Role) and perms.view_channel:
-                    overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=True, connect=True, speak=False, stream=False) })
-                    break
-            
-            b_vc = await match_category.create_voice_channel(
-                name=f"[{self.match_id}] Team B",
-                overwrites=overwrites,
-                reason=f"[{self.match_id}] Team B",
-                rtc_region=nextcord.VoiceRegion.us_east)
-            self.bot.match_stages[a_vc.id] = [u.user_id for u in self.players if u.team == Team.B]
-            await self.bot.store.update(MMBotMatches, id=self.match_id, b_vc=b_vc.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.MAKE_TEAM_CHANNEL_A):
-            overwrites = match_category.overwrites | {
-                guild.get_member(cast(int, player.user_id)):
-                    nextcord.PermissionOverwrite(
-                        view_channel=True, send_messages=True, speak=True, stream=True, connect=True
-                    ) for player in self.players if player.team == Team.A
-            }
-            for overwrite, perms in reversed(overwrites.items()):
-                if isinstance(overwrite, nextcord.Role) and perms.view_channel:
-                    overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=False) })
-                    break
-            
-            a_channel = await match_category.create_text_channel(
-                name=f"[{self.match_id}] Team A",
-                overwrites=overwrites,
-                reason=f"[{self.match_id}] Team A")
-            await self.bot.store.update(MMBotMatches, id=self.match_id, a_thread=a_channel.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.MAKE_TEAM_CHANNEL_B):
-            overwrites = match_category.overwrites | {
-                guild.get_member(cast(int, player.user_id)):
-                    nextcord.PermissionOverwrite(
-                        view_channel=True, send_messages=True, speak=True, stream=True, connect=True
-                    ) for player in self.players if player.team == Team.B
-            }
-            for overwrite, perms in reversed(overwrites.items()):
-                if isinstance(overwrite, nextcord.Role) and perms.view_channel:
-                    overwrites.update({ overwrite: nextcord.PermissionOverwrite(view_channel=False) })
-                    break
-            
-            b_channel = await match_category.create_text_channel(
-                name=f"[{self.match_id}] Team B",
-                overwrites=overwrites,
-                reason=f"[{self.match_id}] Team B")
-            await self.bot.store.update(MMBotMatches, id=self.match_id, b_thread=b_channel.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.BANNING_START):
-            await self.match_channel.purge(bulk=True)
-            embed = nextcord.Embed(title="Team A ban first", description=f"<#{a_channel.id}>", color=A_THEME)
-            embed.add_field(name="Team A", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name="Team B", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            match_message = await self.match_channel.send(embed=embed)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, match_message=match_message.id)
-            await self.increment_state()
-        
-        if check_state(MatchState.A_BANS):
-            time_to_ban = 20
-            self.players = await self.bot.store.get_players(self.match_id)
-            add_mention = [f"<@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.A]
-            embed = nextcord.Embed(title="Pick your 2 bans", description=format_duration(time_to_ban), color=A_THEME)
-            view = await BanView.create_showable(self.bot, self.match, self.available_maps, [])
-            a_message = await a_channel.send(''.join(add_mention), embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id,  a_message=a_message.id, phase=Phase.A_BAN)
-            await asyncio.sleep(time_to_ban)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, phase=Phase.NONE)
-
-            bans = await self.bot.store.get_ban_votes(self.match_id, Phase.A_BAN)
-            bans = get_preferred_bans(self.available_maps, bans, total_bans=2)
-            view = ChosenBansView(bans)
-            embed = nextcord.Embed(title="You banned", color=A_THEME)
-            await a_message.edit(embed=embed, view=view)
-            embed = nextcord.Embed(title="A banned", color=A_THEME)
-            await b_channel.send(embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, a_bans=bans)
-            await self.increment_state()
-        
-        if check_state(MatchState.BAN_SWAP):
-            embed = nextcord.Embed(title="Team B ban second", description=f"<#{b_channel.id}>", color=B_THEME)
-            embed.add_field(name="Team A", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name="Team B", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            await match_message.edit(embed=embed)
-            await self.increment_state()
-        
-        if check_state(MatchState.B_BANS):
-            time_to_ban = 20
-            self.players = await self.bot.store.get_players(self.match_id)
-            embed = nextcord.Embed(title="Pick your 2 bans", description=format_duration(time_to_ban), color=B_THEME)
-            banned_maps = await self.bot.store.get_bans(self.match_id)
-            view = await BanView.create_showable(self.bot, self.match, self.available_maps, banned_maps)
-            add_mention = [f"<@{player.user_id}>" for player in self.players if player.team == Team.B]
-            b_message = await b_channel.send(''.join(add_mention), embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, phase=Phase.B_BAN, b_message=b_message.id)
-            await asyncio.sleep(time_to_ban)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, phase=Phase.NONE)
-            
-            bans = await self.bot.store.get_ban_votes(self.match_id, Phase.B_BAN)
-            bans = get_preferred_bans(self.available_maps, bans, total_bans=2)
-            view = ChosenBansView(bans)
-            embed = nextcord.Embed(title="You banned", color=B_THEME)
-            await b_message.edit(embed=embed, view=view)
-            embed = nextcord.Embed(title="B banned", color=B_THEME)
-            await a_channel.send(embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, b_bans=bans)
-            await self.increment_state()
-        
-        if check_state(MatchState.LOG_BANS):
-            a_bans = await self.bot.store.get_bans(self.match_id, Team.A)
-            b_bans = await self.bot.store.get_bans(self.match_id, Team.B)
-            embed = log_message.embeds[0]
-            embed.add_field(name="Bans", value=f"A: {', '.join(a_bans)}\nB: {', '.join(b_bans)}", inline=False)
-            log_message = await log_message.edit(embed=embed)
-            await self.increment_state()
-            
-        if check_state(MatchState.PICKING_START):
-            embed = nextcord.Embed(title="Team A pick map", description=f"<#{a_channel.id}>", color=A_THEME)
-            embed.add_field(name="Team A", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name="Team B", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            await match_message.edit(embed=embed)
-            await self.increment_state()
-        
-        if check_state(MatchState.A_PICK):
-            time_to_pick = 20
-            self.players = await self.bot.store.get_players(self.match_id)
-            add_mention = (f"<@{player.user_id}>" for player in self.players if player.team == Team.A)
-            embed = nextcord.Embed(title="Pick your map", description=format_duration(time_to_pick), color=A_THEME)
-            banned_maps = await self.bot.store.get_bans(self.match_id)
-            view = await MapPickView.create_showable(self.bot, self.match, self.available_maps, banned_maps)
-            a_message = await a_channel.send(''.join(add_mention), embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id,  a_message=a_message.id, phase=Phase.A_PICK)
-            await asyncio.sleep(time_to_pick)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, phase=Phase.NONE)
-
-            map_votes = await self.bot.store.get_map_votes(self.match_id)
-            match_map = get_preferred_map(self.available_maps, map_votes or [], banned_maps)
-            view = ChosenMapView(str(match_map.map))
-            embed = nextcord.Embed(title="You picked", color=A_THEME)
-            embed.set_thumbnail(match_map.media)
-            await a_message.edit(embed=embed, view=view)
-            embed.title = "A picked"
-            await b_channel.send(embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, map=match_map.map)
-            await self.increment_state()
-        
-        if check_state(MatchState.PICK_SWAP):
-            embed = nextcord.Embed(title="Team B pick side", description=f"<#{b_channel.id}>", color=B_THEME)
-            embed.add_field(name="Team A", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.A]))
-            embed.add_field(name="Team B", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.B]))
-            await match_message.edit(embed=embed)
-            await self.increment_state()
-        
-        if check_state(MatchState.B_PICK):
-            time_to_pick = 20
-            self.players = await self.bot.store.get_players(self.match_id)
-            add_mention = (f"<@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.B)
-            embed = nextcord.Embed(title="Pick your side", description=format_duration(time_to_pick), color=B_THEME)
-            view = await SidePickView.create_showable(self.bot, self.match)
-            b_message = await b_channel.send(''.join(add_mention), embed=embed, view=view)
-            await self.bot.store.update(MMBotMatches, id=self.match_id,  b_message=b_message.id, phase=Phase.B_PICK)
-            await asyncio.sleep(time_to_pick)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, phase=Phase.NONE)
-
-            side_votes = await self.bot.store.get_side_votes(self.match_id)
-            side_pick = get_preferred_side([Side.T, Side.CT], side_votes or [])
-            embed = nextcord.Embed(title="You picked", color=B_THEME)
-            await b_message.edit(embed=embed, view=ChosenSideView(side_pick))
-            
-            embed = nextcord.Embed(title="You are", color=B_THEME)
-            await a_channel.send(embed=embed, view=ChosenSideView(Side.CT if side_pick == Side.T else Side.T))
-            await self.bot.store.update(MMBotMatches, id=self.match_id, b_side=side_pick)
-            await self.increment_state()
-
-        if check_state(MatchState.MATCH_STARTING):
-            await self.match_channel.purge(bulk=True)
-            match_sides = await self.bot.store.get_match_sides(self.match_id)
-            embed = nextcord.Embed(title="Starting", description="Setting up server", color=VALORS_THEME1)
-            embed.set_image(match_map.media)
-            embed.add_field(name=f"Team A - {match_sides[0]}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name=f"Team B - {match_sides[1]}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            embed.add_field(name=f"{match_map.map}:", value="\u200B", inline=False)
-            match_message = await self.match_channel.send(embed=embed)
+                if server_scores := score_servers(regions, users, rcon_servers):
+                    rtts = server_scores.user_rtts(server_scores.ranked()[0][0])
+            except ValueError as e:
+                log.warning(f"[{self.match_id}] Teams made without latency: {repr(e)}")
+        teammate_history = None
+        if weights['repeat']:
+            teammate_history = await self.bot.store.get_teammate_history(self.guild_id, [user.user_id for user in users])
+        start = perf_counter_ns()
+        a_players, b_players, a_mmr, b_mmr = get_teams(users, weights, rtts, teammate_history)
+        stop = perf_counter_ns()
+        delay = (stop - start) / 1000000
+        log.debug(f"Teams generated in {delay:.6f}ms")
+        await self.bot.store.set_players_team(
+            match_id=self.match_id, 
+            user_teams={Team.A: a_players, Team.B: b_players})
+        self.players = await self.bot.store.get_players(self.match_id)
+        self.compute_user_platform_map()
+        self.match.a_mmr = a_mmr
+        self.match.b_mmr = b_mmr
+        self.machine.stage(a_mmr=a_mmr, b_mmr=b_mmr)
+        return MatchState.LOG_MATCH
 
-            embed = nextcord.Embed(
-                title="Match starting!",
-                description=f"Return to {self.match_channel.mention}",
-                color=VALORS_THEME1)
-            await a_channel.send(embed=embed)
-            await b_channel.send(embed=embed)
-            await self.bot.store.update(MMBotMatches, id=self.match_id, match_message=match_message.id)
-            await self.increment_state()
+    async def on_log_match(self) -> MatchState:
+        embed = nextcord.Embed(
+            title=f"Match #{self.match_id}",
+            description="Teams created\nInitiating team votes",
+            color=VALORS_THEME1)
+        embed.add_field(name=f"[{self.match.a_mmr:.0f}]Team A", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name=f"[{self.match.b_mmr:.0f}]Team B", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        embed.set_footer(text=f"Match started ")
+        embed.timestamp = datetime.now(timezone.utc)
+        log_message = await self.log_channel.send(embed=embed)
+        self.bot.messages.remember(log_message)
+        self.match.log_message = log_message.id
+        self.machine.stage(log_message=self.match.log_message)
+        return MatchState.MAKE_TEAM_VC_A
+
+    async def on_make_team_channels(self) -> MatchState:
+        resources = await self.bot.provisioner.provision(self.match_id, self.guild, self.match_category, self.players, 
+            { "a_vc": self.a_vc, "b_vc": self.b_vc, "a_thread": self.a_channel, "b_thread": self.b_channel })
+        self.a_vc, self.b_vc = resources["a_vc"], resources["b_vc"]
+        self.a_channel, self.b_channel = resources["a_thread"], resources["b_thread"]
+        self.bot.match_stages[self.a_vc.id] = [u.user_id for u in self.players if u.team == Team.A]
+        self.bot.match_stages[self.b_vc.id] = [u.user_id for u in self.players if u.team == Team.B]
+        return MatchState.BANNING_START
+
+    async def on_banning_start(self) -> MatchState:
+        await self.match_channel.purge(bulk=True)
+        embed = nextcord.Embed(title="Team A ban first", description=f"<#{self.a_channel.id}>", color=A_THEME)
+        embed.add_field(name="Team A", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name="Team B", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        match_message = await self.match_channel.send(embed=embed)
+        self.bot.messages.remember(match_message)
+        self.match.match_message = match_message.id
+        self.machine.stage(match_message=self.match.match_message)
+        return MatchState.A_BANS
+
+    async def on_a_bans(self) -> MatchState:
+        phase = VOTING_PHASES[MatchState.A_BANS]
+        self.players = await self.bot.store.get_players(self.match_id)
+        add_mention = [f"<@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.A]
+        embed = nextcord.Embed(title="Pick your 2 bans", description=format_duration(phase.duration), color=A_THEME)
+        view = await BanView.create_showable(self.bot, self.match, self.available_maps, [])
+        a_message = await self.a_channel.send(''.join(add_mention), embed=embed, view=view)
+        await self.bot.store.update(MMBotMatches, id=self.match_id,  a_message=a_message.id, phase=phase.phase)
+        await self.machine.run_window(phase, [cast(int, p.user_id) for p in self.players if p.team == phase.team])
+
+        bans = await self.bot.store.get_ban_votes(self.match_id, Phase.A_BAN)
+        bans = get_preferred_bans(self.available_maps, bans, total_bans=2)
+        view = ChosenBansView(bans)
+        embed = nextcord.Embed(title="You banned", color=A_THEME)
+        await a_message.edit(embed=embed, view=view)
+        embed = nextcord.Embed(title="A banned", color=A_THEME)
+        await self.b_channel.send(embed=embed, view=view)
+        self.machine.stage(phase=Phase.NONE, a_bans=bans)
+        return MatchState.BAN_SWAP
+
+    async def on_ban_swap(self) -> MatchState:
+        embed = nextcord.Embed(title="Team B ban second", description=f"<#{self.b_channel.id}>", color=B_THEME)
+        embed.add_field(name="Team A", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name="Team B", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        self.bot.messages.edit(self.match_channel, self.match.match_message, Lane.CRITICAL, embed=embed)
+        return MatchState.B_BANS
+
+    async def on_b_bans(self) -> MatchState:
+        phase = VOTING_PHASES[MatchState.B_BANS]
+        self.players = await self.bot.store.get_players(self.match_id)
+        embed = nextcord.Embed(title="Pick your 2 bans", description=format_duration(phase.duration), color=B_THEME)
+        banned_maps = await self.bot.store.get_bans(self.match_id)
+        view = await BanView.create_showable(self.bot, self.match, self.available_maps, banned_maps)
+        add_mention = [f"<@{player.user_id}>" for player in self.players if player.team == Team.B]
+        b_message = await self.b_channel.send(''.join(add_mention), embed=embed, view=view)
+        await self.bot.store.update(MMBotMatches, id=self.match_id, phase=phase.phase, b_message=b_message.id)
+        await self.machine.run_window(phase, [cast(int, p.user_id) for p in self.players if p.team == phase.team])
         
-        if check_state(MatchState.LOG_PICKS):
-            embed = log_message.embeds[0]
-            embed.description = "Server setup"
-            embed.set_field_at(0, name=f"[{self.match.a_mmr:.0f}]Team A - {'T' if self.match.b_side == Side.CT else 'CT'}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.set_field_at(1, name=f"[{self.match.b_mmr:.0f}]Team B - {'CT' if self.match.b_side == Side.CT else 'T'}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            embed.set_image(match_map.media)
-            embed.add_field(name=f"{match_map.map}:", value="\u200B", inline=False)
-            log_message = await log_message.edit(embed=embed)
-            await self.increment_state()
+        bans = await self.bot.store.get_ban_votes(self.match_id, Phase.B_BAN)
+        bans = get_preferred_bans(self.available_maps, bans, total_bans=2)
+        view = ChosenBansView(bans)
+        embed = nextcord.Embed(title="You banned", color=B_THEME)
+        await b_message.edit(embed=embed, view=view)
+        embed = nextcord.Embed(title="B banned", color=B_THEME)
+        await self.a_channel.send(embed=embed, view=view)
+        self.machine.stage(phase=Phase.NONE, b_bans=bans)
+        return MatchState.LOG_BANS
+
+    async def on_log_bans(self) -> MatchState:
+        await self.machine.flush()
+        a_bans = await self.bot.store.get_bans(self.match_id, Team.A)
+        b_bans = await self.bot.store.get_bans(self.match_id, Team.B)
+        embed = (await self.bot.messages.embeds(self.log_channel, self.match.log_message))[0]
+        embed.add_field(name="Bans", value=f"A: {', '.join(a_bans)}\nB: {', '.join(b_bans)}", inline=False)
+        self.bot.messages.edit(self.log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
+        return MatchState.PICKING_START
+
+    async def on_picking_start(self) -> MatchState:
+        embed = nextcord.Embed(title="Team A pick map", description=f"<#{self.a_channel.id}>", color=A_THEME)
+        embed.add_field(name="Team A", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name="Team B", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        self.bot.messages.edit(self.match_channel, self.match.match_message, Lane.CRITICAL, embed=embed)
+        return MatchState.A_PICK
+
+    async def on_a_pick(self) -> MatchState:
+        phase = VOTING_PHASES[MatchState.A_PICK]
+        self.players = await self.bot.store.get_players(self.match_id)
+        add_mention = (f"<@{player.user_id}>" for player in self.players if player.team == Team.A)
+        embed = nextcord.Embed(title="Pick your map", description=format_duration(phase.duration), color=A_THEME)
+        banned_maps = await self.bot.store.get_bans(self.match_id)
+        view = await MapPickView.create_showable(self.bot, self.match, self.available_maps, banned_maps)
+        a_message = await self.a_channel.send(''.join(add_mention), embed=embed, view=view)
+        await self.bot.store.update(MMBotMatches, id=self.match_id,  a_message=a_message.id, phase=phase.phase)
+        await self.machine.run_window(phase, [cast(int, p.user_id) for p in self.players if p.team == phase.team])
+
+        map_votes = await self.bot.store.get_map_votes(self.match_id)
+        self.match_map = get_preferred_map(self.available_maps, map_votes or [], banned_maps)
+        view = ChosenMapView(str(self.match_map.map))
+        embed = nextcord.Embed(title="You picked", color=A_THEME)
+        embed.set_thumbnail(self.match_map.media)
+        await a_message.edit(embed=embed, view=view)
+        embed.title = "A picked"
+        await self.b_channel.send(embed=embed, view=view)
+        self.match.map = self.match_map.map
+        self.machine.stage(phase=Phase.NONE, map=self.match_map.map)
+        return MatchState.PICK_SWAP
+
+    async def on_pick_swap(self) -> MatchState:
+        embed = nextcord.Embed(title="Team B pick side", description=f"<#{self.b_channel.id}>", color=B_THEME)
+        embed.add_field(name="Team A", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.A]))
+        embed.add_field(name="Team B", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.B]))
+        self.bot.messages.edit(self.match_channel, self.match.match_message, Lane.CRITICAL, embed=embed)
+        return MatchState.B_PICK
+
+    async def on_b_pick(self) -> MatchState:
+        phase = VOTING_PHASES[MatchState.B_PICK]
+        self.players = await self.bot.store.get_players(self.match_id)
+        add_mention = (f"<@{player.user_id}>" for player in self.players if cast(Team, player.team) == Team.B)
+        embed = nextcord.Embed(title="Pick your side", description=format_duration(phase.duration), color=B_THEME)
+        view = await SidePickView.create_showable(self.bot, self.match)
+        b_message = await self.b_channel.send(''.join(add_mention), embed=embed, view=view)
+        await self.bot.store.update(MMBotMatches, id=self.match_id,  b_message=b_message.id, phase=phase.phase)
+        await self.machine.run_window(phase, [cast(int, p.user_id) for p in self.players if p.team == phase.team])
+
+        side_votes = await self.bot.store.get_side_votes(self.match_id)
+        side_pick = get_preferred_side([Side.T, Side.CT], side_votes or [])
+        embed = nextcord.Embed(title="You picked", color=B_THEME)
+        await b_message.edit(embed=embed, view=ChosenSideView(side_pick))
         
-        if check_state(MatchState.MATCH_FIND_SERVER):
+        embed = nextcord.Embed(title="You are", color=B_THEME)
+        await self.a_channel.send(embed=embed, view=ChosenSideView(Side.CT if side_pick == Side.T else Side.T))
+        self.match.b_side = side_pick
+        self.machine.stage(phase=Phase.NONE, b_side=side_pick)
+        return MatchState.MATCH_STARTING
+
+    async def on_match_starting(self) -> MatchState:
+        await self.match_channel.purge(bulk=True)
+        await self.machine.flush()
+        self.match_sides = await self.bot.store.get_match_sides(self.match_id)
+        embed = nextcord.Embed(title="Starting", description="Setting up server", color=VALORS_THEME1)
+        embed.set_image(self.match_map.media)
+        embed.add_field(name=f"Team A - {self.match_sides[0]}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name=f"Team B - {self.match_sides[1]}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        embed.add_field(name=f"{self.match_map.map}:", value="\u200B", inline=False)
+        match_message = await self.match_channel.send(embed=embed)
+        self.bot.messages.remember(match_message)
+        self.match.match_message = match_message.id
+
+        embed = nextcord.Embed(
+            title="Match starting!",
+            description=f"Return to {self.match_channel.mention}",
+            color=VALORS_THEME1)
+        await self.a_channel.send(embed=embed)
+        await self.b_channel.send(embed=embed)
+        self.machine.stage(match_message=self.match.match_message)
+        return MatchState.LOG_PICKS
+
+    async def on_log_picks(self) -> MatchState:
+        embed = (await self.bot.messages.embeds(self.log_channel, self.match.log_message))[0]
+        embed.description = "Server setup"
+        embed.set_field_at(0, name=f"[{self.match.a_mmr:.0f}]Team A - {'T' if self.match.b_side == Side.CT else 'CT'}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.set_field_at(1, name=f"[{self.match.b_mmr:.0f}]Team B - {'CT' if self.match.b_side == Side.CT else 'T'}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        embed.set_image(self.match_map.media)
+        embed.add_field(name=f"{self.match_map.map}:", value="\u200B", inline=False)
+        self.bot.messages.edit(self.log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
+        return MatchState.MATCH_FIND_SERVER
+
+    async def on_find_server(self) -> MatchState | None:
+        server_options = await self.bot.server_choices.choices([cast(int, player.user_id) for player in self.players])
+        if server_options:
+            log.debug(f"[{self.match_id}] Using precomputed server ranking")
+        else:
             users = await self.bot.store.get_users(self.guild_id, [player.user_id for player in self.players])
             regions = await self.bot.store.get_regions(self.guild_id)
             rcon_servers: List[RconServers] = await self.bot.store.get_servers(free=True)
             log.debug(f"RCON_SERVERS: {len(rcon_servers)}")
-            success = None
-
-            if rcon_servers:
-                server_options = sorted(await get_server_scores(regions, users, rcon_servers), key=lambda x: x[1], reverse=True)
-                for serv in server_options:
-                    log.info(f"{serv[0].id} - {serv[0].region}\n{serv[1]:.2f}")
-                for server, _ in server_options:
-                    successful = await self.bot.rcon_manager.add_server(
-                        cast(str, server.host), cast(int, server.port), cast(str, server.password))
-                    if successful:
-                        log.info(f"[{self.match_id}] Server found running rcon server {server.host}:{server.port} password: {server.password} region: {server.region}")
-                        self.serveraddr = f'{server.host}:{server.port}'
-                        success = True
-                        await self.bot.store.set_serveraddr(self.match_id, self.serveraddr)
-                        await self.bot.store.use_server(self.serveraddr)
-                        await self.increment_state()
-                        break
-            if not success:
-                await self.show_no_server_found_message()
-
-        if check_state(MatchState.SET_SERVER_MODS):
-            self.match = await self.bot.store.get_match(self.match_id)
-            mods = await self.bot.store.get_mods(guild.id)
-            await self.bot.rcon_manager.clear_mods(self.serveraddr)
-            for mod in mods:
-                await self.bot.rcon_manager.add_mod(self.serveraddr, mod.resource_id)
-            await self.increment_state()
-        
-        if check_state(MatchState.MATCH_CHANGE_TO_LOBBY):
-            pin = 5
-            server_name = f"PMM Match {self.match_id}"
-            addr = self.serveraddr
-            await asyncio.gather(
-                self.bot.rcon_manager.set_teamdeathmatch(addr, SERVER_DM_MAP),
-                self.bot.rcon_manager.unban_all_players(addr),
-                self.bot.rcon_manager.comp_mode(addr, state=True),
-                self.bot.rcon_manager.max_players(addr, MATCH_PLAYER_COUNT),
-                self.bot.rcon_manager.set_pin(addr, str(pin)),
-                self.bot.rcon_manager.set_name(addr, server_name)
-            )
-
-            embed = nextcord.Embed(title=f"Match [0/{MATCH_PLAYER_COUNT}]", description=f"Server ready!", color=VALORS_THEME1)
-            embed.set_image(match_map.media)
-            embed.add_field(name=f"Team A - {match_sides[0]}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
-            embed.add_field(name=f"Team B - {match_sides[1]}", 
-                value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
-            embed.add_field(name="TDM Server", value=f"`{server_name}`", inline=False)
-            embed.add_field(name="Pin", value=f"`{pin}`")
-            embed.add_field(name=f"{match_map.map}:", value="\u200B", inline=False)
-            match_message = await match_message.edit(embed=embed)
-            await self.increment_state()
-        
-        if check_state(MatchState.MATCH_WAIT_FOR_PLAYERS):
-            embed = match_message.embeds[0]
-            current_players = set()
-            server_players = set()
-            done_event = asyncio.Event()
-            warnings_issued = {}
-            abandon_view = ForceAbandonView(self.bot, self.match)
-
-            async def run_matchmaking_timer():
-                current_message: nextcord.Message | None = None
-                start_time = time()
-                end_time = start_time + float(cast(int, settings.mm_join_period)) + 1.0
-                message_update_interval = 10
-                message_post_interval = 60
-                force_abandon_view_delay = 300
-                player_mention_delays = sorted([cast(int, settings.mm_join_period) - 120, cast(int, settings.mm_join_period) - 60, cast(int, settings.mm_join_period)])
-
-                def get_missing_players():
-                    return [p for p in self.players if not any(m.platform_id in server_players for m in p.user_platform_mappings)]
-
-                while not done_event.is_set():
-                    missing_players = get_missing_players()
-                    abandon_view.missing_players = missing_players
-
-                    current_time = time()
-                    elapsed_time = current_time - start_time
-                    remaining_time = end_time - current_time
-                    overtime = current_time - end_time + 1
-
-                    if current_time < end_time:
-                        description = f"## {format_duration(remaining_time)}\nFailure to abide will result in moderative actions."
-                        color = 0xff0000
-                    else:
-                        description = f"You are {format_duration(overtime)} late and have gained a warning."
-                        color = 0xff6600
-
-                        for player in missing_players:
-                            if player.user_id not in warnings_issued:
-                                warnings_issued[player.user_id] = { 'warn_id': None }
-                                log.info(f"{player.user_id} was issued a warning for being {format_duration(overtime)} late to a match.")
-                            warnings_issued[player.user_id]['overtime'] = overtime
-                            warnings_issued[player.user_id]['warn_id'] = await self.bot.store.upsert_warning(
-                                guild_id=self.guild_id,
-                                user_id=player.user_id,
-                                message=f"Late by {format_duration(overtime)}",
-                                match_id=self.match_id,
-                                warn_type=Warn.LATE,
-                                identifier=warnings_issued[player.user_id]['warn_id'])
-                    
-                    mentions = None
-                    if missing_players:
-                        mentions = "\n".join(f"‼️ <@{player.user_id}>" for player in missing_players)
-                    
-                    embed = nextcord.Embed(title="Join the server", description=description, color=color)
-                    
-                    view = abandon_view if overtime > force_abandon_view_delay else None
-                    if elapsed_time % message_post_interval < message_update_interval:
-                        
-                        self.players = await self.bot.store.get_players(self.match_id)
-                        self.compute_user_platform_map()
-                        
-                        if current_message:
-                            try:
-                                await current_message.delete()
-                            except nextcord.NotFound:
-                                pass
-                        
-                        mention = False
-                        if player_mention_delays and elapsed_time > player_mention_delays[0]:
-                            player_mention_delays.pop(0)
-                            mention = True
-                        
-                        current_message = await self.match_channel.send(view=view, embed=embed, content=mentions if mention else None)
-                    elif current_message:
+            server_scores = score_servers(regions, users, rcon_servers)
+            server_options = server_scores.ranked() if server_scores else []
+
+        for serv in server_options:
+            log.info(f"{serv[0].id} - {serv[0].region}\n{serv[1]:.2f}")
+        for server, _ in server_options:
+            serveraddr = f'{server.host}:{server.port}'
+            if serveraddr in self.bot.server_choices.taken: continue
+            successful = await self.bot.rcon_manager.add_server(
+                cast(str, server.host), cast(int, server.port), cast(str, server.password))
+            if successful and self.bot.server_choices.claim(serveraddr):
+                log.info(f"[{self.match_id}] Server found running rcon server {server.host}:{server.port} password: {server.password} region: {server.region}")
+                self.server = server
+                self.serveraddr = serveraddr
+                await self.bot.store.set_serveraddr(self.match_id, self.serveraddr)
+                await self.bot.store.use_server(self.serveraddr)
+                return MatchState.SET_SERVER_MODS
+        await self.show_no_server_found_message()
+        return None
+
+    async def on_set_server_mods(self) -> MatchState:
+        await self.machine.flush()
+        self.match = await self.bot.store.get_match(self.match_id)
+        mods = await self.bot.store.get_mods(self.guild_id)
+        await self.bot.rcon_manager.clear_mods(self.serveraddr)
+        results = await self.bot.rcon_manager.add_mods(self.serveraddr, [cast(str, mod.resource_id) for mod in mods])
+        for mod, result in zip(mods, results):
+            if result is None:
+                log.warning(f"[{self.match_id}] Failed to add mod {mod.mod} ({mod.resource_id})")
+        return MatchState.MATCH_CHANGE_TO_LOBBY
+
+    async def on_change_to_lobby(self) -> MatchState:
+        pin = 5
+        server_name = f"PMM Match {self.match_id}"
+        addr = self.serveraddr
+        await asyncio.gather(
+            self.bot.rcon_manager.set_teamdeathmatch(addr, SERVER_DM_MAP),
+            self.bot.rcon_manager.unban_all_players(addr),
+            self.bot.rcon_manager.comp_mode(addr, state=True),
+            self.bot.rcon_manager.max_players(addr, MATCH_PLAYER_COUNT),
+            self.bot.rcon_manager.set_pin(addr, str(pin)),
+            self.bot.rcon_manager.set_name(addr, server_name)
+        )
+
+        embed = nextcord.Embed(title=f"Match [0/{MATCH_PLAYER_COUNT}]", description=f"Server ready!", color=VALORS_THEME1)
+        embed.set_image(self.match_map.media)
+        embed.add_field(name=f"Team A - {self.match_sides[0]}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A]))
+        embed.add_field(name=f"Team B - {self.match_sides[1]}", 
+            value='\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B]))
+        embed.add_field(name="TDM Server", value=f"`{server_name}`", inline=False)
+        embed.add_field(name="Pin", value=f"`{pin}`")
+        embed.add_field(name=f"{self.match_map.map}:", value="\u200B", inline=False)
+        self.bot.messages.edit(self.match_channel, self.match.match_message, Lane.CRITICAL, embed=embed)
+        return MatchState.MATCH_WAIT_FOR_PLAYERS
+
+    async def on_wait_for_players(self) -> MatchState:
+        embed = (await self.bot.messages.embeds(self.match_channel, self.match.match_message))[0]
+        current_players = set()
+        server_players = set()
+        done_event = asyncio.Event()
+        warnings_issued = {}
+        abandon_view = ForceAbandonView(self.bot, self.match)
+
+        async def run_matchmaking_timer():
+            current_message: nextcord.Message | None = None
+            start_time = time()
+            end_time = start_time + float(cast(int, self.settings.mm_join_period)) + 1.0
+            message_update_interval = 10
+            message_post_interval = 60
+            force_abandon_view_delay = 300
+            player_mention_delays = sorted([cast(int, self.settings.mm_join_period) - 120, cast(int, self.settings.mm_join_period) - 60, cast(int, self.settings.mm_join_period)])
+
+            def get_missing_players():
+                return [p for p in self.players if not any(m.platform_id in server_players for m in p.user_platform_mappings)]
+
+            while not done_event.is_set():
+                missing_players = get_missing_players()
+                abandon_view.missing_players = missing_players
+
+                current_time = time()
+                elapsed_time = current_time - start_time
+                remaining_time = end_time - current_time
+                overtime = current_time - end_time + 1
+
+                if current_time < end_time:
+                    description = f"## {format_duration(remaining_time)}\nFailure to abide will result in moderative actions."
+                    color = 0xff0000
+                else:
+                    description = f"You are {format_duration(overtime)} late and have gained a warning."
+                    color = 0xff6600
+
+                    for player in missing_players:
+                        if player.user_id not in warnings_issued:
+                            warnings_issued[player.user_id] = { 'warn_id': None }
+                            log.info(f"{player.user_id} was issued a warning for being {format_duration(overtime)} late to a match.")
+                        warnings_issued[player.user_id]['overtime'] = overtime
+                        warnings_issued[player.user_id]['warn_id'] = await self.bot.store.upsert_warning(
+                            guild_id=self.guild_id,
+                            user_id=player.user_id,
+                            message=f"Late by {format_duration(overtime)}",
+                            match_id=self.match_id,
+                            warn_type=Warn.LATE,
+                            identifier=warnings_issued[player.user_id]['warn_id'])
+
+                mentions = None
+                if missing_players:
+                    mentions = "\n".join(f"‼️ <@{player.user_id}>" for player in missing_players)
+
+                embed = nextcord.Embed(title="Join the server", description=description, color=color)
+
+                view = abandon_view if overtime > force_abandon_view_delay else None
+                if elapsed_time % message_post_interval < message_update_interval:
+
+                    self.players = await self.bot.store.get_players(self.match_id)
+                    self.compute_user_platform_map()
+
+                    if current_message:
                         try:
-                            await current_message.edit(view=view, embed=embed, content=mentions)
-                        except Exception:
+                            await current_message.delete()
+                        except nextcord.NotFound:
                             pass
-                    
-                    await asyncio.sleep(max(message_update_interval - (time() - current_time), 0))
-                
-                try: await current_message.delete()
-                except nextcord.NotFound: pass
-            
-            timer_task = asyncio.create_task(run_matchmaking_timer())
-            self.subtasks.add(timer_task)
-            
-            check_second_time_zero = False
-            
-            try:
+
+                    mention = False
+                    if player_mention_delays and elapsed_time > player_mention_delays[0]:
+                        player_mention_delays.pop(0)
+                        mention = True
+
+                    current_message = await self.match_channel.send(view=view, embed=embed, content=mentions if mention else None)
+                elif current_message:
+                    try:
+                        await current_message.edit(view=view, embed=embed, content=mentions)
+                    except Exception:
+                        pass
+
+                await asyncio.sleep(max(message_update_interval - (time() - current_time), 0))
+
+            try: await current_message.delete()
+            except nextcord.NotFound: pass
+
+        timer_task = asyncio.create_task(run_matchmaking_timer())
+        self.subtasks.add(timer_task)
+
+        check_second_time_zero = False
+
+        try:
+            async with self.machine.rcon_events(self.bot.rcon_poller.subscribe(self.serveraddr)):
                 while len(server_players) < MATCH_PLAYER_COUNT:
                     if not check_second_time_zero and len(server_players) > 0:
                         check_second_time_zero = True
-                    
-                    await asyncio.sleep(3)
+
+                    event = await self.machine.next_event()
+                    if event.kind != "rcon": continue
+                    tick = event.payload
                     try:
-                        players_data = await self.bot.rcon_manager.inspect_all(self.serveraddr, retry_attempts=1)
+                        players_data = tick.inspect_all
                         if check_second_time_zero and ('InspectList' not in players_data or len(players_data['InspectList']) == 0):
                             log.warning(f"[{self.match_id}] Went back to 0/10\nplayers_data: {players_data}")
-                        
+
                         if 'InspectList' not in players_data:
                             continue
-                        
-                        
+
+
                         current_players = {str(player['UniqueId']) for player in players_data['InspectList']}
-                        
+
                         new_players = current_players - server_players
                         if new_players:
                             if len(current_players) < MATCH_PLAYER_COUNT:
@@ -1028,7 +1027,7 @@ class Match:
                             else:
                                 embed.title = "Match"
                                 embed.description = "Match started"
-                            await match_message.edit(embed=embed)
+                            self.bot.messages.edit(self.match_channel, self.match.match_message, embed=embed)
                             log.info(f"[{self.match_id}] New players joined: {new_players}")
 
                             tasks = []
@@ -1041,7 +1040,7 @@ class Match:
                                 else:
                                     log.info(f"[{self.match_id}] Unauthorized player {platform_id} found. Kicking.")
                                     tasks.append(self.bot.rcon_manager.kick_player(self.serveraddr, platform_id))
-                            
+
                             if tasks:
                                 await asyncio.gather(*tasks)
 
@@ -1051,95 +1050,104 @@ class Match:
                         _, line_number, func_name, _ = tb[-1]
                         log.warning(f"[{self.match_id}] [{func_name}:{line_number}] Error during wait_for_players: {repr(e)}")
                         print("[players_data] ", players_data)
-            finally:
-                done_event.set()
-                self.subtasks.discard(timer_task)
-                
-            
-            async def notify_user(embed: nextcord.Embed):
-                try:
-                    await self.bot.get_user(uid).send(embed=embed)
-                except (nextcord.Forbidden, nextcord.HTTPException):
-                    pass
+        finally:
+            done_event.set()
+            self.subtasks.discard(timer_task)
 
-            for uid, data in warnings_issued.items():
-                embed = nextcord.Embed(
-                    title="You were issued a warning", 
-                    description=f"You gained a warning for being late by {format_duration(data['overtime'])} to Match #{self.match_id}.", 
-                    color=0xff6600)
-                try:
-                    asyncio.create_task(notify_user(embed))
-                except Exception:
-                    pass
-            
-            await abandon_view.wait_abandon()
-            await self.increment_state()
-        
-        if check_state(MatchState.MATCH_START_SND):
-            server_maps = await self.bot.rcon_manager.list_maps(self.serveraddr)
-            await self.bot.rcon_manager.add_map(self.serveraddr, 
-                str(match_map.resource_id) if str(match_map.resource_id) else str(match_map.map), 'SND')
-            
-            for ma in server_maps.get('MapList', []):
-                await self.bot.rcon_manager.remove_map(self.serveraddr, ma['MapId'], ma['GameMode'], retry_attempts=3)
-            await self.bot.rcon_manager.set_searchndestroy(self.serveraddr, 
-                str(match_map.resource_id) if str(match_map.resource_id) else str(match_map.map))
-            log.info(f"[{self.match_id}] Switching to SND")
 
-            embed = nextcord.Embed(title="Match started!", description="May the best team win!", color=VALORS_THEME1)
-            
-            for player in self.players:
-                member = guild.get_member(cast(int, player.user_id))
-                if member and member.voice and member.voice.channel.id == settings.mm_voice_channel:
-                    await asyncio.sleep(0.1)
-                    try:
-                        if player.team == Team.A:
-                            await member.move_to(a_vc)
-                        if player.team == Team.B:
-                            await member.move_to(b_vc)
-                    except nextcord.HTTPException: pass
-            
-            await self.match_channel.send(embed=embed)
-            await self.increment_state()
-        
-        if check_state(MatchState.LOG_MATCH_HAPPENING):
-            embed = log_message.embeds[0]
-            embed.description = "Match just started"
-            log_message = await log_message.edit(embed=embed)
-            await self.increment_state()
-
-        if check_state(MatchState.MATCH_WAIT_FOR_END):
-            a_score = 0 if self.match.a_score is None else cast(int, self.match.a_score)
-            b_score = 0 if self.match.b_score is None else cast(int, self.match.b_score)
-            if self.match.b_side == Side.CT:    team_scores = [b_score, a_score]
-            else:                               team_scores = [a_score, b_score]
-            
-            disconnection_tracker = { player.user_id: 0 for player in self.players }
-            last_round_number = self.match.a_score + self.match.b_score if self.match.a_score else 0
-            players_dict = {}
-            
-            users_summary_data = await self.bot.store.get_users_summary_stats(self.guild_id, [p.user_id for p in self.players])
+        async def notify_user(embed: nextcord.Embed):
+            try:
+                await self.bot.get_user(uid).send(embed=embed)
+            except (nextcord.Forbidden, nextcord.HTTPException):
+                pass
+
+        for uid, data in warnings_issued.items():
+            embed = nextcord.Embed(
+                title="You were issued a warning", 
+                description=f"You gained a warning for being late by {format_duration(data['overtime'])} to Match #{self.match_id}.", 
+                color=0xff6600)
+            try:
+                asyncio.create_task(notify_user(embed))
+            except Exception:
+                pass
+
+        await abandon_view.wait_abandon()
+        return MatchState.MATCH_START_SND
+
+    async def on_start_snd(self) -> MatchState:
+        server_maps = await self.bot.rcon_manager.list_maps(self.serveraddr)
+        await self.bot.rcon_manager.add_map(self.serveraddr, 
+            str(self.match_map.resource_id) if str(self.match_map.resource_id) else str(self.match_map.map), 'SND')
+
+        for ma in server_maps.get('MapList', []):
+            await self.bot.rcon_manager.remove_map(self.serveraddr, ma['MapId'], ma['GameMode'], retry_attempts=3)
+        await self.bot.rcon_manager.set_searchndestroy(self.serveraddr, 
+            str(self.match_map.resource_id) if str(self.match_map.resource_id) else str(self.match_map.map))
+        log.info(f"[{self.match_id}] Switching to SND")
+
+        embed = nextcord.Embed(title="Match started!", description="May the best team win!", color=VALORS_THEME1)
+
+        for player in self.players:
+            member = self.guild.get_member(cast(int, player.user_id))
+            if member and member.voice and member.voice.channel.id == self.settings.mm_voice_channel:
+                await asyncio.sleep(0.1)
+                try:
+                    if player.team == Team.A:
+                        await member.move_to(self.a_vc)
+                    if player.team == Team.B:
+                        await member.move_to(self.b_vc)
+                except nextcord.HTTPException: pass
+
+        await self.match_channel.send(embed=embed)
+        return MatchState.LOG_MATCH_HAPPENING
+
+    async def on_log_match_happening(self) -> MatchState:
+        embed = (await self.bot.messages.embeds(self.log_channel, self.match.log_message))[0]
+        embed.description = "Match just started"
+        self.bot.messages.edit(self.log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
+        return MatchState.MATCH_WAIT_FOR_END
+
+    async def on_wait_for_end(self) -> MatchState:
+        a_score = 0 if self.match.a_score is None else cast(int, self.match.a_score)
+        b_score = 0 if self.match.b_score is None else cast(int, self.match.b_score)
+        if self.match.b_side == Side.CT:    team_scores = [b_score, a_score]
+        else:                               team_scores = [a_score, b_score]
+
+        disconnection_tracker = { player.user_id: 0 for player in self.players }
+        last_round_number = self.match.a_score + self.match.b_score if self.match.a_score else 0
+        players_dict = {}
+
+        users_summary_data = await self.bot.store.get_users_summary_stats(self.guild_id, [p.user_id for p in self.players])
+        snapshot_stats = self.snapshot.stats()
+        if not self.snapshot.get('finalizing') and all(cast(int, p.user_id) in snapshot_stats for p in self.players):
+            self.persistent_player_stats = snapshot_stats
+            self.current_round = self.snapshot.get('round', self.current_round)
+        else:
             match_stats = await self.bot.store.get_match_stats(self.match_id)
             self.initialize_user_match_stats(match_stats, users_summary_data)
+            self.snapshot.save_stats(self.persistent_player_stats)
 
-            a_side = 'T' if self.match.b_side == Side.CT else 'CT'
-            b_side = 'CT' if self.match.b_side == Side.CT else 'T'
-            a_player_list = '\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A])
-            b_player_list = '\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B])
+        a_side = 'T' if self.match.b_side == Side.CT else 'CT'
+        b_side = 'CT' if self.match.b_side == Side.CT else 'T'
+        a_player_list = '\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.A])
+        b_player_list = '\n'.join([f"- <@{player.user_id}>" for player in self.players if player.team == Team.B])
 
-            max_score = max(a_score, b_score)
-            if max_score < 10:
-                await self.wait_for_snd_mode()
+        max_score = max(a_score, b_score)
+        if max_score < 10:
+            await self.wait_for_snd_mode()
 
-            ready_to_continue = False
-            reply = None
+        ready_to_continue = False
+        reply = None
+        async with self.machine.rcon_events(self.bot.rcon_poller.subscribe(self.serveraddr)):
             while not ready_to_continue:
                 if max_score >= 10:
                     ready_to_continue = True
-                await asyncio.sleep(3)
+                event = await self.machine.next_event()
+                if event.kind != "rcon": continue
+                tick = event.payload
                 try:
                     if max(a_score, b_score) < 10:
-                        reply = (await self.bot.rcon_manager.server_info(self.serveraddr))['ServerInfo']
+                        reply = tick.server_info['ServerInfo']
                         if "Team0Score" not in reply: continue
                         team_scores = [int(reply['Team0Score']), int(reply['Team1Score'])]
                         self.current_round = int(reply.get('Round', self.current_round))
@@ -1150,132 +1158,116 @@ class Match:
                     is_new_round = self.current_round > last_round_number
                     if is_new_round:
                         last_round_number = self.current_round
-                        embed = log_message.embeds[0]
-                        embed.description = f"\\- ***Match ongoing***\n{generate_score_text(guild, self.persistent_player_stats)}"
+                        embed = (await self.bot.messages.embeds(self.log_channel, self.match.log_message))[0]
+                        embed.description = f"\\- ***Match ongoing***\n{generate_score_text(self.guild, self.persistent_player_stats)}"
                         a_score, b_score = (team_scores[1], team_scores[0]) if self.match.b_side == Side.CT else (team_scores[0], team_scores[1])
                         asyncio.create_task(self.bot.store.update(MMBotMatches, id=self.match_id, a_score=a_score, b_score=b_score))
                         if max_score >= 10:
                             embed.description = f"{'A' if a_score > b_score else 'B'} Wins!"
                         embed.set_field_at(0, name=f"[{self.match.a_mmr:.0f}]Team A - {a_side}: {a_score}", value=a_player_list)
                         embed.set_field_at(1, name=f"[{self.match.b_mmr:.0f}]Team B - {b_side}: {b_score}", value=b_player_list)
-                        asyncio.create_task(log_message.edit(embed=embed))
+                        self.bot.messages.edit(self.log_channel, self.match.log_message, embed=embed)
                         log.info(f"[{self.match_id}] Round {self.current_round} completed. Scores: {team_scores[0]} - {team_scores[1]}")
 
-                    players_data = await self.bot.rcon_manager.inspect_all(self.serveraddr, retry_attempts=1)
+                    players_data = tick.inspect_all
                     if not 'InspectList' in players_data: continue
                     players_dict = { player['UniqueId']: player for player in players_data['InspectList'] }
 
                     await self.process_players(players_dict, disconnection_tracker, is_new_round)
-                    
+
                 except Exception as e:
                     tb = traceback.extract_tb(e.__traceback__)
                     _, line_number, func_name, _ = tb[-1]
                     log.warning(f"[{self.match_id}] [{func_name}:{line_number}] Error during match: {repr(e)}")
                     print("[Reply] ", reply)
-            
-            await self.finalize_match(users_summary_data, team_scores)
-            
-            await self.update_network_latencies()
-            
-            player_stats = lambda p: self.persistent_player_stats[cast(int, p.user_id)]
-            
-            embed = log_message.embeds[0]
-            embed.description = f"{'A' if a_score > b_score else 'B'} Wins!"
-            a_player_list = '\n'.join([
-                f"{n}. Δ{player_stats(player)['mmr_change']:+02.1f} <@{player.user_id}>{users_summary_data[player.user_id].momentum:.1f}"
-                for n, player in enumerate(
-                    sorted(self.players,
-                        key=lambda p: player_stats(p)['score'], reverse=True), start=1)
-                if player.team == Team.A
-            ])
-
-            b_player_list = '\n'.join([
-                f"{n}. Δ{player_stats(player)['mmr_change']:+02.1f} <@{player.user_id}>{users_summary_data[player.user_id].momentum:.1f}"
-                for n, player in enumerate(
-                    sorted(self.players,
-                        key=lambda p: player_stats(p)['score'], reverse=True), start=1)
-                if player.team == Team.B
-            ])
-
-            embed.set_field_at(0, name=f"[{self.match.a_mmr:.0f}]Team A - {a_side}: {a_score}", value=a_player_list)
-            embed.set_field_at(1, name=f"[{self.match.b_mmr:.0f}]Team B - {b_side}: {b_score}", value=b_player_list)
-            asyncio.create_task(log_message.edit(embed=embed))
-
-            await self.increment_state()
-        
-        if check_state(MatchState.MATCH_CLEANUP):
-            pin = "5"
-            server_name = f"PMM {server.region} Server {server.id}"
-            await self.bot.rcon_manager.set_name(self.serveraddr, server_name)
-            await self.bot.rcon_manager.set_pin(self.serveraddr, pin)
-            await self.bot.rcon_manager.add_map(self.serveraddr, SERVER_DM_MAP, 'TDM')
-            await self.bot.rcon_manager.remove_map(self.serveraddr, 
-                str(match_map.resource_id) if str(match_map.resource_id) else str(match_map.map), 'SND')
-            await self.bot.rcon_manager.set_teamdeathmatch(self.serveraddr, SERVER_DM_MAP)
-            await self.bot.rcon_manager.comp_mode(self.serveraddr, state=False)
-            await self.bot.rcon_manager.clear_mods(self.serveraddr)
-            await self.bot.rcon_manager.max_players(self.serveraddr, 10)
-            await self.increment_state()
-        
-        if check_state(MatchState.LOG_END):
-            self.match = await self.bot.store.get_match(self.match_id)
-            match_stats = await self.bot.store.get_match_stats(self.match_id)
-            try:
-                leaderboard_image = await generate_score_image(self.bot.cache, guild, self.match, match_stats)
-                file = nextcord.File(BytesIO(leaderboard_image), filename=f"Match_{self.match_id}_leaderboard.png")
-                await log_message.edit(file=file)
-            except Exception as e:
-                log.error(f"[{self.match_id}] Error in creating score leaderboard image: {repr(e)}")
-            await self.increment_state()
-        
-        if check_state(MatchState.CLEANUP):
-            if self.serveraddr:
-                await self.bot.store.free_server(self.serveraddr)
-                await self.bot.rcon_manager.unban_all_players(self.serveraddr, retry_attempts=1)
-                await self.bot.rcon_manager.comp_mode(self.serveraddr, state=False, retry_attempts=1)
-            embed = nextcord.Embed(title="The match is terminating", color=VALORS_THEME1)
-            embed.set_footer(text="You will be able to requeue once this channel is deleted")
-            
-            try:
-                await self.match_channel.send(embed=embed)
-            except AttributeError:
-                pass
-            
-            asyncio.create_task(update_leaderboard(self.bot.store, guild))
-            await self.bot.store.update(MMBotMatches, id=self.match_id, end_timestamp=datetime.now(timezone.utc))
-            # a_channel
-            try:
-                if a_channel: await a_channel.delete()
-            except nextcord.HTTPException: pass
-            # b_channel
-            try:
-                if b_channel: await b_channel.delete()
-            except nextcord.HTTPException: pass
-            # move users back
-            voice_channel = guild.get_channel(cast(int, settings.mm_voice_channel))
-            for player in self.players:
-                member = guild.get_member(cast(int, player.user_id))
-                if member and member.voice and member.voice.channel in [a_vc, b_vc]:
-                    await asyncio.sleep(0.1)
-                    try: await member.move_to(voice_channel)
-                    except nextcord.HTTPException: pass
-            # a_vc
-            try:
-                if a_vc: await a_vc.delete()
-            except nextcord.HTTPException: pass
-            # b_vc
-            try:
-                if b_vc: await b_vc.delete()
-            except nextcord.HTTPException: pass
 
-            # match_channel
-            try:
-                if self.match_channel: await self.match_channel.delete()
-            except nextcord.HTTPException: pass
+        await self.finalize_match(users_summary_data, team_scores)
+
+        await self.update_network_latencies()
+
+        player_stats = lambda p: self.persistent_player_stats[cast(int, p.user_id)]
+
+        embed = (await self.bot.messages.embeds(self.log_channel, self.match.log_message))[0]
+        embed.description = f"{'A' if a_score > b_score else 'B'} Wins!"
+        a_player_list = '\n'.join([
+            f"{n}. Δ{player_stats(player)['mmr_change']:+02.1f} <@{player.user_id}>{users_summary_data[player.user_id].momentum:.1f}"
+            for n, player in enumerate(
+                sorted(self.players,
+                    key=lambda p: player_stats(p)['score'], reverse=True), start=1)
+            if player.team == Team.A
+        ])
+
+        b_player_list = '\n'.join([
+            f"{n}. Δ{player_stats(player)['mmr_change']:+02.1f} <@{player.user_id}>{users_summary_data[player.user_id].momentum:.1f}"
+            for n, player in enumerate(
+                sorted(self.players,
+                    key=lambda p: player_stats(p)['score'], reverse=True), start=1)
+            if player.team == Team.B
+        ])
+
+        embed.set_field_at(0, name=f"[{self.match.a_mmr:.0f}]Team A - {a_side}: {a_score}", value=a_player_list)
+        embed.set_field_at(1, name=f"[{self.match.b_mmr:.0f}]Team B - {b_side}: {b_score}", value=b_player_list)
+        self.bot.messages.edit(self.log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
+
+        return MatchState.MATCH_CLEANUP
+
+    async def on_match_cleanup(self) -> MatchState:
+        pin = "5"
+        server_name = f"PMM {self.server.region} Server {self.server.id}"
+        await self.bot.rcon_manager.set_name(self.serveraddr, server_name)
+        await self.bot.rcon_manager.set_pin(self.serveraddr, pin)
+        await self.bot.rcon_manager.add_map(self.serveraddr, SERVER_DM_MAP, 'TDM')
+        await self.bot.rcon_manager.remove_map(self.serveraddr, 
+            str(self.match_map.resource_id) if str(self.match_map.resource_id) else str(self.match_map.map), 'SND')
+        await self.bot.rcon_manager.set_teamdeathmatch(self.serveraddr, SERVER_DM_MAP)
+        await self.bot.rcon_manager.comp_mode(self.serveraddr, state=False)
+        await self.bot.rcon_manager.clear_mods(self.serveraddr)
+        await self.bot.rcon_manager.max_players(self.serveraddr, 10)
+        return MatchState.LOG_END
+
+    async def on_log_end(self) -> MatchState:
+        self.match = await self.bot.store.get_match(self.match_id)
+        match_stats = await self.bot.store.get_match_stats(self.match_id)
+        try:
+            leaderboard_image = await self.bot.render_cache.cached(
+                score_image_key(self.match_id, match_stats),
+                lambda: generate_score_image(self.bot.avatars, self.guild, self.match, match_stats))
+            file = nextcord.File(BytesIO(leaderboard_image), filename=f"Match_{self.match_id}_leaderboard.png")
+            await self.bot.messages.edit(self.log_channel, self.match.log_message, Lane.CRITICAL, file=file)
+        except Exception as e:
+            log.error(f"[{self.match_id}] Error in creating score leaderboard image: {repr(e)}")
+        return MatchState.CLEANUP
 
-            # complete True
-            await self.bot.store.update(MMBotMatches, id=self.match_id, complete=True)
-            await self.increment_state()
+    async def on_cleanup(self) -> MatchState:
+        if self.serveraddr:
+            await self.bot.store.free_server(self.serveraddr)
+            self.bot.server_choices.release(self.serveraddr)
+            await self.bot.rcon_manager.unban_all_players(self.serveraddr, retry_attempts=1)
+            await self.bot.rcon_manager.comp_mode(self.serveraddr, state=False, retry_attempts=1)
+        embed = nextcord.Embed(title="The match is terminating", color=VALORS_THEME1)
+        embed.set_footer(text="You will be able to requeue once this channel is deleted")
+
+        try:
+            await self.match_channel.send(embed=embed)
+        except AttributeError:
+            pass
 
-            if self.requeue_players:
-                await self.start_requeue_players(settings)
+        asyncio.create_task(self.bot.leaderboard.publish(self.guild))
+        await self.bot.store.update(MMBotMatches, id=self.match_id, end_timestamp=datetime.now(timezone.utc))
+        await self.bot.provisioner.teardown(self.guild, self.players, [self.a_vc, self.b_vc], 
+            self.guild.get_channel(cast(int, self.settings.mm_voice_channel)), [self.a_channel, self.b_channel, self.match_channel])
+
+        # complete True
+        await self.bot.store.update(MMBotMatches, id=self.match_id, complete=True)
+        self.bot.queue_manager.release_match_players([cast(int, p.user_id) for p in self.players])
+        self.bot.messages.forget(self.match.log_message)
+        self.bot.messages.forget(self.match.match_message)
+        return MatchState.FINISHED
+
+    async def on_finished(self) -> None:
+        await self.machine.flush()
+        self.snapshot.delete()
+
+        if self.requeue_players:
+            await self.start_requeue_players(self.settings)
+        return None
@@ -0,0 +1,55 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import List, Tuple
+
+from utils.models import MMBotMaps, MMBotMatches, MMBotMatchPlayers, RconServers, Side
+
+
+class MatchContext:
+    def __init__(self, 
+        match: MMBotMatches, 
+        players: List[MMBotMatchPlayers], 
+        maps: List[MMBotMaps], 
+        last_maps: List[str], 
+        server: RconServers | None
+    ):
+        self.match      = match
+        self.players    = players
+        self.maps       = maps
+        self.last_maps  = last_maps
+        self.server     = server
+    
+    @property
+    def active_maps(self) -> List[MMBotMaps]:
+        return [m for m in self.maps if m.active]
+    
+    def get_maps(self, maps: List[str]) -> List[MMBotMaps]:
+        return [m for m in self.maps if m.map in maps]
+    
+    @property
+    def match_map(self) -> MMBotMaps | None:
+        if not self.match.map:
+            return None
+        return next((m for m in self.maps if m.map == self.match.map), None)
+
+    @property
+    def match_sides(self) -> Tuple[str, str]:
+        b_side = self.match.b_side
+        a_side = Side.CT if b_side == Side.T else Side.T
+        return (str(a_side), str(b_side))
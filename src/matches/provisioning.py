@@ -0,0 +1,115 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+from typing import Dict, Iterable, List, TYPE_CHECKING, cast
+if TYPE_CHECKING:
+    from main import Bot
+
+import nextcord
+
+from config import PROVISION_CONCURRENCY
+from utils.logger import Logger as log
+from utils.models import MMBotMatches, MMBotMatchPlayers, Team
+
+# (match column, team, voice)
+TEAM_RESOURCES = (
+    ("a_vc",     Team.A, True),
+    ("b_vc",     Team.B, True),
+    ("a_thread", Team.A, False),
+    ("b_thread", Team.B, False),
+)
+
+
+def team_overwrites(guild: nextcord.Guild, category: nextcord.CategoryChannel, players: Iterable[MMBotMatchPlayers], team: Team, voice: bool):
+    overwrites = category.overwrites | {
+        guild.get_member(cast(int, player.user_id)):
+            nextcord.PermissionOverwrite(
+                view_channel=True, send_messages=True, speak=True, stream=True, connect=True
+            ) for player in players if player.team == team
+    }
+    for overwrite, perms in reversed(overwrites.items()):
+        if isinstance(overwrite, nextcord.Role) and perms.view_channel:
+            overwrites.update({ overwrite: 
+                nextcord.PermissionOverwrite(view_channel=True, connect=True, speak=False, stream=False) if voice 
+                else nextcord.PermissionOverwrite(view_channel=False) })
+            break
+    return overwrites
+
+
+class MatchProvisioner:
+    def __init__(self, bot: "Bot", concurrency: int=PROVISION_CONCURRENCY):
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def provision(self, 
+        match_id: int, 
+        guild: nextcord.Guild, 
+        category: nextcord.CategoryChannel, 
+        players: List[MMBotMatchPlayers], 
+        existing: Dict[str, nextcord.abc.GuildChannel | None]
+    ) -> Dict[str, nextcord.abc.GuildChannel]:
+        async def create(field: str, team: Team, voice: bool):
+            name = f"[{match_id}] Team {team.name}"
+            overwrites = team_overwrites(guild, category, players, team, voice)
+            async with self.semaphore:
+                if voice:
+                    channel = await category.create_voice_channel(
+                        name=name, overwrites=overwrites, reason=name, rtc_region=nextcord.VoiceRegion.us_east)
+                else:
+                    channel = await category.create_text_channel(name=name, overwrites=overwrites, reason=name)
+            await self.bot.store.update(MMBotMatches, id=match_id, **{ field: channel.id })
+            return field, channel
+
+        missing = [spec for spec in TEAM_RESOURCES if not existing.get(spec[0])]
+        results = await asyncio.gather(*(create(*spec) for spec in missing), return_exceptions=True)
+
+        channels = { field: channel for field, channel in existing.items() if channel }
+        errors = []
+        for result in results:
+            if isinstance(result, BaseException): errors.append(result)
+            else: channels[result[0]] = result[1]
+        if errors:
+            log.error(f"[{match_id}] Failed to provision {len(errors)}/{len(missing)} match channels")
+            raise errors[0]
+        return channels
+
+    async def teardown(self, 
+        guild: nextcord.Guild, 
+        players: List[MMBotMatchPlayers], 
+        voice_channels: List[nextcord.VoiceChannel | None], 
+        destination: nextcord.VoiceChannel | None, 
+        channels: List[nextcord.abc.GuildChannel | None]
+    ):
+        async def move(member: nextcord.Member):
+            async with self.semaphore:
+                try: await member.move_to(destination)
+                except nextcord.HTTPException: pass
+
+        async def delete(channel: nextcord.abc.GuildChannel):
+            async with self.semaphore:
+                try: await channel.delete()
+                except nextcord.HTTPException: pass
+
+        voice_channels = [vc for vc in voice_channels if vc]
+        members = [member for p in players 
+            if (member := guild.get_member(cast(int, p.user_id))) 
+            and member.voice and member.voice.channel in voice_channels]
+        text_channels = [c for c in channels if c and c not in voice_channels]
+
+        await asyncio.gather(*(move(m) for m in members), *(delete(c) for c in text_channels))
+        await asyncio.gather(*(delete(vc) for vc in voice_channels))
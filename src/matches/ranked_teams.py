@@ -17,12 +17,11 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import random
-from itertools import combinations
-from typing import List, Tuple
+from typing import Callable, Dict, List, Tuple, cast
 
 import numpy as np
 
-from utils.models import MMBotUsers
+from utils.models import BotSettings, MMBotUsers, Team
 
 
 def preparing_user_data(users: List[MMBotUsers]) -> Tuple[int, np.ndarray, np.ndarray]:
@@ -31,46 +30,190 @@ def preparing_user_data(users: List[MMBotUsers]) -> Tuple[int, np.ndarray, np.nd
     rankings = np.argsort(mmr_results)[::-1]
     return num_players, mmr_results, rankings
 
-def calculate_team_combinations(n: int, m: int) -> Tuple[int, np.ndarray]:
-    team_combinations_list = np.array(list(combinations(range(n), m)), dtype=np.int32)
-    return len(team_combinations_list), team_combinations_list
-
-def rank_teams_based_on_mmr(team_combinations_list: np.ndarray, mmr_results: np.ndarray) -> Tuple[np.ndarray, float]:
-    team_mmr_avgs = np.mean(mmr_results[team_combinations_list], axis=1)
-    average_team_mmr = np.mean(team_mmr_avgs)
-    team_mmr_deviations = np.abs(team_mmr_avgs - average_team_mmr)
-    team_mmr_rankings = np.argsort(team_mmr_deviations)
-    ranked_team_combinations_list = team_combinations_list[team_mmr_rankings]
-    return ranked_team_combinations_list, float(average_team_mmr)
-
-def find_single_pair(ranked_team_combinations: np.ndarray, n: int, initial_percent: float=2.0) -> Tuple[np.ndarray, np.ndarray]:
-    increment_percent = 2
-    min_options = 5
-
-    while True:
-        idx = int(n * (initial_percent / 100))
-        top_team_combinations = ranked_team_combinations[:idx]
-        possible_pairs = [
-            (top_team_combinations[i], top_team_combinations[j])
-            for i in range(len(top_team_combinations))
-            for j in range(i + 1, len(top_team_combinations))
-            if not set(top_team_combinations[i]) & set(top_team_combinations[j])
-        ]
-
-        if len(possible_pairs) >= min_options or initial_percent > 100:
-            return random.choice(possible_pairs)
-
-        initial_percent += increment_percent
+def subset_sums(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    masks = np.arange(1 << len(values), dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(len(values), dtype=np.int64)) & 1
+    return masks, bits.sum(axis=1), bits @ values.astype(np.int64)
+
+def mask_members(mask: int, offset: int, size: int) -> List[int]:
+    return [offset + i for i in range(size) if mask >> i & 1]
+
+def balanced_splits(mmr_results: np.ndarray, anchor_size: int, top_k: int) -> List[Tuple[np.ndarray, float]]:
+    # Player 0 is always on the anchor team so every split is only seen once,
+    # the opponent is simply the complement. The remaining players are halved
+    # and the subset sums of both halves meet in the middle per subset size.
+    n = len(mmr_results)
+    rest = mmr_results[1:].astype(np.int64)
+    left_size = len(rest) // 2
+    right_size = len(rest) - left_size
+    l_masks, l_sizes, l_sums = subset_sums(rest[:left_size])
+    r_masks, r_sizes, r_sums = subset_sums(rest[left_size:])
+
+    total = int(mmr_results.sum())
+    target = total * anchor_size / n - int(mmr_results[0])
+    window = np.arange(-top_k, top_k, dtype=np.int64)
+
+    cand_l, cand_r, cand_sums = [], [], []
+    for size in range(max(0, anchor_size - 1 - right_size), min(left_size, anchor_size - 1) + 1):
+        l_sel = l_sizes == size
+        r_sel = r_sizes == anchor_size - 1 - size
+        order = np.argsort(r_sums[r_sel], kind='stable')
+        r_sorted_sums = r_sums[r_sel][order]
+        r_sorted_masks = r_masks[r_sel][order]
+
+        need = target - l_sums[l_sel]
+        pos = np.searchsorted(r_sorted_sums, need)
+        idx = np.clip(pos[:, None] + window, 0, len(r_sorted_sums) - 1)
+        cand_l.append(np.broadcast_to(l_masks[l_sel][:, None], idx.shape).ravel())
+        cand_r.append(r_sorted_masks[idx].ravel())
+        cand_sums.append((l_sums[l_sel][:, None] + r_sorted_sums[idx]).ravel())
+
+    l_found = np.concatenate(cand_l)
+    r_found = np.concatenate(cand_r)
+    anchor_sums = np.concatenate(cand_sums) + int(mmr_results[0])
+    _, unique = np.unique(l_found * (1 << right_size) + r_found, return_index=True)
+    l_found, r_found, anchor_sums = l_found[unique], r_found[unique], anchor_sums[unique]
+
+    deviations = np.abs(anchor_sums / anchor_size - (total - anchor_sums) / (n - anchor_size))
+    best = np.argsort(deviations, kind='stable')[:top_k]
+    return [
+        (np.array([0]
+            + mask_members(int(l_found[b]), 1, left_size)
+            + mask_members(int(r_found[b]), 1 + left_size, right_size), dtype=np.int32),
+        float(deviations[b]))
+        for b in best]
+
+def top_team_splits(mmr_results: np.ndarray, top_k: int=5) -> List[Tuple[np.ndarray, np.ndarray, float]]:
+    n = len(mmr_results)
+    everyone = np.arange(n, dtype=np.int32)
+    splits = []
+    for anchor_size in {n // 2, n - n // 2}:
+        for team, deviation in balanced_splits(mmr_results, anchor_size, top_k):
+            splits.append((team, np.setdiff1d(everyone, team), deviation))
+    splits.sort(key=lambda split: split[2])
+    return splits[:top_k]
+
+# Cost terms score every candidate split at once. ``a`` and ``b`` are (splits, players)
+# membership matrices and ``features`` holds per-player arrays, so each term is a
+# handful of matrix products regardless of how many splits are being compared.
+CostTerm = Callable[[np.ndarray, np.ndarray, Dict[str, np.ndarray]], np.ndarray]
+TEAM_COST_TERMS: Dict[str, CostTerm] = {}
+
+DEFAULT_TEAM_WEIGHTS = { 'mmr': 1.0, 'variance': 0.25, 'rtt': 2.0, 'repeat': 5.0 }
+CANDIDATE_SPLITS = 64
+
+
+def team_cost_term(name: str):
+    def decorator(func: CostTerm) -> CostTerm:
+        TEAM_COST_TERMS[name] = func
+        return func
+    return decorator
+
+def team_means(a: np.ndarray, b: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return a @ values / a.sum(axis=1), b @ values / b.sum(axis=1)
+
+@team_cost_term('mmr')
+def mmr_spread(a: np.ndarray, b: np.ndarray, features: Dict[str, np.ndarray]) -> np.ndarray:
+    a_mean, b_mean = team_means(a, b, features['mmr'])
+    return np.abs(a_mean - b_mean)
+
+@team_cost_term('variance')
+def mmr_variance(a: np.ndarray, b: np.ndarray, features: Dict[str, np.ndarray]) -> np.ndarray:
+    # one stacked team against one spread out team plays very differently
+    # even when the averages line up
+    mmr = features['mmr']
+    a_mean, b_mean = team_means(a, b, mmr)
+    a_sq, b_sq = team_means(a, b, mmr ** 2)
+    a_std = np.sqrt(np.maximum(a_sq - a_mean ** 2, 0))
+    b_std = np.sqrt(np.maximum(b_sq - b_mean ** 2, 0))
+    return np.abs(a_std - b_std)
+
+@team_cost_term('rtt')
+def rtt_spread(a: np.ndarray, b: np.ndarray, features: Dict[str, np.ndarray]) -> np.ndarray:
+    if 'rtt' not in features:
+        return np.zeros(len(a))
+    a_mean, b_mean = team_means(a, b, features['rtt'])
+    return np.abs(a_mean - b_mean)
+
+@team_cost_term('repeat')
+def repeat_teammates(a: np.ndarray, b: np.ndarray, features: Dict[str, np.ndarray]) -> np.ndarray:
+    if 'teammates' not in features:
+        return np.zeros(len(a))
+    teammates = features['teammates']
+    return (np.einsum('si,ij,sj->s', a, teammates, a) + np.einsum('si,ij,sj->s', b, teammates, b)) / 2
+
+def score_team_splits(
+    splits: np.ndarray, 
+    features: Dict[str, np.ndarray], 
+    weights: Dict[str, float]
+) -> np.ndarray:
+    a = splits.astype(np.float64)
+    b = 1.0 - a
+    cost = np.zeros(len(splits))
+    for name, weight in weights.items():
+        if weight and name in TEAM_COST_TERMS:
+            cost += weight * TEAM_COST_TERMS[name](a, b, features)
+    return cost
+
+def teammate_matrix(user_ids: List[int], history: List[Tuple[int, int, Team]]) -> np.ndarray:
+    index = { user_id: n for n, user_id in enumerate(user_ids) }
+    teams: Dict[Tuple[int, Team], List[int]] = {}
+    for match_id, user_id, team in history:
+        if user_id in index:
+            teams.setdefault((match_id, team), []).append(index[user_id])
+
+    counts = np.zeros((len(user_ids), len(user_ids)), dtype=np.float64)
+    for members in teams.values():
+        members = np.array(members)
+        counts[np.ix_(members, members)] += 1
+    np.fill_diagonal(counts, 0)
+    return counts
+
+def team_weights_from_settings(settings: BotSettings) -> Dict[str, float]:
+    weights = {}
+    for name, default in DEFAULT_TEAM_WEIGHTS.items():
+        weight = getattr(settings, f"mm_team_{name}_weight", None)
+        weights[name] = default if weight is None else float(weight)
+    return weights
+
+def find_single_pair(
+    mmr_results: np.ndarray, 
+    min_options: int=5, 
+    features: Dict[str, np.ndarray] | None=None, 
+    weights: Dict[str, float] | None=None
+) -> Tuple[np.ndarray, np.ndarray]:
+    if weights is None or set(k for k, w in weights.items() if w) <= {'mmr'}:
+        team1, team2, _ = random.choice(top_team_splits(mmr_results, min_options))
+    else:
+        candidates = top_team_splits(mmr_results, max(CANDIDATE_SPLITS, min_options))
+        splits = np.zeros((len(candidates), len(mmr_results)), dtype=bool)
+        for n, (team, _, _) in enumerate(candidates):
+            splits[n, team] = True
+        features = dict(features or {}, mmr=mmr_results.astype(np.float64))
+        cost = score_team_splits(splits, features, weights)
+        best = np.argsort(cost, kind='stable')[:min_options]
+        team1, team2, _ = candidates[int(random.choice(best))]
+
+    if random.random() < 0.5:
+        return team2, team1
+    return team1, team2
 
 def calculate_average_mmr(team: np.ndarray, mmr_results: np.ndarray) -> float:
     return float(np.mean(mmr_results[team]))
 
-def get_teams(users: List[MMBotUsers]) -> Tuple[List[int], List[int], float, float]:
-    team_size = len(users) // 2
-    num_players, mmr_results, _ = preparing_user_data(users)
-    num_team_combinations, team_combinations_list = calculate_team_combinations(num_players, team_size)
-    ranked_team_combinations, _ = rank_teams_based_on_mmr(team_combinations_list, mmr_results)
-    team1, team2 = find_single_pair(ranked_team_combinations, num_team_combinations)
+def get_teams(
+    users: List[MMBotUsers], 
+    weights: Dict[str, float] | None=None, 
+    rtts: List[float] | None=None, 
+    teammate_history: List[Tuple[int, int, Team]] | None=None
+) -> Tuple[List[int], List[int], float, float]:
+    _, mmr_results, _ = preparing_user_data(users)
+    features = {}
+    if rtts is not None:
+        features['rtt'] = np.array(rtts, dtype=np.float64)
+    if teammate_history:
+        features['teammates'] = teammate_matrix([cast(int, u.user_id) for u in users], teammate_history)
+    team1, team2 = find_single_pair(mmr_results, features=features, weights=weights)
     team1_mmr = calculate_average_mmr(team1, mmr_results)
     team2_mmr = calculate_average_mmr(team2, mmr_results)
     team1_users = [users[t1].user_id for t1 in team1]
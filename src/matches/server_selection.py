@@ -1,6 +1,8 @@
 from math import radians, cos, sin, asin, sqrt
 from typing import List, Tuple, TYPE_CHECKING, Dict, cast
 
+import numpy as np
+
 if TYPE_CHECKING:
     from main import Bot
 
@@ -36,6 +38,12 @@ DEFAULT_UNCERTAINTY = 0.5
 # Triangle inequality violation threshold
 TIV_THRESHOLD_MS = 100
 
+# Offline batch solver: every node sees all of its observations per step,
+# so steps can be larger than the per-match incremental update
+SOLVER_CC = 0.25
+SOLVER_MAX_ITERATIONS = 500
+SOLVER_TOLERANCE_MS = 0.01
+
 
 def haversine(lat_a: float, lon_a: float, lat_b: float, lon_b: float) -> float:
     """Great-circle distance in km. Inputs in degrees. Clamped to prevent domain errors."""
@@ -46,35 +54,78 @@ def haversine(lat_a: float, lon_a: float, lat_b: float, lon_b: float) -> float:
     return 2 * asin(sqrt(a)) * EARTH_RADIUS_KM
 
 
+def haversine_array(lat_a: np.ndarray, lon_a: np.ndarray, lat_b: np.ndarray, lon_b: np.ndarray) -> np.ndarray:
+    """Element-wise great-circle distances in km for broadcastable arrays. Inputs in degrees."""
+    lat_a, lon_a, lat_b, lon_b = map(np.radians, (lat_a, lon_a, lat_b, lon_b))
+    a = np.sin((lat_b - lat_a) / 2.0) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2.0) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) * EARTH_RADIUS_KM
+
+
+def haversine_matrix(lat_a: np.ndarray, lon_a: np.ndarray, lat_b: np.ndarray, lon_b: np.ndarray) -> np.ndarray:
+    """Pairwise great-circle distances in km, shape (len(a), len(b)). Inputs in degrees."""
+    return haversine_array(lat_a[:, None], lon_a[:, None], lat_b[None, :], lon_b[None, :])
+
+
+class ServerScores:
+    """RTT predictions for every user against every server.
+
+    rtts is (users, servers); scores and worst_rtts are per server in the order given.
+    """
+    def __init__(self, servers: List[RconServers], rtts: np.ndarray):
+        self.servers = servers
+        self.rtts = rtts
+        self.scores = HtraeNCS._rtt_to_scores(rtts).mean(axis=0)
+        self.worst_rtts = rtts.max(axis=0)
+
+    def ranked(self) -> List[Tuple[RconServers, float]]:
+        order = np.argsort(-self.scores, kind='stable')
+        return [(self.servers[i], float(self.scores[i])) for i in order]
+
+    def user_rtts(self, server: RconServers) -> List[float]:
+        return self.rtts[:, self.servers.index(server)].tolist()
+
+    def worst_rtt(self, server: RconServers) -> float:
+        return float(self.worst_rtts[self.servers.index(server)])
+
+
 class HtraeNCS:
     @staticmethod
-    async def get_server_scores(
+    def score_servers(
         regions: List[BotRegions],
         users: List[MMBotUsers],
         servers: List[RconServers]
-    ) -> List[Tuple[RconServers, float]]:
+    ) -> ServerScores | None:
         if not users or not servers:
-            return []
-
-        scored_servers = []
-        for server in servers:
-            s_coords = await HtraeNCS._get_coords(regions, server)
+            return None
+        region_map = {r.label: r for r in regions}
+        u_coords = HtraeNCS._coords_array(region_map, users)
+        s_coords = HtraeNCS._coords_array(region_map, servers)
+        u_regions = np.array([user.region or '' for user in users], dtype=object)
+        s_regions = np.array([server.region or '' for server in servers], dtype=object)
+        same_region = (u_regions[:, None] == s_regions[None, :]) & (u_regions != '')[:, None]
+        return ServerScores(servers, HtraeNCS._predict_rtt_matrix(u_coords, s_coords, same_region))
 
-            user_scores = []
-            for user in users:
-                u_coords = await HtraeNCS._get_coords(regions, user)
-                same_region = bool(user.region and user.region == server.region)
-                rtt = HtraeNCS._predict_rtt(u_coords, s_coords, same_region)
-                user_scores.append(HtraeNCS._rtt_to_score(rtt))
-
-            avg_score = sum(user_scores) / len(user_scores) if user_scores else -1.0
-            scored_servers.append((server, avg_score))
+    @staticmethod
+    def _coords_array(
+        region_map: Dict[str, BotRegions],
+        targets: List[MMBotUsers] | List[RconServers]
+    ) -> np.ndarray:
+        return np.array([HtraeNCS._lookup_coords(region_map, target) for target in targets], dtype=np.float64)
 
-        return sorted(scored_servers, key=lambda x: x[1], reverse=True)
+    @staticmethod
+    def _predict_rtt_matrix(
+        u_coords: np.ndarray, s_coords: np.ndarray, same_region: np.ndarray
+    ) -> np.ndarray:
+        distance_km = haversine_matrix(u_coords[:, 0], u_coords[:, 1], s_coords[:, 0], s_coords[:, 1])
+        combined_height = u_coords[:, 2][:, None] + s_coords[:, 2][None, :]
+        combined_height = np.where(
+            same_region & (distance_km < AS_CORRECTION_THRESHOLD_KM),
+            combined_height * AS_HEIGHT_REDUCTION, combined_height)
+        return distance_km * MS_PER_KM + combined_height
 
     @staticmethod
-    async def _get_coords(
-        regions: List[BotRegions],
+    def _lookup_coords(
+        region_map: Dict[str, BotRegions],
         target: MMBotUsers | RconServers
     ) -> Tuple[float, float, float, float]:
         if target.lat is not None and target.lon is not None:
@@ -85,7 +136,7 @@ class HtraeNCS:
                 cast(float, target.uncertainty) if target.uncertainty is not None else DEFAULT_UNCERTAINTY,
             )
 
-        region = {r.label: r for r in regions}.get(target.region)
+        region = region_map.get(cast(str, target.region))
         if region and region.base_latitude is not None and region.base_longitude is not None:
             return (
                 cast(float, region.base_latitude),
@@ -122,6 +173,10 @@ class HtraeNCS:
             return -1.0
         return 0.5 - (rtt - 50) / 100.0
 
+    @staticmethod
+    def _rtt_to_scores(rtts: np.ndarray) -> np.ndarray:
+        return np.where(rtts <= 50, 1.0, np.where(rtts >= 150, -1.0, 0.5 - (rtts - 50) / 100.0))
+
     @staticmethod
     async def update_coordinates(
         bot: "Bot",
@@ -129,7 +184,8 @@ class HtraeNCS:
         server: RconServers,
         user_rtts: List[Tuple[MMBotUsers, float]],
     ) -> None:
-        s_coords = await HtraeNCS._get_coords(regions, server)
+        region_map = {r.label: r for r in regions}
+        s_coords = HtraeNCS._lookup_coords(region_map, server)
         user_updates: Dict[int, Tuple[float, float, float, float]] = {}
         server_deltas = []
 
@@ -137,7 +193,7 @@ class HtraeNCS:
             if measured_rtt <= 0:
                 continue
 
-            u_coords = await HtraeNCS._get_coords(regions, user)
+            u_coords = HtraeNCS._lookup_coords(region_map, user)
             same_region = user.region == server.region
             predicted_rtt = HtraeNCS._predict_rtt(u_coords, s_coords, same_region)
             error = measured_rtt - predicted_rtt
@@ -186,6 +242,138 @@ class HtraeNCS:
                 uncertainty=max(MIN_UNCERTAINTY, min(MAX_UNCERTAINTY, s_coords[3] + avg_delta[3])),
             )
 
+    @staticmethod
+    def solve_coordinates(
+        regions: List[BotRegions],
+        users: List[MMBotUsers],
+        servers: List[RconServers],
+        observations: List[Tuple[int, str, int]],
+        max_iterations: int = SOLVER_MAX_ITERATIONS,
+    ) -> Tuple[Dict[int, Tuple[float, float, float, float]], Dict[int, Tuple[float, float, float, float]], float]:
+        """Fit coordinates to every historical (user_id, serveraddr, ping) observation at once.
+
+        Returns refreshed user coords by user_id, server coords by server id and the final RMS error in ms.
+        """
+        region_map = {r.label: r for r in regions}
+
+        def known(targets):
+            nodes, coords = [], []
+            for target in targets:
+                try:
+                    coords.append(HtraeNCS._lookup_coords(region_map, target))
+                    nodes.append(target)
+                except ValueError: pass
+            return nodes, np.array(coords, dtype=np.float64).reshape(-1, 4)
+
+        users, u_coords = known(users)
+        servers, s_coords = known(servers)
+        user_index = {cast(int, u.user_id): i for i, u in enumerate(users)}
+        server_index = {f"{s.host}:{s.port}": i for i, s in enumerate(servers)}
+        pairs = [
+            (user_index[user_id], server_index[serveraddr], ping)
+            for user_id, serveraddr, ping in observations
+            if user_id in user_index and serveraddr in server_index]
+        if not pairs:
+            return {}, {}, 0.0
+
+        # Collapse repeat samples of the same pair into their mean
+        obs = np.array(pairs, dtype=np.float64)
+        codes = obs[:, 0].astype(np.int64) * len(servers) + obs[:, 1].astype(np.int64)
+        codes, inverse = np.unique(codes, return_inverse=True)
+        measured = np.bincount(inverse, weights=obs[:, 2]) / np.bincount(inverse)
+        u_idx, s_idx = codes // len(servers), codes % len(servers)
+
+        u_regions = np.array([u.region or '' for u in users], dtype=object)[u_idx]
+        s_regions = np.array([s.region or '' for s in servers], dtype=object)[s_idx]
+        same_region = (u_regions == s_regions) & (u_regions != '')
+        u_counts = np.bincount(u_idx, minlength=len(users))
+        s_counts = np.bincount(s_idx, minlength=len(servers))
+
+        def node_mean(index, values, counts):
+            return np.bincount(index, weights=values, minlength=len(counts)) / np.maximum(counts, 1)
+
+        rms, previous = 0.0, None
+        for _ in range(max_iterations):
+            u_obs, s_obs = u_coords[u_idx], s_coords[s_idx]
+            predicted = HtraeNCS._predict_rtt_pairs(u_obs, s_obs, same_region)
+            error = measured - predicted
+            rms = float(np.sqrt(np.mean(error ** 2)))
+            if previous is not None and abs(previous - rms) < SOLVER_TOLERANCE_MS:
+                break
+            previous = rms
+
+            u_new = HtraeNCS._adjust_positions(u_obs, s_obs, measured, error, SOLVER_CC)
+            s_new = HtraeNCS._adjust_positions(s_obs, u_obs, measured, error, SOLVER_CC * SERVER_MOVE_FACTOR)
+            for coords, index, counts, new, old in (
+                (u_coords, u_idx, u_counts, u_new, u_obs),
+                (s_coords, s_idx, s_counts, s_new, s_obs),
+            ):
+                for col in range(3):
+                    coords[:, col] += node_mean(index, new[:, col] - old[:, col], counts)
+                seen = counts > 0
+                coords[seen, 3] = node_mean(index, new[:, 3], counts)[seen]
+                np.clip(coords[:, 0], -90.0, 90.0, out=coords[:, 0])
+                np.clip(coords[:, 1], -180.0, 180.0, out=coords[:, 1])
+                np.clip(coords[:, 2], MIN_HEIGHT_MS, MAX_HEIGHT_MS, out=coords[:, 2])
+
+        user_coords = {
+            cast(int, users[i].user_id): tuple(float(v) for v in u_coords[i])
+            for i in np.flatnonzero(u_counts)}
+        server_coords = {
+            cast(int, servers[i].id): tuple(float(v) for v in s_coords[i])
+            for i in np.flatnonzero(s_counts)}
+        return user_coords, server_coords, rms
+
+    @staticmethod
+    def _predict_rtt_pairs(
+        u_coords: np.ndarray, s_coords: np.ndarray, same_region: np.ndarray
+    ) -> np.ndarray:
+        distance_km = haversine_array(u_coords[:, 0], u_coords[:, 1], s_coords[:, 0], s_coords[:, 1])
+        combined_height = u_coords[:, 2] + s_coords[:, 2]
+        combined_height = np.where(
+            same_region & (distance_km < AS_CORRECTION_THRESHOLD_KM),
+            combined_height * AS_HEIGHT_REDUCTION, combined_height)
+        return distance_km * MS_PER_KM + combined_height
+
+    @staticmethod
+    def _adjust_positions(
+        source: np.ndarray,
+        target: np.ndarray,
+        measured_rtt: np.ndarray,
+        error: np.ndarray,
+        step: float,
+    ) -> np.ndarray:
+        """Row-wise _adjust_position with an explicit step size in place of CC."""
+        s_unc, t_unc = source[:, 3], target[:, 3]
+        total_unc = s_unc + t_unc
+        weight = np.where(total_unc > 0, s_unc / np.where(total_unc > 0, total_unc, 1.0), 0.5)
+        delta = step * weight
+
+        cos_avg_lat = np.maximum(np.cos(np.radians((source[:, 0] + target[:, 0]) / 2.0)), 0.01)
+        km_per_deg_lon = KM_PER_DEG_LAT * cos_avg_lat
+        dlat_km = (source[:, 0] - target[:, 0]) * KM_PER_DEG_LAT
+        dlon_km = (source[:, 1] - target[:, 1]) * km_per_deg_lon
+        flat_dist_km = np.hypot(dlat_km, dlon_km)
+        apart = flat_dist_km > 0.01
+        safe_dist = np.where(apart, flat_dist_km, 1.0)
+
+        move_km = np.clip(delta * error / MS_PER_KM, -MAX_MOVE_KM, MAX_MOVE_KM)
+        nudge = np.where(error > 0, 0.01, -0.01)
+        new_lat = np.where(apart, source[:, 0] + (dlat_km / safe_dist * move_km) / KM_PER_DEG_LAT, source[:, 0] + nudge)
+        new_lon = np.where(apart, source[:, 1] + (dlon_km / safe_dist * move_km) / km_per_deg_lon, source[:, 1] + nudge)
+
+        new_height = np.clip(source[:, 2] + delta * error * 0.25, MIN_HEIGHT_MS, MAX_HEIGHT_MS)
+
+        sample_error = np.abs(error) / np.maximum(1.0, measured_rtt)
+        new_unc = sample_error * CE * weight + s_unc * (1 - CE * weight)
+        new_unc = np.clip(new_unc, MIN_UNCERTAINTY, MAX_UNCERTAINTY)
+
+        return np.column_stack((
+            np.clip(new_lat, -90.0, 90.0),
+            np.clip(new_lon, -180.0, 180.0),
+            new_height,
+            new_unc))
+
     @staticmethod
     def _adjust_position(
         source: tuple,
@@ -257,5 +445,6 @@ class HtraeNCS:
         return (new_lat, new_lon, new_height, new_unc)
 
 
-get_server_scores = HtraeNCS.get_server_scores
+solve_coordinates = HtraeNCS.solve_coordinates
+score_servers = HtraeNCS.score_servers
 update_coordinates = HtraeNCS.update_coordinates
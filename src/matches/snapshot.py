@@ -0,0 +1,88 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+from typing import Any, Dict, Iterable
+
+import redis
+from redis.exceptions import RedisError
+
+from config import MATCH_SNAPSHOT_TTL
+from utils.logger import Logger as log
+
+STATS_PREFIX = "stats:"
+
+
+def snapshot_key(match_id: int) -> str:
+    return f"match_snapshot:{match_id}"
+
+
+class MatchSnapshot:
+    def __init__(self, cache: redis.StrictRedis, match_id: int, data: Dict[str, Any] | None=None):
+        self.cache = cache
+        self.match_id = match_id
+        self.data: Dict[str, Any] = data or {}
+
+    @classmethod
+    def load_many(cls, cache: redis.StrictRedis, match_ids: Iterable[int]) -> Dict[int, "MatchSnapshot"]:
+        match_ids = list(match_ids)
+        try:
+            pipe = cache.pipeline()
+            for match_id in match_ids:
+                pipe.hgetall(snapshot_key(match_id))
+            stored = pipe.execute()
+        except RedisError as e:
+            log.warning(f"Could not load match snapshots: {repr(e)}")
+            stored = [{}] * len(match_ids)
+        
+        snapshots = {}
+        for match_id, raw in zip(match_ids, stored):
+            try: data = { field: json.loads(value) for field, value in raw.items() }
+            except ValueError as e:
+                log.warning(f"[{match_id}] Discarding unreadable snapshot: {repr(e)}")
+                data = {}
+            snapshots[match_id] = cls(cache, match_id, data)
+        return snapshots
+
+    def get(self, field: str, default: Any=None) -> Any:
+        return self.data.get(field, default)
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        return { int(field[len(STATS_PREFIX):]): value 
+            for field, value in self.data.items() if field.startswith(STATS_PREFIX) }
+
+    def save(self, **fields):
+        self._write(fields)
+
+    def save_stats(self, user_stats: Dict[int, Dict[str, Any]]):
+        self._write({ f"{STATS_PREFIX}{user_id}": dict(stats) for user_id, stats in user_stats.items() })
+
+    def _write(self, fields: Dict[str, Any]):
+        if not fields: return
+        self.data.update(fields)
+        try:
+            pipe = self.cache.pipeline()
+            pipe.hset(snapshot_key(self.match_id), mapping={ field: json.dumps(value) for field, value in fields.items() })
+            pipe.expire(snapshot_key(self.match_id), MATCH_SNAPSHOT_TTL)
+            pipe.execute()
+        except (RedisError, TypeError) as e:
+            log.warning(f"[{self.match_id}] Snapshot write failed: {repr(e)}")
+
+    def delete(self):
+        self.data = {}
+        try: self.cache.delete(snapshot_key(self.match_id))
+        except RedisError as e: log.warning(f"[{self.match_id}] Snapshot delete failed: {repr(e)}")
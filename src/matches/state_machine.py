@@ -0,0 +1,205 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from time import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, NamedTuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Bot
+
+from utils.logger import Logger as log
+from utils.models import Phase, Team
+from utils.rcon_poller import PollSubscription
+from utils.timers import Timer
+
+from .match_states import MatchState
+
+
+StateHandler = Callable[[], Awaitable[MatchState | None]]
+
+
+class PhaseSpec(NamedTuple):
+    phase: Phase
+    team: Team
+    votes: int
+    duration: int
+
+
+VOTING_PHASES: Dict[MatchState, PhaseSpec] = {
+    MatchState.A_BANS: PhaseSpec(Phase.A_BAN,  Team.A, votes=2, duration=20),
+    MatchState.B_BANS: PhaseSpec(Phase.B_BAN,  Team.B, votes=2, duration=20),
+    MatchState.A_PICK: PhaseSpec(Phase.A_PICK, Team.A, votes=1, duration=20),
+    MatchState.B_PICK: PhaseSpec(Phase.B_PICK, Team.B, votes=1, duration=20),
+}
+
+# States that wait on players or the server. Pending state writes are
+# flushed before entering them so a restart resumes at the wait itself
+WAITING_STATES = {
+    MatchState.ACCEPT_PLAYERS,
+    *VOTING_PHASES,
+    MatchState.MATCH_WAIT_FOR_PLAYERS,
+    MatchState.MATCH_WAIT_FOR_END,
+}
+
+# Only the newest pending event of these kinds is kept
+CONFLATED_EVENTS = { "rcon" }
+
+
+class MatchEvent(NamedTuple):
+    kind: str
+    payload: Any = None
+
+
+class PhaseWindow:
+    def __init__(self, spec: PhaseSpec, voters: Iterable[int]):
+        self.spec = spec
+        self.voters = set(voters)
+        self.votes: Dict[int, int] = {}
+
+    @property
+    def decided(self) -> bool:
+        return all(self.votes.get(user_id, 0) >= self.spec.votes for user_id in self.voters)
+
+    def record(self, user_id: int, votes: int):
+        if user_id in self.voters:
+            self.votes[user_id] = votes
+
+
+class StateWriter:
+    def __init__(self, bot: "Bot", match_id: int):
+        self.bot = bot
+        self.match_id = match_id
+        self.state: MatchState | None = None
+        self.fields: Dict[str, Any] = {}
+        self._task: asyncio.Task | None = None
+
+    def save(self, state: MatchState, **fields):
+        self.state = state
+        self.fields.update(fields)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._write())
+
+    async def _write(self):
+        while self.state is not None:
+            state, fields = self.state, self.fields
+            self.state, self.fields = None, {}
+            try:
+                await self.bot.store.save_match_state(self.match_id, state, **fields)
+            except Exception:
+                self.state = self.state or state
+                self.fields = fields | self.fields
+                raise
+
+    async def flush(self):
+        if self.state is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._write())
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+
+async def close_phase_windows(timers: List[Timer]):
+    from matches import get_match
+    for timer in timers:
+        instance = get_match(timer.payload['match_id'])
+        if instance:
+            instance.machine.post("phase_timeout", Phase(timer.payload['phase']))
+
+
+class MatchStateMachine:
+    def __init__(self, bot: "Bot", match_id: int, state: MatchState):
+        self.bot = bot
+        self.match_id = match_id
+        self.state = state
+        self.writer = StateWriter(bot, match_id)
+        self.staged: Dict[str, Any] = {}
+        self.inbox: Deque[MatchEvent] = deque()
+        self._wakeup = asyncio.Event()
+
+    @property
+    def timer_key(self) -> str:
+        return f"match_phase:{self.match_id}"
+
+    async def run(self, handlers: Dict[MatchState, StateHandler]):
+        try:
+            while (handler := handlers.get(self.state)) is not None:
+                if self.state in WAITING_STATES:
+                    await self.writer.flush()
+                self.inbox.clear()
+                next_state = await handler()
+                if next_state is None:
+                    break
+                self.advance(next_state)
+        finally:
+            await self.writer.flush()
+
+    def stage(self, **fields):
+        self.staged.update(fields)
+
+    def advance(self, state: MatchState):
+        log.debug(f"Match state -> {state}")
+        self.state = state
+        fields, self.staged = self.staged, {}
+        self.writer.save(state, **fields)
+
+    def post(self, kind: str, payload: Any=None):
+        if kind in CONFLATED_EVENTS and self.inbox:
+            self.inbox = deque(event for event in self.inbox if event.kind != kind)
+        self.inbox.append(MatchEvent(kind, payload))
+        self._wakeup.set()
+
+    async def next_event(self) -> MatchEvent:
+        while not self.inbox:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self.inbox.popleft()
+
+    @asynccontextmanager
+    async def rcon_events(self, subscription: PollSubscription) -> AsyncIterator[None]:
+        async def pump():
+            while True:
+                self.post("rcon", await subscription.next())
+
+        task = asyncio.create_task(pump())
+        try:
+            yield
+        finally:
+            task.cancel()
+            subscription.close()
+            self.inbox = deque(event for event in self.inbox if event.kind != "rcon")
+
+    def record_vote(self, phase: Phase, user_id: int, votes: int):
+        self.post("vote", (phase, user_id, votes))
+
+    async def run_window(self, spec: PhaseSpec, voters: Iterable[int]) -> bool:
+        window = PhaseWindow(spec, voters)
+        self.bot.timers.schedule("match_phase", self.timer_key, time() + spec.duration, 
+            { "match_id": self.match_id, "phase": spec.phase.value })
+        try:
+            while not window.decided:
+                event = await self.next_event()
+                if event.kind == "vote" and event.payload[0] == spec.phase:
+                    window.record(event.payload[1], event.payload[2])
+                elif event.kind == "phase_timeout" and event.payload == spec.phase:
+                    break
+        finally:
+            self.bot.timers.cancel(self.timer_key)
+        if window.decided:
+            log.debug(f"[{self.match_id}] {spec.phase.name} decided early")
+        return window.decided
@@ -0,0 +1,135 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import re
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Iterable, List, Tuple
+
+import aiohttp
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from nextcord import Guild
+from PIL import Image
+
+from config import REDIS_HOST, REDIS_PORT, AVATAR_CACHE_TTL, AVATAR_MEMORY_ENTRIES
+from utils.logger import Logger as log
+
+
+def avatar_key(url: str, size: Tuple[int, int]) -> str:
+    match = re.search(r'/(\d+)/([a-zA-Z0-9_-]+\.[a-zA-Z0-9]+)', url)
+    name = f"{match.group(1)}:{match.group(2)}" if match else url
+    return f"discord_avatar:{name}:{size[0]}x{size[1]}"
+
+def _load_png(data: bytes) -> Image.Image:
+    img = Image.open(BytesIO(data))
+    img.load()
+    return img
+
+def _resize_avatar(data: bytes, size: Tuple[int, int]) -> Tuple[Image.Image, bytes]:
+    avatar = Image.open(BytesIO(data)).convert('RGBA').resize(size, Image.LANCZOS)
+    buffer = BytesIO()
+    avatar.save(buffer, format="PNG")
+    return avatar, buffer.getvalue()
+
+
+class AvatarService:
+    def __init__(self, memory_entries: int=AVATAR_MEMORY_ENTRIES, ttl: int=AVATAR_CACHE_TTL):
+        self.cache = aioredis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT)
+        self.memory: OrderedDict[str, Image.Image] = OrderedDict()
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self._session: aiohttp.ClientSession | None = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=20, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=10))
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        await self.cache.aclose()
+
+    def _remember(self, key: str, avatar: Image.Image):
+        self.memory[key] = avatar
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    async def get(self, url: str, size: Tuple[int, int]) -> Image.Image | None:
+        key = avatar_key(url, size)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        avatar = None
+        try:
+            avatar = await self._load(key, url, size)
+        except Exception as e:
+            log.error(f"Error fetching avatar from {url}: {repr(e)}")
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(avatar)
+
+        if avatar is not None:
+            self._remember(key, avatar)
+        return avatar
+
+    async def _load(self, key: str, url: str, size: Tuple[int, int]) -> Image.Image | None:
+        try:
+            cached = await self.cache.get(key)
+        except RedisError as e:
+            log.warning(f"Avatar cache read {key} failed: {repr(e)}")
+            cached = None
+        if cached:
+            try:
+                return await asyncio.to_thread(_load_png, cached)
+            except Exception as e:
+                log.warning(f"Invalid cached avatar for {url}: {repr(e)}")
+                await self.cache.delete(key)
+
+        async with self.session.get(url.split('?')[0]) as resp:
+            if resp.status != 200:
+                log.error(f"Failed to fetch avatar from {url}. Status: {resp.status}")
+                return None
+            data = await resp.read()
+
+        avatar, png = await asyncio.to_thread(_resize_avatar, data, size)
+        try:
+            await self.cache.set(key, png, ex=self.ttl)
+        except RedisError as e:
+            log.warning(f"Avatar cache write {key} failed: {repr(e)}")
+        return avatar
+
+    async def fetch_all(self, guild: Guild, user_ids: Iterable[int], size: Tuple[int, int]) -> List[Image.Image | None]:
+        async def fetch(user_id: int):
+            member = guild.get_member(user_id)
+            if not member:
+                return None
+            return await self.get(str(member.display_avatar), size)
+        return await asyncio.gather(*(fetch(user_id) for user_id in user_ids))
@@ -23,7 +23,7 @@ from typing import Any, Callable, Dict, List, Tuple, cast
 import random
 from statistics import mean, median, stdev
 
-from sqlalchemy import delete, desc, func, inspect, or_, text, update, case, and_
+from sqlalchemy import bindparam, delete, desc, func, inspect, or_, text, update, case, and_
 from sqlalchemy.dialects.postgresql import insert, INTERVAL
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import DeclarativeMeta
@@ -34,6 +34,7 @@ from sqlalchemy.sql.functions import concat
 
 from config import DATABASE_URL, PLACEMENT_MATCHES
 from matches import MatchState
+from matches.match_context import MatchContext
 from utils.logger import Logger as log
 from utils.utils import extract_late_time
 from .models import *
@@ -161,6 +162,30 @@ class Database:
             await session.execute(stmt)
             await session.commit()
 
+    @staticmethod
+    async def _bulk_update(session: AsyncSession, table: DeclarativeMeta, keys: List[str], rows: List[Dict[str, Any]]) -> None:
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            columns = tuple(sorted(c for c in row if c not in keys))
+            if columns:
+                groups.setdefault(columns, []).append(row)
+
+        for columns, group in groups.items():
+            stmt = (
+                update(table.__table__)
+                .where(*[table.__table__.c[k] == bindparam(f"k_{k}") for k in keys])
+                .values({ c: bindparam(f"v_{c}") for c in columns }))
+            await session.execute(stmt, [
+                { **{ f"k_{k}": row[k] for k in keys }, **{ f"v_{c}": row[c] for c in columns } }
+                for row in group])
+
+    @log_db_operation
+    async def bulk_update(self, table: DeclarativeMeta, keys: List[str], rows: List[Dict[str, Any]]) -> None:
+        if not rows: return
+        async with self._session_maker() as session:
+            async with session.begin():
+                await self._bulk_update(session, table, keys, rows)
+
 ################
 # RCON SERVERS #
 ################
@@ -311,28 +336,39 @@ class Database:
     
     @log_db_operation
     async def update_user_coords(self, guild_id: int, user_coords: Dict[int, tuple]) -> None:
-            column_mapping = {
-                'lat': (0, MMBotUsers.lat),
-                'lon': (1, MMBotUsers.lon),
-                'height': (2, MMBotUsers.height),
-                'uncertainty': (3, MMBotUsers.uncertainty)
-            }
-            
-            case_values = {
-                column_name: case(
-                    *[(MMBotUsers.user_id == uid, coords[idx]) for uid, coords in user_coords.items()],
-                    else_=default_attr)
-                for column_name, (idx, default_attr) in column_mapping.items()
-            }
-            
-            async with self._session_maker() as session:
-                await session.execute(
-                    update(MMBotUsers)
-                    .where(
-                        MMBotUsers.guild_id == guild_id,
-                        MMBotUsers.user_id.in_(list(user_coords.keys())))
-                    .values(**case_values))
-                await session.commit()
+        await self.bulk_update(MMBotUsers, ['guild_id', 'user_id'], [
+            { 
+                'guild_id': guild_id, 
+                'user_id': user_id, 
+                'lat': coords[0], 
+                'lon': coords[1], 
+                'height': coords[2], 
+                'uncertainty': coords[3] 
+            } for user_id, coords in user_coords.items()])
+    
+    @log_db_operation
+    async def get_ping_observations(self, guild_id: int) -> List[Tuple[int, str, int]]:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                select(MMBotUserMatchStats.user_id, MMBotMatches.serveraddr, MMBotUserMatchStats.ping)
+                .join(MMBotMatches, MMBotMatches.id == MMBotUserMatchStats.match_id)
+                .where(
+                    MMBotUserMatchStats.guild_id == guild_id,
+                    MMBotUserMatchStats.ping > 0,
+                    MMBotMatches.serveraddr.isnot(None)))
+            return [(row.user_id, row.serveraddr, row.ping) for row in result.all()]
+    
+    @log_db_operation
+    async def set_network_coords(self, guild_id: int, user_coords: Dict[int, tuple], server_coords: Dict[int, tuple]) -> None:
+        columns = ('lat', 'lon', 'height', 'uncertainty')
+        async with self._session_maker() as session:
+            async with session.begin():
+                await self._bulk_update(session, MMBotUsers, ['guild_id', 'user_id'], [
+                    { 'guild_id': guild_id, 'user_id': user_id, **dict(zip(columns, coords)) }
+                    for user_id, coords in user_coords.items()])
+                await self._bulk_update(session, RconServers, ['id'], [
+                    { 'id': server_id, **dict(zip(columns, coords)) }
+                    for server_id, coords in server_coords.items()])
     
     @log_db_operation
     async def set_user_platform(self, user_id: int, platform: str, platform_id: str, guild_id: int) -> None:
@@ -444,30 +480,89 @@ class Database:
     
     @log_db_operation
     async def set_users_summary_stats(self, guild_id: int, users_data: Dict[int, Dict[str, Any]]) -> None:
-        async with self._session_maker() as session:
-            async with session.begin():
-                for user_id, user_data in users_data.items():
-                    await session.execute(
-                        update(MMBotUserSummaryStats)
-                        .where(
-                            MMBotUserSummaryStats.guild_id == guild_id,
-                            MMBotUserSummaryStats.user_id == user_id)
-                        .values(user_data))
+        await self.bulk_update(MMBotUserSummaryStats, ['guild_id', 'user_id'], [
+            { **user_data, 'guild_id': guild_id, 'user_id': user_id } 
+            for user_id, user_data in users_data.items()])
 
     @log_db_operation
     async def upsert_users_match_stats(self, guild_id: int, match_id: int, user_stats: Dict[int, Dict[str, Any]]) -> None:
+        if not user_stats: return
+        rows: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for user_id, stats in user_stats.items():
+            rows.setdefault(tuple(sorted(stats)), []).append(
+                { "guild_id": guild_id, "user_id": user_id, "match_id": match_id, **stats })
+        
         async with self._session_maker() as session:
             async with session.begin():
-                for user_id, stats in user_stats.items():
-                    stmt = insert(MMBotUserMatchStats).values(
-                        guild_id=guild_id,
-                        user_id=user_id,
-                        match_id=match_id,
-                        **stats)
+                for columns, values in rows.items():
+                    stmt = insert(MMBotUserMatchStats).values(values)
                     stmt = stmt.on_conflict_do_update(
                         index_elements=['guild_id', 'user_id', 'match_id'],
-                        set_=stats)
+                        set_={ column: stmt.excluded[column] for column in columns })
                     await session.execute(stmt)
+                
+                latest = [
+                    { 'k_user_id': user_id, 'v_mmr_before': stats['mmr_before'] }
+                    for user_id, stats in user_stats.items()
+                    if stats.get('mmr_before') is not None and not stats.get('abandoned', False)]
+                if latest:
+                    await session.execute(
+                        update(MMBotUserSummaryStats.__table__)
+                        .where(
+                            MMBotUserSummaryStats.__table__.c.guild_id == guild_id,
+                            MMBotUserSummaryStats.__table__.c.user_id == bindparam('k_user_id'),
+                            or_(
+                                MMBotUserSummaryStats.__table__.c.last_match_id.is_(None),
+                                MMBotUserSummaryStats.__table__.c.last_match_id <= match_id))
+                        .values(last_match_id=match_id, last_mmr_before=bindparam('v_mmr_before')), latest)
+    
+    @staticmethod
+    async def _refresh_last_match(session: AsyncSession, guild_id: int, user_ids: List[int] | None=None) -> None:
+        latest = (
+            select(
+                MMBotUserMatchStats.user_id,
+                func.max(MMBotUserMatchStats.match_id).label('latest_match_id'))
+            .where(
+                MMBotUserMatchStats.guild_id == guild_id,
+                MMBotUserMatchStats.abandoned == False)
+            .group_by(MMBotUserMatchStats.user_id))
+        summaries = update(MMBotUserSummaryStats).where(MMBotUserSummaryStats.guild_id == guild_id)
+        if user_ids is not None:
+            latest = latest.where(MMBotUserMatchStats.user_id.in_(user_ids))
+            summaries = summaries.where(MMBotUserSummaryStats.user_id.in_(user_ids))
+        latest = latest.subquery()
+        snapshot = (
+            select(
+                MMBotUserMatchStats.user_id,
+                MMBotUserMatchStats.match_id,
+                MMBotUserMatchStats.mmr_before)
+            .join(
+                latest,
+                (MMBotUserMatchStats.user_id == latest.c.user_id) &
+                (MMBotUserMatchStats.match_id == latest.c.latest_match_id))
+            .where(MMBotUserMatchStats.guild_id == guild_id)
+            .subquery())
+
+        await session.execute(summaries.values(last_match_id=None, last_mmr_before=None))
+        await session.execute(
+            update(MMBotUserSummaryStats)
+            .where(
+                MMBotUserSummaryStats.guild_id == guild_id,
+                MMBotUserSummaryStats.user_id == snapshot.c.user_id)
+            .values(last_match_id=snapshot.c.match_id, last_mmr_before=snapshot.c.mmr_before))
+    
+    @log_db_operation
+    async def backfill_last_match(self, guild_id: int) -> int:
+        async with self._session_maker() as session:
+            async with session.begin():
+                await self._refresh_last_match(session, guild_id)
+                result = await session.execute(
+                    select(func.count())
+                    .select_from(MMBotUserSummaryStats)
+                    .where(
+                        MMBotUserSummaryStats.guild_id == guild_id,
+                        MMBotUserSummaryStats.last_match_id.isnot(None)))
+                return result.scalar_one()
     
     @log_db_operation
     async def get_users(self, guild_id: int, user_ids: List[int] | None = None) -> List[MMBotUsers]:
@@ -547,55 +642,25 @@ class Database:
     @log_db_operation
     async def get_last_mmr_for_users(self, guild_id: int) -> Dict[int, int]:
         async with self._session_maker() as session:
-            subquery = (
+            result = await session.execute(
                 select(
-                    MMBotUserMatchStats.user_id,
-                    func.max(MMBotUserMatchStats.match_id).label('latest_match_id'))
+                    MMBotUserSummaryStats.user_id,
+                    MMBotUserSummaryStats.last_mmr_before)
                 .where(
-                    MMBotUserMatchStats.guild_id == guild_id,
-                    MMBotUserMatchStats.abandoned == False)
-                .group_by(MMBotUserMatchStats.user_id)
-                .subquery())
-
-            query = (
-                select(
-                    MMBotUserMatchStats.user_id,
-                    MMBotUserMatchStats.mmr_before)
-                .join(
-                    subquery,
-                    (MMBotUserMatchStats.user_id == subquery.c.user_id) &
-                    (MMBotUserMatchStats.match_id == subquery.c.latest_match_id))
-                .where(MMBotUserMatchStats.guild_id == guild_id))
-
-            result = await session.execute(query)
-            return { row.user_id: row.mmr_before for row in result }
+                    MMBotUserSummaryStats.guild_id == guild_id,
+                    MMBotUserSummaryStats.last_match_id.isnot(None)))
+            return { row.user_id: row.last_mmr_before for row in result }
         
     async def get_leaderboard_with_previous_mmr(self, guild_id: int) -> List[Dict[str, Any]]:
         async with self._session_maker() as session:
-            subquery = (
-                select(
-                    MMBotUserMatchStats.user_id,
-                    func.max(MMBotUserMatchStats.match_id).label('latest_match_id'))
-                .where(
-                    MMBotUserMatchStats.guild_id == guild_id,
-                    MMBotUserMatchStats.abandoned == False)
-                .group_by(MMBotUserMatchStats.user_id)
-                .subquery())
-
             query = (
                 select(
                     MMBotUserSummaryStats,
-                    MMBotUserMatchStats.mmr_before.label('previous_mmr'))
-                .join(
-                    subquery,
-                    (MMBotUserSummaryStats.user_id == subquery.c.user_id))
-                .join(
-                    MMBotUserMatchStats,
-                    (MMBotUserMatchStats.user_id == subquery.c.user_id) &
-                    (MMBotUserMatchStats.match_id == subquery.c.latest_match_id))
+                    MMBotUserSummaryStats.last_mmr_before.label('previous_mmr'))
                 .where(
                     MMBotUserSummaryStats.guild_id == guild_id,
-                    MMBotUserSummaryStats.games >= PLACEMENT_MATCHES)
+                    MMBotUserSummaryStats.games >= PLACEMENT_MATCHES,
+                    MMBotUserSummaryStats.last_match_id.isnot(None))
                 .order_by(desc(MMBotUserSummaryStats.mmr)))
 
             result = await session.execute(query)
@@ -930,6 +995,11 @@ class Database:
                             MMBotUserSummaryStats.mmr + update['mmr_change']
                         ) for update in mmr_updates),
                         else_=MMBotUserSummaryStats.mmr)))
+                
+                match_players = await session.execute(
+                    select(MMBotUserMatchStats.user_id)
+                    .where(MMBotUserMatchStats.match_id == match_id))
+                await self._refresh_last_match(session, guild_id, list(match_players.scalars().all()))
 
     @log_db_operation
     async def get_user_abandons(self, guild_id: int, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
@@ -1106,12 +1176,12 @@ class Database:
             return result.scalars().all()
     
     @log_db_operation
-    async def save_match_state(self, match_id: int, state: MatchState):
+    async def save_match_state(self, match_id: int, state: MatchState, **fields):
         async with self._session_maker() as session:
             await session.execute(
                 update(MMBotMatches)
                 .where(MMBotMatches.id == match_id)
-                .values(state=state))
+                .values(state=state, **fields))
             await session.commit()
     
     @log_db_operation
@@ -1130,6 +1200,52 @@ class Database:
                 .where(MMBotMatches.id == match_id))
             return result.scalars().first()
     
+    @log_db_operation
+    async def load_match_context(self, match_id: int) -> MatchContext | None:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                select(MMBotMatches)
+                .options(
+                    selectinload(MMBotMatches.players)
+                    .selectinload(MMBotMatchPlayers.user_platform_mappings))
+                .where(MMBotMatches.id == match_id))
+            match = result.scalars().first()
+            if not match:
+                return None
+            
+            guild_id = (
+                select(MMBotMatchPlayers.guild_id)
+                .where(MMBotMatchPlayers.match_id == match_id)
+                .limit(1)
+                .scalar_subquery())
+            maps = await session.execute(
+                select(MMBotMaps)
+                .where(MMBotMaps.guild_id == guild_id)
+                .order_by(MMBotMaps.order))
+            last_maps = await session.execute(
+                select(MMBotMatches.map)
+                .where(
+                    MMBotMatches.queue_channel == match.queue_channel,
+                    MMBotMatches.end_timestamp.is_not(None),
+                    MMBotMatches.complete)
+                .order_by(desc(MMBotMatches.id))
+                .limit(3))
+            server = None
+            if match.serveraddr:
+                host, port = match.serveraddr.split(':')
+                server = (await session.execute(
+                    select(RconServers)
+                    .where(
+                        RconServers.host == host, 
+                        RconServers.port == int(port)))).scalar_one_or_none()
+            
+            return MatchContext(
+                match=match, 
+                players=list(match.players), 
+                maps=list(maps.scalars().all()), 
+                last_maps=list(last_maps.scalars().all()), 
+                server=server)
+    
     @log_db_operation
     async def get_last_match(self, guild_id: int) -> MMBotMatches:
         async with self._session_maker() as session:
@@ -1163,6 +1279,27 @@ class Database:
                 .where(MMBotMatchPlayers.match_id == match_id))
             return result.scalars().all()
     
+    @log_db_operation
+    async def get_teammate_history(self, guild_id: int, user_ids: List[int], recent: int=20) -> List[Tuple[int, int, Team]]:
+        async with self._session_maker() as session:
+            recent_matches = (
+                select(MMBotMatchPlayers.match_id)
+                .where(
+                    MMBotMatchPlayers.guild_id == guild_id,
+                    MMBotMatchPlayers.user_id.in_(user_ids),
+                    MMBotMatchPlayers.team.isnot(None))
+                .group_by(MMBotMatchPlayers.match_id)
+                .order_by(desc(MMBotMatchPlayers.match_id))
+                .limit(recent)
+                .scalar_subquery())
+            result = await session.execute(
+                select(MMBotMatchPlayers.match_id, MMBotMatchPlayers.user_id, MMBotMatchPlayers.team)
+                .where(
+                    MMBotMatchPlayers.guild_id == guild_id,
+                    MMBotMatchPlayers.user_id.in_(user_ids),
+                    MMBotMatchPlayers.match_id.in_(recent_matches)))
+            return [(row.match_id, row.user_id, row.team) for row in result.all()]
+    
     @log_db_operation
     async def get_unaccepted_players(self, match_id: int) -> List[MMBotMatchPlayers]:
         async with self._session_maker() as session:
@@ -1205,6 +1342,17 @@ class Database:
             match_user = result.scalars().first()
             return match_user is not None
     
+    @log_db_operation
+    async def get_users_in_match(self, guild_id: int) -> List[int]:
+        async with self._session_maker() as session:
+            result = await session.execute(
+                select(MMBotMatchPlayers.user_id)
+                .join(MMBotMatches, MMBotMatchPlayers.match_id == MMBotMatches.id)
+                .where(
+                    MMBotMatchPlayers.guild_id == guild_id,
+                    MMBotMatches.complete == False))
+            return list(result.scalars().all())
+    
     @log_db_operation
     async def set_players_team(self, match_id: int, user_teams: Dict[Team, List[int]]):
         async with self._session_maker() as session:
@@ -1428,14 +1576,9 @@ class Database:
                     .order_by(MMBotMaps.order))
                 maps = result.scalars().all()
                 shuffled_maps = random.sample(maps, len(maps))
-                for new_order, map_name in enumerate(shuffled_maps):
-                    await session.execute(
-                        update(MMBotMaps)
-                        .where(
-                            MMBotMaps.guild_id == guild_id,
-                            MMBotMaps.map == map_name)
-                        .values(order=new_order))
-            await session.commit()
+                await self._bulk_update(session, MMBotMaps, ['guild_id', 'map'], [
+                    { 'guild_id': guild_id, 'map': map_name, 'order': new_order } 
+                    for new_order, map_name in enumerate(shuffled_maps)])
 
     @log_db_operation
     async def set_maps(self, guild_id: int, maps: List[Dict[str, str]]):
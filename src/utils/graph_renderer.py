@@ -0,0 +1,102 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import nextcord
+import plotly.graph_objects as go
+
+from config import GRAPH_RENDER_WORKERS
+from utils.logger import Logger as log
+from utils.models import MMBotRanks, MMBotUserMatchStats
+from utils.statistics import create_graph
+
+
+def _warm_worker():
+    # Kaleido starts its browser on the first export, pay for it before a user does
+    try:
+        go.Figure().to_image(format="png", width=8, height=8)
+    except Exception:
+        pass
+
+def _render(
+    graph_type: str, 
+    match_stats: List[MMBotUserMatchStats], 
+    ranks: Dict[Tuple[str, nextcord.Color], MMBotRanks] | None, 
+    preferences: Dict[str, Dict[str, int]] | None,
+    play_periods: List[Tuple[datetime, datetime]] | None,
+    user_region: str | None
+) -> bytes:
+    fig = create_graph(graph_type, match_stats, ranks, preferences, play_periods, user_region)
+    return fig.to_image(format="png", scale=2)
+
+
+class GraphRenderer:
+    def __init__(self, workers: int=GRAPH_RENDER_WORKERS):
+        self.workers = workers
+        self.pool: ProcessPoolExecutor | None = None
+        self.slots = asyncio.Semaphore(workers)
+        self.waiting = 0
+        self.running = 0
+
+    @property
+    def depth(self) -> int:
+        return self.waiting + self.running
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+            for _ in range(self.workers):
+                self.pool.submit(int)
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def render(
+        self, 
+        graph_type: str, 
+        match_stats: List[MMBotUserMatchStats], 
+        ranks: Dict[Tuple[str, nextcord.Color], MMBotRanks] | None=None, 
+        preferences: Dict[str, Dict[str, int]] | None=None,
+        play_periods: List[Tuple[datetime, datetime]] | None=None,
+        user_region: str | None=None
+    ) -> bytes:
+        self.start()
+        self.waiting += 1
+        if self.depth > self.workers:
+            log.debug(f"Graph render queue depth {self.depth}")
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, _render, 
+                graph_type, match_stats, ranks, preferences, play_periods, user_region)
+        except BrokenProcessPool:
+            self.shutdown()
+            raise
+        finally:
+            self.running -= 1
+            self.slots.release()
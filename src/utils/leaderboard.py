@@ -0,0 +1,182 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Bot
+
+import nextcord
+from nextcord import Embed, Guild, TextChannel
+
+from config import PLACEMENT_MATCHES
+from utils.logger import Logger as log
+from utils.models import BotSettings
+from utils.statistics import create_leaderboard_embed
+
+PAGE_SIZE = 50
+
+
+def leaderboard_row(user_id: int, summary: Dict[str, Any], previous_mmr: float | None) -> Dict[str, Any]:
+    games = summary['games']
+    return {
+        "user_id": user_id,
+        "mmr": summary['mmr'],
+        "previous_mmr": previous_mmr,
+        "games": games,
+        "wins": summary['wins'],
+        "win_rate": summary['wins'] / games if games > 0 else 0,
+        "avg_kills": summary['total_kills'] / games if games > 0 else 0,
+        "avg_deaths": summary['total_deaths'] / games if games > 0 else 0,
+        "avg_assists": summary['total_assists'] / games if games > 0 else 0,
+        "avg_score": summary['total_score'] / games if games > 0 else 0,
+    }
+
+
+class LeaderboardEngine:
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.rows: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self.order: Dict[int, List[Tuple[float, int]]] = {}
+        self.pages: Dict[int, List[int]] = {}
+        self.rendered: Dict[int, List[Dict[str, Any]]] = {}
+        self.positions: Dict[int, Tuple[Dict[int, int], int]] = {}
+        self.locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    def invalidate(self, guild_id: int):
+        self.rows.pop(guild_id, None)
+        self.order.pop(guild_id, None)
+        self.positions.pop(guild_id, None)
+
+    async def position(self, guild: Guild, user_id: int) -> Tuple[int | None, int]:
+        if guild.id not in self.positions:
+            async with self.locks[guild.id]:
+                if guild.id not in self.rows:
+                    await self._load(guild.id)
+            members = [uid for _, uid in self.order[guild.id] if guild.get_member(uid)]
+            self.positions[guild.id] = ({ uid: i + 1 for i, uid in enumerate(members) }, len(members))
+        positions, total = self.positions[guild.id]
+        return positions.get(user_id), total
+
+    async def _load(self, guild_id: int):
+        data = await self.bot.store.get_leaderboard_with_previous_mmr(guild_id)
+        self.rows[guild_id] = { row['user_id']: row for row in data }
+        self.order[guild_id] = sorted((-row['mmr'], row['user_id']) for row in data)
+
+    def apply(self, guild_id: int, summaries: Dict[int, Dict[str, Any]], previous_mmr: Dict[int, float] | None=None):
+        rows, order = self.rows.get(guild_id), self.order.get(guild_id)
+        if rows is None or order is None:
+            return
+        previous_mmr = previous_mmr or {}
+        self.positions.pop(guild_id, None)
+        for user_id, summary in summaries.items():
+            row = rows.pop(user_id, None)
+            if row:
+                del order[bisect_left(order, (-row['mmr'], user_id))]
+            if 'games' in summary:
+                row = leaderboard_row(user_id, summary, previous_mmr.get(user_id, row['previous_mmr'] if row else None))
+            elif row:
+                row = { **row, **summary }
+            else:
+                continue
+            if row['games'] < PLACEMENT_MATCHES:
+                continue
+            rows[user_id] = row
+            insort(order, (-row['mmr'], user_id))
+
+    async def refresh(self, guild: Guild):
+        self.invalidate(guild.id)
+        self.pages.pop(guild.id, None)
+        self.rendered.pop(guild.id, None)
+        await self.publish(guild)
+
+    async def publish(self, guild: Guild):
+        async with self.locks[guild.id]:
+            try:
+                await self._publish(guild)
+            except Exception as e:
+                log.error(f"Leaderboard update failed: {repr(e)}")
+                self.pages.pop(guild.id, None)
+                self.rendered.pop(guild.id, None)
+
+    async def _publish(self, guild: Guild):
+        settings = await self.bot.settings_cache(guild.id)
+        channel = guild.get_channel(settings.leaderboard_channel)
+        if not isinstance(channel, TextChannel):
+            return
+        if guild.id not in self.rows:
+            await self._load(guild.id)
+
+        # Remove players who have left the server
+        rows = self.rows[guild.id]
+        data = [rows[user_id] for _, user_id in self.order[guild.id] if guild.get_member(user_id)]
+        ranks = await self.bot.store.get_ranks(guild.id)
+
+        header_embed = Embed(title="Match Making Leaderboard")
+        header_embed.add_field(name="Total Players", value=str(len(data)), inline=True)
+        header_embed.set_footer(text="K/D/A and Score are mean averages")
+
+        embeds = [header_embed]
+        start_rank = 1
+        for _ in range((len(data) - 1) // PAGE_SIZE + 1):
+            embed, start_rank = await create_leaderboard_embed(guild, data, ranks, start_rank)
+            embeds.append(embed)
+
+        if guild.id not in self.pages:
+            self.pages[guild.id] = await self._discover(channel, settings)
+            self.rendered[guild.id] = []
+        pages, rendered = self.pages[guild.id], self.rendered[guild.id]
+
+        for i, embed in enumerate(embeds):
+            content = embed.to_dict()
+            if i < len(rendered) and rendered[i] == content:
+                continue
+            if i < len(pages):
+                try:
+                    await channel.get_partial_message(pages[i]).edit(content=None, embed=embed)
+                except nextcord.NotFound:
+                    pages[i] = (await channel.send(embed=embed)).id
+            else:
+                pages.append((await channel.send(embed=embed)).id)
+            if i == 0 and pages[0] != settings.leaderboard_message:
+                await self.bot.settings_cache(guild.id, leaderboard_message=pages[0])
+            rendered[i:i + 1] = [content]
+
+        for message_id in pages[len(embeds):]:
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except nextcord.HTTPException: pass
+        del pages[len(embeds):]
+        del rendered[len(embeds):]
+
+    async def _discover(self, channel: TextChannel, settings: BotSettings) -> List[int]:
+        try:
+            header_message = await channel.fetch_message(settings.leaderboard_message)
+        except Exception:
+            return []
+
+        existing_messages = []
+        async for message in channel.history(after=header_message, limit=None):
+            if message.author == channel.guild.me:
+                existing_messages.append(message)
+            else:
+                await message.delete()
+        existing_messages.sort(key=lambda m: m.created_at)
+        return [header_message.id] + [message.id for message in existing_messages]
@@ -0,0 +1,58 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+from typing import Dict, List
+
+from nextcord import Embed, Message, PartialMessage, TextChannel
+
+from utils.message_scheduler import Lane, MessageScheduler
+
+
+class MessageRegistry:
+    def __init__(self, outbox: MessageScheduler):
+        self.outbox = outbox
+        self.partials: Dict[int, PartialMessage] = {}
+        self.rendered: Dict[int, List[Embed]] = {}
+
+    def get(self, channel: TextChannel, message_id: int) -> PartialMessage:
+        partial = self.partials.get(message_id)
+        if partial is None or partial.channel.id != channel.id:
+            partial = self.partials[message_id] = channel.get_partial_message(message_id)
+        return partial
+
+    def remember(self, message: Message):
+        self.store(message.id, message.embeds)
+
+    def store(self, message_id: int, embeds: List[Embed]):
+        self.rendered[message_id] = list(embeds)
+
+    def forget(self, message_id: int):
+        self.partials.pop(message_id, None)
+        self.rendered.pop(message_id, None)
+
+    async def embeds(self, channel: TextChannel, message_id: int) -> List[Embed]:
+        if message_id not in self.rendered:
+            self.remember(await channel.fetch_message(message_id))
+        return self.rendered[message_id]
+
+    def edit(self, channel: TextChannel, message_id: int, lane: Lane=Lane.COSMETIC, **fields) -> asyncio.Future:
+        if 'embeds' in fields:
+            self.store(message_id, fields['embeds'])
+        elif 'embed' in fields:
+            self.store(message_id, [fields['embed']] if fields['embed'] else [])
+        return self.outbox.edit(self.get(channel, message_id), lane, **fields)
@@ -0,0 +1,194 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+from collections import deque
+from enum import IntEnum
+from itertools import count
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, Set
+
+from nextcord import HTTPException, Message, PartialMessage
+from nextcord.abc import Messageable
+
+from config import OUTBOX_BUCKET_SIZE, OUTBOX_BUCKET_PERIOD, OUTBOX_CRITICAL_RESERVE
+from utils.logger import Logger as log
+
+
+class Lane(IntEnum):
+    CRITICAL = 0
+    COSMETIC = 1
+
+
+class RouteBucket:
+    __slots__ = ("tokens", "capacity", "rate", "updated", "blocked_until")
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity      = capacity
+        self.tokens        = float(capacity)
+        self.rate          = capacity / period
+        self.updated       = monotonic()
+        self.blocked_until = 0.
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, reserve: int=0) -> float:
+        now = monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        missing = reserve + 1 - self.tokens
+        return 0. if missing <= 0 else missing / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, retry_after: float):
+        self.tokens = 0
+        self.blocked_until = monotonic() + retry_after
+
+
+class OutboundJob:
+    __slots__ = ("key", "route", "lane", "call", "future", "seq", "started")
+
+    def __init__(self, key: Any, route: int, lane: Lane, call: Callable[[], Awaitable[Any]], seq: int):
+        self.key     = key
+        self.route   = route
+        self.lane    = lane
+        self.call    = call
+        self.future  = asyncio.get_running_loop().create_future()
+        self.seq     = seq
+        self.started = False
+
+
+class MessageScheduler:
+    def __init__(self, bucket_size: int=OUTBOX_BUCKET_SIZE, bucket_period: float=OUTBOX_BUCKET_PERIOD, reserve: int=OUTBOX_CRITICAL_RESERVE):
+        self.bucket_size = bucket_size
+        self.bucket_period = bucket_period
+        self.reserve = reserve
+        self.buckets: Dict[int, RouteBucket] = {}
+        self.lanes: Dict[Lane, Deque[OutboundJob]] = { lane: deque() for lane in Lane }
+        self.pending: Dict[Any, OutboundJob] = {}
+        self.busy_routes: Set[int] = set()
+        self.dispatching: Set[asyncio.Task] = set()
+
+        self._seq = count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def edit(self, message: Message | PartialMessage, lane: Lane=Lane.COSMETIC, **fields) -> asyncio.Future:
+        key = ("edit", message.id)
+        job = self.pending.get(key)
+        if job is not None and not job.started:
+            job.call = lambda: message.edit(**fields)
+            if lane < job.lane:
+                job.lane = lane
+                self.lanes[lane].append(job)
+                self._wakeup.set()
+            return job.future
+        return self._enqueue(key, message.channel.id, lane, lambda: message.edit(**fields))
+
+    def send(self, channel: Messageable, lane: Lane=Lane.COSMETIC, **fields) -> asyncio.Future:
+        return self._enqueue(None, channel.id, lane, lambda: channel.send(**fields))
+
+    def _enqueue(self, key: Any, route: int, lane: Lane, call: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        job = OutboundJob(key, route, lane, call, next(self._seq))
+        if key is not None:
+            self.pending[key] = job
+        self.lanes[lane].append(job)
+        self._wakeup.set()
+        self.start()
+        return job.future
+
+    def _bucket(self, route: int) -> RouteBucket:
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = RouteBucket(self.bucket_size, self.bucket_period)
+        return bucket
+
+    def _next_job(self) -> tuple[OutboundJob | None, float | None]:
+        delay = None
+        for lane in Lane:
+            reserve = self.reserve if lane > Lane.CRITICAL else 0
+            ready, kept = None, deque()
+            for job in self.lanes[lane]:
+                if job.started or job.lane != lane:
+                    continue
+                if ready is None and job.route not in self.busy_routes:
+                    wait = self._bucket(job.route).wait_time(reserve)
+                    if wait <= 0:
+                        ready = job
+                        continue
+                    delay = wait if delay is None else min(delay, wait)
+                kept.append(job)
+            self.lanes[lane] = kept
+            if ready is not None:
+                return ready, None
+        return None, delay
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            job, delay = self._next_job()
+            if job is None:
+                try: await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError: pass
+                continue
+            job.started = True
+            if job.key is not None and self.pending.get(job.key) is job:
+                del self.pending[job.key]
+            self._bucket(job.route).take()
+            self.busy_routes.add(job.route)
+            task = asyncio.create_task(self._dispatch(job))
+            self.dispatching.add(task)
+            task.add_done_callback(self.dispatching.discard)
+
+    def _requeue(self, job: OutboundJob):
+        newer = self.pending.get(job.key) if job.key is not None else None
+        if newer is not None:
+            newer.future.add_done_callback(
+                lambda f: job.future.done() or job.future.set_result(f.result()))
+            return
+        job.started = False
+        if job.key is not None:
+            self.pending[job.key] = job
+        self.lanes[job.lane].appendleft(job)
+
+    async def _dispatch(self, job: OutboundJob):
+        result, requeued = None, False
+        try:
+            result = await job.call()
+        except HTTPException as e:
+            if e.status == 429:
+                self._bucket(job.route).block(self.bucket_period)
+                log.warning(f"Outbound {job.key or 'send'} on {job.route} rate limited, retrying")
+                self._requeue(job)
+                requeued = True
+                return
+            log.warning(f"Outbound {job.key or 'send'} on {job.route} failed: {repr(e)}")
+        except Exception as e:
+            log.error(f"Outbound {job.key or 'send'} on {job.route} failed: {repr(e)}")
+        finally:
+            if not requeued and not job.future.done(): job.future.set_result(result)
+            self.busy_routes.discard(job.route)
+            self._wakeup.set()
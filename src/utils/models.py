@@ -163,6 +163,11 @@ class BotSettings(Base):
     mm_staff_role      = Column(BigInteger)
     mm_mute_role       = Column(BigInteger)
 
+    mm_team_mmr_weight      = Column(Float, nullable=False, default=1.0)
+    mm_team_variance_weight = Column(Float, nullable=False, default=0.25)
+    mm_team_rtt_weight      = Column(Float, nullable=False, default=2.0)
+    mm_team_repeat_weight   = Column(Float, nullable=False, default=5.0)
+
     register_channel     = Column(BigInteger)
     register_message     = Column(BigInteger)
     leaderboard_channel  = Column(BigInteger)
@@ -335,6 +340,9 @@ class MMBotUserSummaryStats(Base):
     total_deaths    = Column(Integer, default=0)
     total_assists   = Column(Integer, default=0)
 
+    last_match_id   = Column(Integer)
+    last_mmr_before = Column(Float)
+
     __table_args__ = (
         ForeignKeyConstraint(['guild_id', 'user_id'], ['mm_bot_users.guild_id', 'mm_bot_users.user_id']),
     )
@@ -409,6 +417,8 @@ class MMBotMatches(Base):
     b_side           = Column(sq_Enum(Side))
     serveraddr       = Column(String(51))
 
+    players = relationship("MMBotMatchPlayers", viewonly=True)
+
 class MMBotUserBans(Base):
     __tablename__ = 'mm_bot_user_bans'
 
@@ -1,16 +1,18 @@
 import asyncio
 from datetime import datetime, timedelta, timezone
+from typing import List
 
 import nextcord
 
 from config import GUILD_ID
 from utils.logger import Logger as log
+from utils.timers import Timer
 
 class MuteManager:
     def __init__(self, bot):
         self.bot = bot
         self.active_mutes = {}
-        self.tasks = {}
+        self.bot.timers.register("unmute", self.auto_unmute)
 
     async def load_active_mutes(self):
         mutes = await self.bot.store.get_mutes(GUILD_ID)
@@ -21,20 +23,20 @@ class MuteManager:
                     self.schedule_unmute(user_id, expiry)
 
     def schedule_unmute(self, user_id: int, expiry: datetime):
-        if user_id in self.tasks:
-            self.tasks[user_id].cancel()
         self.active_mutes[user_id] = expiry
-        task = asyncio.create_task(self.auto_unmute(user_id, expiry))
-        self.tasks[user_id] = task
+        self.bot.timers.schedule("unmute", f"unmute:{user_id}", expiry.timestamp(), { "user_id": user_id })
 
-    async def auto_unmute(self, user_id: int, expiry: datetime):
-        try:
-            await asyncio.sleep((expiry - datetime.now(timezone.utc)).total_seconds())
-            await self.unmute_user(user_id)
-        except asyncio.CancelledError:
-            pass
-        except Exception as e:
-            log.error(f"Error in auto_unmute for user {user_id}: {repr(e)}")
+    def cancel_unmute(self, user_id: int):
+        self.active_mutes.pop(user_id, None)
+        self.bot.timers.cancel(f"unmute:{user_id}")
+
+    async def auto_unmute(self, timers: List[Timer]):
+        async def unmute(user_id: int):
+            try:
+                await self.unmute_user(user_id)
+            except Exception as e:
+                log.error(f"Error in auto_unmute for user {user_id}: {repr(e)}")
+        await asyncio.gather(*(unmute(t.payload['user_id']) for t in timers))
 
     async def unmute_user(self, user_id: int):
         guild = self.bot.get_guild(GUILD_ID)
@@ -55,7 +57,6 @@ class MuteManager:
                 pass
 
         self.active_mutes.pop(user_id, None)
-        self.tasks.pop(user_id, None)
         await self.bot.store.update_mute(guild_id=GUILD_ID, user_id=user_id, active=False)
 
         embed = nextcord.Embed(
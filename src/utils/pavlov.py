@@ -17,8 +17,12 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
+import random
+from collections import deque
+from enum import Enum
 from functools import wraps
-from typing import Dict
+from time import monotonic, perf_counter
+from typing import Deque, Dict, List, Set, Tuple
 
 from nextcord.ext import commands
 from pavlov import PavlovRCON
@@ -26,42 +30,182 @@ from pavlov import PavlovRCON
 from utils.models import Team
 from utils.logger import Logger as log
 
+POOL_SIZE = 2                  # Connections kept open per server
+DEAD_AFTER = 3                 # Consecutive failures before a server is dead
+BACKOFF_BASE = 0.5             # Seconds, doubled per consecutive failure
+BACKOFF_MAX = 30.0
+RETRY_INTERVAL = 0.15          # Seconds between retries of a command the server rejected
+HEALTH_CHECK_INTERVAL = 15.0   # Seconds between checks of a healthy server
+LATENCY_SAMPLES = 256          # Latencies kept per command
+
+# Batch pacing: gap between commands on one connection, scaled from the
+# observed median latency and backed off when the server starts failing
+PACE_LATENCY_FACTOR = 0.5
+PACE_MIN = 0.0
+PACE_MAX = 1.0
+
+
+class ServerState(Enum):
+    HEALTHY = 0
+    DEGRADED = 1
+    DEAD = 2
+
+
+def backoff_delay(failures: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, failures - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class RCONServer:
+    def __init__(self, host: str, port: int, password: str, pool_size: int=POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.state = ServerState.DEGRADED
+        self.failures = 0
+        self.next_check = monotonic()
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.pace = PACE_MIN
+        self.pool_size = pool_size
+        self._pool: asyncio.Queue[PavlovRCON] = asyncio.Queue()
+        self._closing: Set[asyncio.Task] = set()
+        for _ in range(pool_size):
+            self._pool.put_nowait(PavlovRCON(host, port, password))
+    
+    @property
+    def addr(self) -> str:
+        return f'{self.host}:{self.port}'
+
+    def _record_success(self, command: str, latency: float):
+        self.latencies.setdefault(command, deque(maxlen=LATENCY_SAMPLES)).append(latency)
+        if self.state != ServerState.HEALTHY:
+            log.info(f"[RCON {self.addr}] {self.state.name} -> HEALTHY")
+        self.state = ServerState.HEALTHY
+        self.failures = 0
+        self.next_check = monotonic() + HEALTH_CHECK_INTERVAL
+
+    def _record_failure(self, error: Exception):
+        self.failures += 1
+        state = ServerState.DEAD if self.failures >= DEAD_AFTER else ServerState.DEGRADED
+        if state != self.state:
+            log.warning(f"[RCON {self.addr}] {self.state.name} -> {state.name} after {repr(error)}")
+        self.state = state
+        self.next_check = monotonic() + backoff_delay(self.failures)
+
+    async def send(self, command: str, *args, **kwargs):
+        rcon = await self._pool.get()
+        start = perf_counter()
+        try:
+            reply = await rcon.send(command, *args, **kwargs)
+        except (TimeoutError, ConnectionError, OSError) as e:
+            self._record_failure(e)
+            task = asyncio.create_task(self._close(rcon))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            rcon = PavlovRCON(self.host, self.port, self.password)
+            raise
+        finally:
+            self._pool.put_nowait(rcon)
+        self._record_success(command.split(' ', 1)[0], (perf_counter() - start) * 1000)
+        return reply
+
+    def pacing(self, command: str) -> float:
+        samples = self.latencies.get(command.split(' ', 1)[0])
+        median = sorted(samples)[len(samples) // 2] / 1000 if samples else 0.0
+        return max(PACE_MIN, min(PACE_MAX, self.pace + median * PACE_LATENCY_FACTOR))
+
+    async def send_batch(self, commands: List[str], retry_attempts: int=2, ordered: bool=False) -> List[dict | None]:
+        results: List[dict | None] = [None] * len(commands)
+        pending = deque(range(len(commands)))
+        attempts = { n: 0 for n in pending }
+
+        async def worker():
+            while pending and self.state != ServerState.DEAD:
+                n = pending.popleft()
+                try:
+                    reply = await self.send(commands[n])
+                    if isinstance(reply, dict) and reply.get('Successful', True):
+                        results[n] = reply
+                        self.pace = max(PACE_MIN, self.pace * 0.5)
+                    else:
+                        raise ValueError(reply)
+                except Exception as e:
+                    attempts[n] += 1
+                    self.pace = min(PACE_MAX, self.pace * 2 + 0.05)
+                    if attempts[n] <= retry_attempts:
+                        if ordered: pending.appendleft(n)
+                        else: pending.append(n)
+                    else:
+                        log.warning(f"[RCON {self.addr}] {commands[n]} failed: {repr(e)}")
+                if pending:
+                    await asyncio.sleep(self.pacing(commands[n]))
+
+        workers = 1 if ordered else min(self.pool_size, len(commands))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+    async def check(self) -> bool:
+        try:
+            reply = await self.send("ServerInfo")
+        except (TimeoutError, ConnectionError, OSError):
+            return False
+        return isinstance(reply, dict) and reply.get('Successful', False)
+    
+    def latency_percentiles(self, percentiles: Tuple[float, ...]=(50, 90, 99)) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for command, samples in self.latencies.items():
+            ordered = sorted(samples)
+            stats[command] = {
+                f"p{p:g}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+                for p in percentiles }
+            stats[command]['count'] = len(ordered)
+        return stats
+
+    @staticmethod
+    async def _close(rcon: PavlovRCON):
+        try:
+            await rcon.close()
+        except (OSError, ConnectionError):
+            pass
+
+    async def disconnect(self):
+        while not self._pool.empty():
+            await self._close(self._pool.get_nowait())
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+
 class RCONManager:
     def safe_rcon(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             self = args[0]
             serveraddr = args[1]
-            if serveraddr not in self.server_timeouts:
-                self.server_timeouts[serveraddr] = asyncio.Lock()
-            async with self.server_timeouts[serveraddr]:
-                attempts = 0
-                while attempts < kwargs.get('retry_attempts', 10):
-                    try:
-                        result = await func(*args, **kwargs)
-                        # log.debug(f"[{func.__name__} n={attempts} addr={serveraddr}] {str(result)[:89 if len(str(result)) > 92 else 92]}{'...' if len(str(result)) > 92 else ''}")
-                        if isinstance(result, str):
-                            log.warning(f"[{attempts}] rcon returned str instead of dict: {result}")
-                            result = None
-                        if result and result.get('Successful', True):
-                            async def delay_release():
-                                await asyncio.sleep(0.15)
-                            asyncio.create_task(delay_release())
-                            return dict() if result is None else result
-                    except (TimeoutError, ConnectionRefusedError):
-                        if serveraddr in self.servers:
-                            del self.servers[serveraddr]
-                            del self.server_timeouts[serveraddr]
-                        return dict()
-                    attempts += 1
-                    await asyncio.sleep(1)
-                return dict()
+            retry_attempts = kwargs.get('retry_attempts', 10)
+            attempts = 0
+            while attempts < retry_attempts:
+                server = self.servers.get(serveraddr)
+                if server is None or server.state == ServerState.DEAD:
+                    return dict()
+                try:
+                    result = await func(*args, **kwargs)
+                    if isinstance(result, str):
+                        log.warning(f"[{attempts}] rcon returned str instead of dict: {result}")
+                        result = None
+                    if result and result.get('Successful', True):
+                        return result
+                    delay = RETRY_INTERVAL
+                except (TimeoutError, ConnectionError, OSError):
+                    delay = backoff_delay(attempts + 1)
+                attempts += 1
+                if attempts < retry_attempts:
+                    await asyncio.sleep(delay)
+            return dict()
         return wrapper
 
     def __init__(self, bot: commands.Bot):
-        self.servers: Dict[str, PavlovRCON] = {}
-        self.server_timeouts: Dict[str, asyncio.Lock] = {}
+        self.servers: Dict[str, RCONServer] = {}
         self.bot = bot
+        self._health_task: asyncio.Task | None = None
     
     async def clear_dangling_servers(self):
         servers = await self.bot.store.get_servers(free=False)
@@ -70,23 +214,56 @@ class RCONManager:
                 await self.bot.store.free_server(f'{server.host}:{server.port}')
     
     async def add_server(self, host: str, port: int, password: str) -> bool:
-        reply = None
-        rcon = PavlovRCON(host, port, password)
-        count = 0
-        while count < 3:
+        serveraddr = f'{host}:{port}'
+        server = self.servers.get(serveraddr)
+        if server and server.password == password and server.state == ServerState.HEALTHY:
+            return True
+        if server is None or server.password != password:
+            if server: await server.disconnect()
+            server = RCONServer(host, port, password)
+
+        for attempt in range(1, DEAD_AFTER + 1):
             try:
-                reply = await rcon.send("ServerInfo")
-                break
+                reply = await server.send("ServerInfo")
+                if isinstance(reply, dict) and reply.get('Successful', False):
+                    self.servers[serveraddr] = server
+                    self.start_health_checks()
+                    return True
             except ConnectionRefusedError:
-                return False
+                break
             except Exception:
-                await asyncio.sleep(1)
-                count += 1
-        if reply and isinstance(reply, dict) and reply.get('Successful', False):
-            self.servers[f'{host}:{port}'] = rcon
-            return True
+                pass
+            await asyncio.sleep(backoff_delay(attempt))
+        
+        if serveraddr not in self.servers:
+            await server.disconnect()
         return False
 
+    def start_health_checks(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self.health_check_loop())
+
+    async def health_check_loop(self):
+        while True:
+            now = monotonic()
+            due = [s for s in self.servers.values() if s.next_check <= now]
+            if due:
+                await asyncio.gather(*(s.check() for s in due), return_exceptions=True)
+            await asyncio.sleep(1)
+
+    async def batch(self, serveraddr: str, commands: List[str], retry_attempts: int=2, ordered: bool=False) -> List[dict | None]:
+        server = self.servers.get(serveraddr)
+        if server is None or server.state == ServerState.DEAD or not commands:
+            return [None] * len(commands)
+        return await server.send_batch(commands, retry_attempts, ordered)
+
+    def server_state(self, serveraddr: str) -> ServerState | None:
+        server = self.servers.get(serveraddr)
+        return server.state if server else None
+
+    def latency_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return { addr: server.latency_percentiles() for addr, server in self.servers.items() }
+
     @safe_rcon
     async def remove_server(self, serveraddr: str, *args, **kwargs):
         if serveraddr in self.servers:
@@ -175,10 +352,8 @@ class RCONManager:
             rcon = self.servers[serveraddr]
             reply = await rcon.send("InspectAll")
             if isinstance(reply, str): return reply
-            for user in reply['InspectList']:
-                await rcon.send(f"Kick {user['UniqueId']}")
-                await asyncio.sleep(0.2)
-            return {'Successful': True}
+            results = await self.batch(serveraddr, [f"Kick {user['UniqueId']}" for user in reply['InspectList']])
+            return {'Successful': True, 'Results': results}
 
     @safe_rcon
     async def unban_all_players(self, serveraddr: str, *args, **kwargs):
@@ -186,10 +361,8 @@ class RCONManager:
             rcon = self.servers[serveraddr]
             reply = await rcon.send("Banlist")
             if isinstance(reply, str): return reply
-            for user in reply['BanList']:
-                await rcon.send(f"Unban {user}")
-                await asyncio.sleep(0.2)
-            return {'Successful': True}
+            results = await self.batch(serveraddr, [f"Unban {user}" for user in reply['BanList']])
+            return {'Successful': True, 'Results': results}
 
     @safe_rcon
     async def allocate_team(self, serveraddr: str, platform_id: str, teamid: int, *args, **kwargs):
@@ -244,3 +417,7 @@ class RCONManager:
         if serveraddr in self.servers:
             rcon = self.servers[serveraddr]
             return await rcon.send(f"UGCClearModList")
+    
+    async def add_mods(self, serveraddr: str, mod_ids: List[str]) -> List[dict | None]:
+        return await self.batch(serveraddr, [f"UGCAddMod {mod_id}" for mod_id in mod_ids], ordered=True)
+
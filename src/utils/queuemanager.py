@@ -19,22 +19,38 @@
 import asyncio
 from datetime import datetime, timezone
 from collections import deque
-from typing import TYPE_CHECKING
+from time import monotonic
+from typing import Any, Callable, Dict, List, Set, Tuple, TYPE_CHECKING, cast
 if TYPE_CHECKING:
     from main import Bot
 
 import nextcord
 
-from config import GUILD_ID, VALORS_THEME1_1, VALORS_THEME2, MATCH_PLAYER_COUNT
+from config import GUILD_ID, VALORS_THEME1_1, VALORS_THEME2, MATCH_PLAYER_COUNT, QUEUE_ELIGIBILITY_TTL
 from utils.logger import Logger as log
+from utils.message_scheduler import Lane
+from utils.models import BotSettings, MMBotQueueUsers
+from utils.timers import Timer
 from utils.utils import format_duration, create_queue_embed
 
 
 class QueueManager:
     def __init__(self, bot: "Bot"):
         self.bot = bot
-        self.active_users = {}
-        self.tasks = {}
+        self.active_users: Dict[int, int] = {}
+        self.reminders: Dict[int, nextcord.Message] = {}
+        self.bot.timers.register("queue_reminder", self.send_reminders)
+        self.bot.timers.register("queue_expiry", self.expire_users)
+        self.bot.timers.register("block_expiry", self.expire_blocks)
+
+        # Queue eligibility state, hydrated in fetch_and_initialize_users
+        self.blocks: Dict[int, datetime] = {}
+        self.in_match: Set[int] = set()
+        self.eligibility: Dict[int, Tuple[float, str]] = {}
+        self.abandons: Dict[int, Tuple[float, int, datetime | None]] = {}
+
+        self.pending_writes: asyncio.Queue[Tuple[Callable, Dict[str, Any]]] = asyncio.Queue()
+        self.writer_task = None
 
         self.queue = deque()
         self.last_update = 0
@@ -64,64 +80,172 @@ class QueueManager:
                 self.last_update = asyncio.get_event_loop().time()
             await asyncio.sleep(4)
 
-    async def reminder_and_kick(self, user_id: int, expiry: int):
-        try:
-            settings = await self.bot.settings_cache(GUILD_ID)
-            guild = self.bot.get_guild(GUILD_ID)
-            reminder_time = expiry - int(datetime.now(timezone.utc).timestamp()) - settings.mm_queue_reminder
-            reminder_msg = None
-            if reminder_time > 0:
-                await asyncio.sleep(reminder_time)
-                user = self.bot.get_user(user_id)
-                if user:
-                    embed = nextcord.Embed(
-                        title="Queue", 
-                        description=f"`{format_duration(settings.mm_queue_reminder)}` left in \n<#{settings.mm_queue_channel}>!", 
-                        color=VALORS_THEME2)
-                    try:
-                        reminder_msg = await user.send(embed=embed)
-                    except (nextcord.Forbidden, nextcord.HTTPException): pass
-            
-            await asyncio.sleep(max(0, expiry - int(datetime.now(timezone.utc).timestamp())))
-            await self.bot.store.unqueue_user(settings.mm_queue_channel, user_id)
-
-            if reminder_msg: await reminder_msg.delete()
+    async def send_reminders(self, timers: List[Timer]):
+        settings = await self.bot.settings_cache(GUILD_ID)
+        embed = nextcord.Embed(
+            title="Queue", 
+            description=f"`{format_duration(settings.mm_queue_reminder)}` left in \n<#{settings.mm_queue_channel}>!", 
+            color=VALORS_THEME2)
+
+        async def remind(user_id: int):
             user = self.bot.get_user(user_id)
-            if user:
-                embed = nextcord.Embed(
-                    title="Queue", 
-                    description=f"You were removed from the queue in \n<#{settings.mm_queue_channel}>.", 
-                    color=VALORS_THEME1_1)
-                try:
-                    await user.send(embed=embed)
-                except (nextcord.Forbidden, nextcord.HTTPException): pass
-
-            channel = guild.get_channel(settings.mm_queue_channel)
-            message = await channel.fetch_message(settings.mm_queue_message)
-            queue_users = await self.bot.store.get_queue_users(channel.id)
-            asyncio.create_task(self.update_presence(len(queue_users)))
-            embed = create_queue_embed(queue_users)
-            await message.edit(embeds=[message.embeds[0], embed])
-            self.active_users.pop(user_id, None)
-            self.tasks.pop(user_id, None)
-        except Exception as e:
-            log.error(f"{repr(e)}")
+            if not user: return
+            try:
+                self.reminders[user_id] = await user.send(embed=embed)
+            except (nextcord.Forbidden, nextcord.HTTPException): pass
+
+        await asyncio.gather(*(remind(t.payload['user_id']) for t in timers if t.payload['user_id'] in self.active_users))
+
+    async def expire_users(self, timers: List[Timer]):
+        expired = [t.payload['user_id'] for t in timers 
+            if self.active_users.get(t.payload['user_id']) == t.payload['expiry']]
+        if not expired: return
+        settings = await self.bot.settings_cache(GUILD_ID)
+        for user_id in expired:
+            self.unqueue_user(settings.mm_queue_channel, user_id)
+
+        embed = nextcord.Embed(
+            title="Queue", 
+            description=f"You were removed from the queue in \n<#{settings.mm_queue_channel}>.", 
+            color=VALORS_THEME1_1)
+
+        async def notify(user_id: int):
+            try:
+                reminder_msg = self.reminders.pop(user_id, None)
+                if reminder_msg: await reminder_msg.delete()
+                user = self.bot.get_user(user_id)
+                if user: await user.send(embed=embed)
+            except (nextcord.Forbidden, nextcord.HTTPException): pass
+
+        await asyncio.gather(*(notify(user_id) for user_id in expired))
+
+        queue_users = self.queued_users(settings.mm_queue_channel)
+        asyncio.create_task(self.update_presence(len(queue_users)))
+        await self.refresh_queue_message(settings, queue_users)
+
+    def queued_users(self, channel_id: int) -> List[MMBotQueueUsers]:
+        return [MMBotQueueUsers(guild_id=GUILD_ID, user_id=user_id, queue_channel=channel_id, queue_expiry=expiry) 
+            for user_id, expiry in self.active_users.items()]
+
+    async def refresh_queue_message(self, settings: BotSettings, queue_users: List[MMBotQueueUsers], lane: Lane=Lane.COSMETIC):
+        channel = self.bot.get_guild(settings.guild_id).get_channel(settings.mm_queue_channel)
+        if not channel or not settings.mm_queue_message: return
+        try:
+            embeds = await self.bot.messages.embeds(channel, settings.mm_queue_message)
+        except nextcord.HTTPException as e:
+            return log.warning(f"Queue message {settings.mm_queue_message} unavailable: {repr(e)}")
+        self.bot.messages.edit(channel, settings.mm_queue_message, lane, embeds=[embeds[0], create_queue_embed(queue_users)])
+
+    async def expire_blocks(self, timers: List[Timer]):
+        for timer in timers:
+            self.blocked_until(timer.payload['user_id'])
 
     def add_user(self, user_id: int, expiry_timestamp: int):
-        if user_id in self.tasks:
-            self.remove_user(user_id)
+        self.remove_user(user_id)
+        self.reminders.pop(user_id, None)
         self.active_users[user_id] = expiry_timestamp
-        task = asyncio.create_task(self.reminder_and_kick(user_id, expiry_timestamp))
-        self.tasks[user_id] = task
+        self.bot.server_choices.user_joined(user_id)
+        payload = { "user_id": user_id, "expiry": expiry_timestamp }
+        settings = self.bot.settings_cache.cached(GUILD_ID)
+        if settings and expiry_timestamp - settings.mm_queue_reminder > datetime.now(timezone.utc).timestamp():
+            self.bot.timers.schedule("queue_reminder", f"queue_reminder:{user_id}", 
+                expiry_timestamp - settings.mm_queue_reminder, payload)
+        self.bot.timers.schedule("queue_expiry", f"queue_expiry:{user_id}", expiry_timestamp, payload)
+
+    def queue_user(self, guild_id: int, channel_id: int, user_id: int, expiry: int):
+        self.add_user(user_id, expiry)
+        self.persist(self.bot.store.upsert_queue_user, 
+            user_id=user_id, guild_id=guild_id, queue_channel=channel_id, queue_expiry=expiry)
+    
+    def unqueue_user(self, channel_id: int, user_id: int):
+        self.remove_user(user_id)
+        self.persist(self.bot.store.unqueue_user, channel_id=channel_id, user_id=user_id)
 
     def remove_user(self, user_id):
-        if user_id in self.tasks:
-            self.tasks[user_id].cancel()
-            self.tasks.pop(user_id, None)
-        self.active_users.pop(user_id, None)
+        self.bot.timers.cancel(f"queue_reminder:{user_id}")
+        self.bot.timers.cancel(f"queue_expiry:{user_id}")
+        if self.active_users.pop(user_id, None) is not None:
+            self.bot.server_choices.user_left(user_id)
+
+    def persist(self, func: Callable, **kwargs):
+        self.pending_writes.put_nowait((func, kwargs))
+        if self.writer_task is None or self.writer_task.done():
+            self.writer_task = asyncio.create_task(self._write_behind())
+    
+    async def _write_behind(self):
+        while True:
+            func, kwargs = await self.pending_writes.get()
+            try:
+                await func(**kwargs)
+            except Exception as e:
+                log.error(f"Queue write {func.__name__} failed: {repr(e)}")
+            finally:
+                self.pending_writes.task_done()
+    
+    async def flush(self):
+        await self.pending_writes.join()
+    
+    async def get_eligibility(self, guild_id: int, user_id: int) -> Tuple[bool, bool, str | None]:
+        cached = self.eligibility.get(user_id)
+        if cached and monotonic() - cached[0] < QUEUE_ELIGIBILITY_TTL:
+            return True, True, cached[1]
+        platforms = await self.bot.store.get_user_platforms(guild_id, user_id)
+        if not platforms:
+            return False, False, None
+        user = await self.bot.store.get_user(guild_id, user_id)
+        if not user or not user.region:
+            return True, bool(user), None
+        self.eligibility[user_id] = (monotonic(), cast(str, user.region))
+        return True, True, cast(str, user.region)
+    
+    def invalidate_user(self, user_id: int | None=None):
+        if user_id is None:
+            self.eligibility.clear()
+            self.abandons.clear()
+        else:
+            self.eligibility.pop(user_id, None)
+            self.abandons.pop(user_id, None)
+    
+    def blocked_until(self, user_id: int) -> datetime | None:
+        expiration = self.blocks.get(user_id)
+        if expiration and expiration > datetime.now(timezone.utc):
+            return expiration
+        self.blocks.pop(user_id, None)
+        return None
+    
+    def set_block(self, user_id: int, expiration: datetime):
+        self.blocks[user_id] = expiration
+        self.bot.timers.schedule("block_expiry", f"block_expiry:{user_id}", 
+            expiration.timestamp(), { "user_id": user_id })
+    
+    async def is_in_match(self, user_id: int) -> bool:
+        if user_id not in self.in_match:
+            return False
+        if await self.bot.store.is_user_in_match(user_id):
+            return True
+        self.in_match.discard(user_id)
+        return False
+    
+    def hold_match_players(self, user_ids: List[int]):
+        self.in_match.update(user_ids)
+    
+    def release_match_players(self, user_ids: List[int]):
+        for user_id in user_ids:
+            self.in_match.discard(user_id)
+            self.abandons.pop(user_id, None)
+    
+    async def get_abandons(self, guild_id: int, user_id: int) -> Tuple[int, datetime | None]:
+        cached = self.abandons.get(user_id)
+        if cached and monotonic() - cached[0] < QUEUE_ELIGIBILITY_TTL:
+            return cached[1], cached[2]
+        count, last_abandon = await self.bot.store.get_abandon_count_last_period(guild_id, user_id)
+        self.abandons[user_id] = (monotonic(), count, last_abandon)
+        return count, last_abandon
 
     async def fetch_and_initialize_users(self) -> int:
         settings = await self.bot.settings_cache(GUILD_ID)
+        self.blocks = { cast(int, b.user_id): b.expiration for b in await self.bot.store.get_user_blocks(GUILD_ID) }
+        self.in_match = set(await self.bot.store.get_users_in_match(GUILD_ID))
         try:
             queue_users = await self.bot.store.get_queue_users(settings.mm_queue_channel)
             count = len(queue_users) if queue_users else 0
@@ -0,0 +1,116 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from time import monotonic
+from typing import Dict, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from main import Bot
+
+from utils.logger import Logger as log
+
+POLL_FAST = 1.0        # Round just ended, scores and stats about to change
+POLL_DEFAULT = 3.0     # Round in progress
+POLL_SLOW = 6.0        # Buy time, warmup or an empty server
+
+
+class PollTick:
+    def __init__(self, server_info: dict, inspect_all: dict | None, timestamp: float):
+        self.server_info = server_info
+        self.inspect_all = inspect_all if inspect_all is not None else {}
+        self.timestamp = timestamp
+
+
+class PollSubscription:
+    def __init__(self, scheduler: "RCONPollScheduler", serveraddr: str, inspect: bool):
+        self.scheduler = scheduler
+        self.serveraddr = serveraddr
+        self.inspect = inspect
+        self.tick: PollTick | None = None
+        self._event = asyncio.Event()
+    
+    def push(self, tick: PollTick):
+        self.tick = tick
+        self._event.set()
+    
+    async def next(self) -> PollTick:
+        await self._event.wait()
+        self._event.clear()
+        return self.tick
+    
+    def close(self):
+        self.scheduler.unsubscribe(self)
+
+
+class RCONPollScheduler:
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.subscriptions: Dict[str, Set[PollSubscription]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+    
+    def subscribe(self, serveraddr: str, inspect: bool=True) -> PollSubscription:
+        subscription = PollSubscription(self, serveraddr, inspect)
+        self.subscriptions.setdefault(serveraddr, set()).add(subscription)
+        if serveraddr not in self.tasks or self.tasks[serveraddr].done():
+            self.tasks[serveraddr] = asyncio.create_task(self._poll_server(serveraddr))
+        return subscription
+    
+    def unsubscribe(self, subscription: PollSubscription):
+        subscriptions = self.subscriptions.get(subscription.serveraddr)
+        if subscriptions is None: return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.serveraddr]
+            task = self.tasks.pop(subscription.serveraddr, None)
+            if task and task is not asyncio.current_task():
+                task.cancel()
+    
+    @staticmethod
+    def interval(server_info: dict) -> float:
+        info = server_info.get('ServerInfo')
+        if not isinstance(info, dict):
+            return POLL_DEFAULT
+        if str(info.get('PlayerCount', '0')).startswith('0'):
+            return POLL_SLOW
+        round_state = info.get('RoundState')
+        if round_state == 'Ended':
+            return POLL_FAST
+        if round_state in ('Starting', 'StandBy'):
+            return POLL_SLOW
+        return POLL_DEFAULT
+    
+    async def _poll_server(self, serveraddr: str):
+        rcon = self.bot.rcon_manager
+        while subscriptions := self.subscriptions.get(serveraddr):
+            start = monotonic()
+            try:
+                if any(s.inspect for s in subscriptions):
+                    server_info, inspect_all = await asyncio.gather(
+                        rcon.server_info(serveraddr, retry_attempts=1),
+                        rcon.inspect_all(serveraddr, retry_attempts=1))
+                else:
+                    server_info, inspect_all = await rcon.server_info(serveraddr, retry_attempts=1), None
+            except Exception as e:
+                log.warning(f"[RCON {serveraddr}] Poll failed: {repr(e)}")
+                server_info, inspect_all = {}, None
+            
+            tick = PollTick(server_info or {}, inspect_all, monotonic())
+            for subscription in list(self.subscriptions.get(serveraddr, ())):
+                subscription.push(tick)
+            await asyncio.sleep(max(0.0, self.interval(tick.server_info) - (monotonic() - start)))
@@ -0,0 +1,105 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import base64
+import hashlib
+from time import time
+from typing import Any, Awaitable, Callable, Iterable, Tuple
+
+import redis
+from redis.exceptions import RedisError
+
+from config import RENDER_CACHE_MAX_ENTRIES, RENDER_CACHE_TTL, VALORS_THEME1, VALORS_THEME1_1, VALORS_THEME1_2, VALORS_THEME2
+from utils.logger import Logger as log
+
+RENDER_LRU_KEY = "render:lru"
+THEME = (VALORS_THEME1, VALORS_THEME1_1, VALORS_THEME1_2, VALORS_THEME2)
+
+
+def render_key(*parts: Any) -> str:
+    digest = hashlib.sha1(repr((THEME, parts)).encode()).hexdigest()
+    return f"render:{digest}"
+
+def score_image_key(match_id: int, match_stats: Iterable[Any]) -> str:
+    return render_key("score", match_id, sorted(
+        (s.user_id, s.kills, s.deaths, s.assists, s.score, s.mmr_change, s.abandoned) for s in match_stats))
+
+def user_index_key(guild_id: int, user_id: int) -> str:
+    return f"render:user:{guild_id}:{user_id}"
+
+
+class RenderCache:
+    def __init__(self, cache: redis.StrictRedis, max_entries: int=RENDER_CACHE_MAX_ENTRIES, ttl: int=RENDER_CACHE_TTL):
+        self.cache = cache
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            data = self.cache.get(key)
+            if data is None:
+                return None
+            self.cache.zadd(RENDER_LRU_KEY, { key: time() })
+            return base64.b64decode(data)
+        except (RedisError, ValueError) as e:
+            log.warning(f"Render cache read {key} failed: {repr(e)}")
+            return None
+
+    def set(self, key: str, data: bytes, users: Iterable[Tuple[int, int]]=()):
+        try:
+            pipe = self.cache.pipeline()
+            pipe.set(key, base64.b64encode(data), ex=self.ttl)
+            pipe.zadd(RENDER_LRU_KEY, { key: time() })
+            for guild_id, user_id in users:
+                pipe.sadd(user_index_key(guild_id, user_id), key)
+                pipe.expire(user_index_key(guild_id, user_id), self.ttl)
+            pipe.execute()
+
+            overflow = self.cache.zcard(RENDER_LRU_KEY) - self.max_entries
+            if overflow > 0:
+                evicted = [k for k, _ in self.cache.zpopmin(RENDER_LRU_KEY, overflow)]
+                if evicted: self.cache.delete(*evicted)
+        except RedisError as e:
+            log.warning(f"Render cache write {key} failed: {repr(e)}")
+
+    async def cached(self, key: str, render: Callable[[], Awaitable[bytes]], users: Iterable[Tuple[int, int]]=()) -> bytes:
+        data = self.get(key)
+        if data is None:
+            data = await render()
+            self.set(key, data, users)
+        return data
+
+    def invalidate_users(self, guild_id: int, user_ids: Iterable[int]):
+        try:
+            for user_id in user_ids:
+                index = user_index_key(guild_id, user_id)
+                keys = list(self.cache.smembers(index))
+                if keys:
+                    self.cache.delete(*keys)
+                    self.cache.zrem(RENDER_LRU_KEY, *keys)
+                self.cache.delete(index)
+        except RedisError as e:
+            log.warning(f"Render cache invalidation failed: {repr(e)}")
+
+    def clear(self):
+        try:
+            keys = list(self.cache.zrange(RENDER_LRU_KEY, 0, -1))
+            if keys: self.cache.delete(*keys)
+            self.cache.delete(RENDER_LRU_KEY)
+        except RedisError as e:
+            log.warning(f"Render cache clear failed: {repr(e)}")
@@ -0,0 +1,165 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, FrozenSet, List, Set, Tuple, TYPE_CHECKING, cast
+if TYPE_CHECKING:
+    from main import Bot
+
+import numpy as np
+
+from config import GUILD_ID, SERVER_CHOICE_REFRESH, SERVER_PREWARM_COUNT
+from matches.server_selection import ServerScores, score_servers
+from utils.logger import Logger as log
+from utils.models import BotRegions, MMBotUsers, RconServers
+
+ROSTER_LIMIT = 8
+
+
+class ServerChoiceCache:
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.regions: List[BotRegions] = []
+        self.servers: List[RconServers] = []
+        self.rtts: Dict[int, np.ndarray] = {}
+        self.rosters: OrderedDict[FrozenSet[int], Tuple[List[RconServers], Dict[int, np.ndarray]]] = OrderedDict()
+        self.warm: Set[str] = set()
+        self.taken: Set[str] = set()
+
+        self.joined: Set[int] = set()
+        self.left: Set[int] = set()
+        self.refreshed = 0.0
+        self.dirty = asyncio.Event()
+        self.task = None
+
+    def user_joined(self, user_id: int):
+        self.left.discard(user_id)
+        self.joined.add(user_id)
+        self._wake()
+
+    def user_left(self, user_id: int):
+        self.joined.discard(user_id)
+        self.left.add(user_id)
+        self._wake()
+
+    def claim(self, serveraddr: str) -> bool:
+        if serveraddr in self.taken:
+            return False
+        self.taken.add(serveraddr)
+        self.warm.discard(serveraddr)
+        keep = [i for i, s in enumerate(self.servers) if f'{s.host}:{s.port}' != serveraddr]
+        if len(keep) == len(self.servers): return True
+        self.servers = [self.servers[i] for i in keep]
+        self.rtts = { user_id: row[keep] for user_id, row in self.rtts.items() }
+        self._wake()
+        return True
+
+    def release(self, serveraddr: str):
+        self.taken.discard(serveraddr)
+        self.refreshed = 0.0
+        self._wake()
+
+    def hold_roster(self, user_ids: List[int]):
+        if not self.servers: return
+        roster = frozenset(user_ids)
+        self.rosters[roster] = (list(self.servers), { user_id: self.rtts[user_id] for user_id in roster if user_id in self.rtts })
+        self.rosters.move_to_end(roster)
+        if len(self.rosters) > ROSTER_LIMIT:
+            self.rosters.popitem(last=False)
+
+    async def choices(self, user_ids: List[int]) -> List[Tuple[RconServers, float]] | None:
+        held = self.rosters.pop(frozenset(user_ids), None)
+        if held is None:
+            return None
+        servers, rtts = held
+        missing = [user_id for user_id in user_ids if user_id not in rtts]
+        if missing:
+            for user in await self.bot.store.get_users(GUILD_ID, missing):
+                try:
+                    scores = score_servers(self.regions, [user], servers)
+                except ValueError:
+                    continue
+                if scores:
+                    rtts[cast(int, user.user_id)] = scores.rtts[0]
+        if not rtts:
+            return None
+        return ServerScores(servers, np.vstack(list(rtts.values()))).ranked()
+
+    def _wake(self):
+        self.dirty.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.dirty.wait(), timeout=SERVER_CHOICE_REFRESH)
+            except asyncio.TimeoutError: pass
+            self.dirty.clear()
+            try:
+                await self._update()
+            except Exception as e:
+                log.error(f"Server choice update failed: {repr(e)}")
+
+    async def _update(self):
+        if monotonic() - self.refreshed >= SERVER_CHOICE_REFRESH:
+            self.regions = await self.bot.store.get_regions(GUILD_ID)
+            self.servers = await self.bot.store.get_servers(free=True)
+            self.refreshed = monotonic()
+            self.taken -= { f'{s.host}:{s.port}' for s in self.servers }
+            self.joined.update(self.rtts)
+            self.rtts.clear()
+
+        for user_id in self.left:
+            self.rtts.pop(user_id, None)
+        self.left.clear()
+
+        if self.joined and self.servers:
+            joined, self.joined = list(self.joined), set()
+            for user in await self.bot.store.get_users(GUILD_ID, joined):
+                self._add_user(user)
+
+        if not self.rtts or not self.servers:
+            return
+        ranked = ServerScores(self.servers, np.vstack(list(self.rtts.values()))).ranked()
+        await self._prewarm(ranked[:SERVER_PREWARM_COUNT])
+
+    def _add_user(self, user: MMBotUsers):
+        try:
+            scores = score_servers(self.regions, [user], self.servers)
+        except ValueError:
+            return
+        if scores:
+            self.rtts[cast(int, user.user_id)] = scores.rtts[0]
+
+    async def _prewarm(self, top: List[Tuple[RconServers, float]]):
+        wanted = { f'{server.host}:{server.port}': server for server, _ in top }
+        for serveraddr in self.warm - wanted.keys():
+            await self.bot.rcon_manager.remove_server(serveraddr)
+        self.warm &= wanted.keys()
+
+        async def warm(serveraddr: str, server: RconServers):
+            if await self.bot.rcon_manager.add_server(cast(str, server.host), cast(int, server.port), cast(str, server.password)):
+                self.warm.add(serveraddr)
+
+        cold = [(addr, server) for addr, server in wanted.items() 
+            if addr not in self.warm and addr not in self.bot.rcon_manager.servers]
+        if cold:
+            await asyncio.gather(*(warm(addr, server) for addr, server in cold))
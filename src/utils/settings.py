@@ -49,6 +49,9 @@ class SettingsCache:
             return self._cache[guild_id]
         return None
     
+    def cached(self, guild_id: int) -> BotSettings | None:
+        return self._get_cache(guild_id)
+    
     @overload
     async def __call__(self, guild_id: int) -> BotSettings:
         """Getter for Settings Cache
@@ -20,10 +20,9 @@ from typing import Dict, List, Any, Tuple
 from math import floor
 from datetime import datetime
 import pytz
-from concurrent.futures import ProcessPoolExecutor
 
 import nextcord
-from nextcord import Embed, Guild, User, Member, TextChannel
+from nextcord import Embed, Guild, User, Member
 import pandas as pd
 import numpy as np
 from scipy.fft import fft, ifft
@@ -31,13 +30,112 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 from config import VALORS_THEME1, VALORS_THEME1_1, VALORS_THEME1_2, VALORS_THEME2, REGION_TIMEZONES, PLACEMENT_MATCHES
-from utils.models import MMBotRanks, MMBotUserMatchStats, BotSettings, MMBotUsers
+from utils.models import MMBotRanks, MMBotUserMatchStats, MMBotUsers
 from utils.utils import get_rank_color, get_rank_role, next_rank_role, replace_wide_chars_with_space, format_duration
 
-async def create_graph_async(loop, graph_type, match_stats, ranks=None, preferences=None, play_periods=None, user_region=None):
-    with ProcessPoolExecutor() as pool:
-        return await loop.run_in_executor(pool, create_graph, 
-            graph_type, match_stats, ranks, preferences, play_periods, user_region)
+MINUTES_IN_DAY = 24 * 60
+
+def _heat_color_lut(levels: int=256) -> np.ndarray:
+    values = np.linspace(0, 1, levels)
+    r = np.where(values < 0.33, values * 3, 1.0)
+    g = np.where(values < 0.33, 0.0, np.where(values < 0.66, (values - 0.33) * 3, 1.0))
+    b = np.where(values < 0.66, 0.0, (values - 0.66) * 3)
+    rgb = (np.stack([r, g, b], axis=1) * 255).astype(int)
+    return np.array([f'rgb({r},{g},{b})' for r, g, b in rgb])
+
+HEAT_COLORS = _heat_color_lut()
+
+def _activity_minutes(play_periods: List[Tuple[datetime, datetime]]) -> np.ndarray:
+    bounds = np.array([
+        (start.hour * 60 + start.minute, end.hour * 60 + end.minute) 
+        for start, end in play_periods], dtype=int).reshape(-1, 2)
+    starts, ends = bounds[:, 0], bounds[:, 1]
+
+    diff = np.zeros(MINUTES_IN_DAY + 1, dtype=float)
+    np.add.at(diff, starts, 1)
+    np.add.at(diff, ends + 1, -1)
+    diff[0] += np.count_nonzero(ends < starts)
+    return np.cumsum(diff[:MINUTES_IN_DAY])
+
+def _circular_gaussian_smooth(minutes_array: np.ndarray, sigma: float) -> np.ndarray:
+    n = len(minutes_array)
+    x = np.arange(n)
+    kernel = np.roll(np.exp(-0.5 * ((x - n/2)**2) / sigma**2), n//2)
+    return np.real(ifft(fft(minutes_array) * kernel))
+
+def _region_offset_hours(user_region: str | None) -> float:
+    if user_region not in REGION_TIMEZONES:
+        return 0
+    tz = pytz.timezone(REGION_TIMEZONES[user_region])
+    return datetime.now(pytz.UTC).astimezone(tz).utcoffset().total_seconds() / 3600
+
+def create_activity_graph(
+    play_periods: List[Tuple[datetime, datetime]], 
+    total_games: int, 
+    user_region: str | None=None
+) -> go.Figure:
+    offset_hours = _region_offset_hours(user_region)
+
+    minutes_in_day = _circular_gaussian_smooth(_activity_minutes(play_periods), 15)
+    minutes_in_day -= minutes_in_day.min()
+    minutes_in_day /= minutes_in_day.max()
+    colors = HEAT_COLORS[np.rint(minutes_in_day * (len(HEAT_COLORS) - 1)).astype(int)]
+
+    step = 360 / MINUTES_IN_DAY
+    theta = (np.arange(MINUTES_IN_DAY) * step - offset_hours * 15) % 360
+
+    # axes span [-1.2, 1.2] so the ring of radius 1 fills the middle 2/2.4 of the figure
+    def to_paper(v):
+        return (v + 1.2) / 2.4
+    
+    fig = go.Figure(go.Barpolar(
+        r=np.ones(MINUTES_IN_DAY),
+        theta=theta,
+        width=step,
+        marker=dict(color=colors, line=dict(width=0)),
+        hoverinfo='none',
+        showlegend=False))
+
+    for hour in range(24):
+        angle = (hour - 6 - offset_hours) * (2*np.pi/24)
+        x, y = 1.1 * np.cos(-angle), 1.1 * np.sin(-angle)
+        adjusted_hour = int((hour - offset_hours) % 24)
+        fig.add_annotation(
+            x=to_paper(x), y=to_paper(y),
+            xref='paper', yref='paper',
+            text=f"{adjusted_hour % 12 or 12} {'AM' if adjusted_hour < 12 else 'PM'}",
+            showarrow=False,
+            font=dict(size=10))
+
+    timezone_info = REGION_TIMEZONES.get(user_region, "/UTC").split('/')[-1]
+    fig.add_annotation(
+        x=0.5, y=0.5,
+        xref='paper', yref='paper',
+        text=f"Total Games: {total_games}<br>Timezone: {timezone_info}",
+        showarrow=False,
+        font=dict(size=12),
+        align="center",
+        bordercolor="white",
+        borderwidth=2,
+        borderpad=4,
+        bgcolor="rgba(0,0,0,0.5)",
+        opacity=0.8
+    )
+
+    fig.update_layout(
+        showlegend=False,
+        polar=dict(
+            domain=dict(x=[to_paper(-1), to_paper(1)], y=[to_paper(-1), to_paper(1)]),
+            hole=0.5,
+            bgcolor='rgba(0,0,0,0)',
+            radialaxis=dict(visible=False, range=[0, 1]),
+            angularaxis=dict(visible=False, rotation=0, direction='counterclockwise')),
+        width=600,
+        height=600,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(l=0, r=0, t=0, b=0))
+    return fig
 
 def create_graph(
     graph_type: str, 
@@ -59,125 +157,7 @@ def create_graph(
     theme_color2 = f'#{hex(VALORS_THEME2)[2:]}'
 
     if graph_type == "activity_hours":
-        def circular_gaussian_smooth_inplace(minutes_array, sigma):
-            n = len(minutes_array)
-            x = np.arange(n)
-            kernel = np.exp(-0.5 * ((x - n/2)**2) / sigma**2)
-            kernel = np.roll(kernel, n//2)
-            fft_minutes = fft(minutes_array)
-            fft_minutes *= kernel
-            minutes_array[:] = np.real(ifft(fft_minutes))
-
-        def normalize_inplace(arr):
-            min_val = np.min(arr)
-            max_val = np.max(arr)
-            arr -= min_val
-            arr /= (max_val - min_val)
-
-        def value_to_color(value):
-            if value < 0.33:
-                r = value * 3
-                return f'rgb({int(r*255)},0,0)'
-            elif value < 0.66:
-                r = 1
-                g = (value - 0.33) * 3
-                return f'rgb(255,{int(g*255)},0)'
-            else:
-                r = 1
-                g = 1
-                b = (value - 0.66) * 3
-                return f'rgb(255,255,{int(b*255)})'
-        
-        def minutes_to_bucket(dt):
-            return dt.hour * 60 + dt.minute
-        
-        def get_region_offset(user_region):
-            if user_region not in REGION_TIMEZONES:
-                return 0
-            
-            tz = pytz.timezone(REGION_TIMEZONES[user_region])
-            now = datetime.now(pytz.UTC)
-            now_local = now.astimezone(tz)
-            offset = now_local.utcoffset()
-            return offset.total_seconds() / 3600
-        
-        offset_hours = get_region_offset(user_region)
-        
-        minutes_in_day = np.zeros(24*60, dtype=float)
-
-        for start, end in play_periods:
-            start_minute = minutes_to_bucket(start)
-            end_minute = minutes_to_bucket(end)
-            
-            if end_minute < start_minute:
-                minutes_in_day[start_minute:] += 1
-                minutes_in_day[:end_minute+1] += 1
-            else:
-                minutes_in_day[start_minute:end_minute+1] += 1
-
-        circular_gaussian_smooth_inplace(minutes_in_day, 15)
-        normalize_inplace(minutes_in_day)
-
-        num_points = len(minutes_in_day)
-        theta = np.linspace(0, 2*np.pi, num_points, endpoint=False)
-        r_inner, r_outer = 0.5, 1.0
-
-        theta = (theta - (offset_hours * np.pi / 12)) % (2*np.pi)
-
-        x_inner = r_inner * np.cos(theta)
-        y_inner = r_inner * np.sin(theta)
-        x_outer = r_outer * np.cos(theta)
-        y_outer = r_outer * np.sin(theta)
-
-        colors = np.array([value_to_color(v) for v in minutes_in_day])
-
-        fig = go.Figure()
-
-        for i in range(num_points):
-            fig.add_trace(
-                go.Scatter(
-                    x=[x_inner[i], x_outer[i]],
-                    y=[y_inner[i], y_outer[i]],
-                    mode='lines',
-                    line=dict(color=colors[i], width=1),
-                    hoverinfo='none',
-                    showlegend=False))
-
-        for hour in range(24):
-            angle = (hour - 6 - offset_hours) * (2*np.pi/24)
-            x, y = r_outer * 1.1 * np.cos(-angle), r_outer * 1.1 * np.sin(-angle)
-            adjusted_hour = int((hour - offset_hours) % 24)
-            fig.add_annotation(
-                x=x, y=y,
-                text=f"{adjusted_hour % 12 or 12} {'AM' if adjusted_hour < 12 else 'PM'}",
-                showarrow=False,
-                font=dict(size=10))
-        
-        total_games = len(match_stats)
-        timezone_info = REGION_TIMEZONES.get(user_region, "/UTC").split('/')[-1]
-        fig.add_annotation(
-            x=0, y=0,
-            text=f"Total Games: {total_games}<br>Timezone: {timezone_info}",
-            showarrow=False,
-            font=dict(size=12),
-            align="center",
-            bordercolor="white",
-            borderwidth=2,
-            borderpad=4,
-            bgcolor="rgba(0,0,0,0.5)",
-            opacity=0.8
-        )
-        
-        fig.update_layout(
-            showlegend=False,
-            xaxis=dict(visible=False, range=[-1.2, 1.2]),
-            yaxis=dict(visible=False, range=[-1.2, 1.2]),
-            width=600,
-            height=600,
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=0, b=0))
-        fig.update_yaxes(scaleanchor="x", scaleratio=1)
+        fig = create_activity_graph(play_periods, len(match_stats), user_region)
     
     elif graph_type == "pick_preferences":
         categories = ['Bans', 'Picks', 'Sides']
@@ -364,14 +344,8 @@ def create_graph(
 
     return fig
 
-def create_stats_embed(guild: Guild, user: User | Member, user_data: MMBotUsers, leaderboard_data, summary_data, avg_stats, recent_matches, ranks) -> Embed:
-    ranked_players = 0
-    ranked_position = None
-    for player in leaderboard_data:
-        if guild.get_member(player['user_id']):
-            ranked_players += 1
-        if player['user_id'] == user.id:
-            ranked_position = ranked_players
+def create_stats_embed(guild: Guild, user: User | Member, user_data: MMBotUsers, ranking: Tuple[int | None, int], summary_data, avg_stats, recent_matches, ranks) -> Embed:
+    ranked_position, ranked_players = ranking
 
     rank_role = None if summary_data.games < PLACEMENT_MATCHES else get_rank_role(guild, ranks, summary_data.mmr)
     next_role, mmr_difference = next_rank_role(guild, ranks, summary_data.mmr)    
@@ -502,57 +476,6 @@ async def create_leaderboard_embed(guild: Guild, leaderboard_data: List[Dict[str
 
     return embed, ranking_position + 1
 
-async def update_leaderboard(store, guild: Guild):
-    settings = await store.get_settings(guild.id)
-    channel = guild.get_channel(settings.leaderboard_channel)
-    if channel and not isinstance(channel, TextChannel):
-        return
-
-    data = await store.get_leaderboard_with_previous_mmr(guild.id)
-    ranks = await store.get_ranks(guild.id)
-
-    # Remove players who have left the server
-    data = [player for player in data if guild.get_member(player['user_id'])]
-
-    total_players = len(data)
-
-    header_embed = Embed(title="Match Making Leaderboard")
-    header_embed.add_field(name="Total Players", value=str(total_players), inline=True)
-    header_embed.set_footer(text="K/D/A and Score are mean averages")
-
-    try:
-        header_message = await channel.fetch_message(settings.leaderboard_message)
-        await header_message.edit(content=None, embed=header_embed)
-    except Exception:
-        header_message = await channel.send(embed=header_embed)
-        await store.update(BotSettings, guild_id=guild.id, leaderboard_message=header_message.id)
-
-    existing_messages = []
-    async for message in channel.history(after=header_message, limit=None):
-        if message.author == guild.me:
-            existing_messages.append(message)
-        else:
-            await message.delete()
-    existing_messages.sort(key=lambda m: m.created_at)
-
-    start_rank = 1
-    for i in range((len(data) - 1) // 50 + 1):
-        embed, next_start_rank = await create_leaderboard_embed(guild, data, ranks, start_rank)
-        if i < len(existing_messages):
-            try:
-                await existing_messages[i].edit(embed=embed)
-            except:
-                await channel.send(embed=embed)
-        else:
-            await channel.send(embed=embed)
-        start_rank = next_start_rank
-
-    for message in existing_messages[((len(data) - 1) // 50 + 1):]:
-        try:
-            await message.delete()
-        except:
-            pass
-
 async def create_mute_history_embed(guild: Guild, user: User | Member, mute_history: List[Dict[str, Any]], current_page: int, total_pages: int) -> Embed:
     embed = nextcord.Embed(title=f"Mute History for {user.name}", description=f"Page {current_page} of {total_pages}", color=0xff5500)
     
@@ -0,0 +1,58 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+from time import monotonic
+from typing import Any, Dict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.database import Database
+
+from config import MATCH_STATS_FLUSH_INTERVAL
+from utils.logger import Logger as log
+
+
+class MatchStatsBuffer:
+    def __init__(self, store: "Database", guild_id: int, match_id: int, interval: float=MATCH_STATS_FLUSH_INTERVAL):
+        self.store = store
+        self.guild_id = guild_id
+        self.match_id = match_id
+        self.interval = interval
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.last_flush = monotonic()
+        self._lock = asyncio.Lock()
+    
+    def add(self, user_stats: Dict[int, Dict[str, Any]]):
+        for user_id, stats in user_stats.items():
+            self.pending.setdefault(user_id, {}).update(stats)
+    
+    def due(self) -> bool:
+        return bool(self.pending) and monotonic() - self.last_flush >= self.interval
+    
+    async def flush(self):
+        async with self._lock:
+            self.last_flush = monotonic()
+            if not self.pending: return
+            pending, self.pending = self.pending, {}
+            try:
+                await self.store.upsert_users_match_stats(self.guild_id, self.match_id, pending)
+                log.debug(f"[{self.match_id}] Flushed match stats for {len(pending)} users")
+            except Exception:
+                for user_id, stats in pending.items():
+                    self.pending[user_id] = stats | self.pending.get(user_id, {})
+                raise
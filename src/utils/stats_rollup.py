@@ -0,0 +1,107 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Bot
+
+from nextcord import Guild
+
+from utils.models import MMBotRanks, MMBotUserMatchStats, MMBotUserSummaryStats, MMBotUsers
+
+RECENT_MATCHES = 10
+ROLLUP_CACHE_SIZE = 2000
+
+
+def average_recent(recent: Deque[MMBotUserMatchStats]) -> Dict[str, float | None]:
+    def avg(column: str) -> float | None:
+        values = [getattr(match, column) for match in recent if getattr(match, column) is not None]
+        if not values:
+            return None
+        return float(sum(values) / len(values)) or None
+    return {
+        'avg_kills': avg('kills'),
+        'avg_deaths': avg('deaths'),
+        'avg_assists': avg('assists'),
+        'avg_score': avg('score'),
+        'avg_mmr_change': avg('mmr_change') }
+
+
+class StatsRollup:
+    __slots__ = ("summary", "user", "recent", "avg_stats")
+
+    def __init__(self, summary: MMBotUserSummaryStats, user: MMBotUsers, recent: List[MMBotUserMatchStats]):
+        self.summary = summary
+        self.user = user
+        self.recent: Deque[MMBotUserMatchStats] = deque(recent, maxlen=RECENT_MATCHES)
+        self.avg_stats = average_recent(self.recent)
+
+
+class StatsRollupCache:
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.rollups: OrderedDict[Tuple[int, int], StatsRollup] = OrderedDict()
+        self.ranks: Dict[int, List[MMBotRanks]] = {}
+
+    async def get(self, guild: Guild, user_id: int) -> Tuple[StatsRollup | None, Tuple[int | None, int], List[MMBotRanks]]:
+        key = (guild.id, user_id)
+        rollup = self.rollups.get(key)
+        if rollup is None:
+            summary = await self.bot.store.get_user_summary_stats(guild.id, user_id)
+            if summary:
+                user = await self.bot.store.get_user(guild.id, user_id)
+                recent = await self.bot.store.get_recent_match_stats(guild.id, user_id, RECENT_MATCHES)
+                rollup = StatsRollup(summary, user, list(recent))
+                self.rollups[key] = rollup
+                if len(self.rollups) > ROLLUP_CACHE_SIZE:
+                    self.rollups.popitem(last=False)
+        else:
+            self.rollups.move_to_end(key)
+
+        if guild.id not in self.ranks:
+            self.ranks[guild.id] = await self.bot.store.get_ranks(guild.id)
+        return rollup, await self.bot.leaderboard.position(guild, user_id), self.ranks[guild.id]
+
+    def update_summaries(self, guild_id: int, summaries: Dict[int, Dict[str, Any]]):
+        for user_id, summary in summaries.items():
+            rollup = self.rollups.get((guild_id, user_id))
+            if rollup is None:
+                continue
+            for column, value in summary.items():
+                setattr(rollup.summary, column, value)
+
+    def record_match(self, guild_id: int, match_id: int, summaries: Dict[int, Dict[str, Any]], match_stats: Dict[int, Dict[str, Any]]):
+        self.update_summaries(guild_id, summaries)
+        for user_id, stats in match_stats.items():
+            rollup = self.rollups.get((guild_id, user_id))
+            if rollup is None:
+                continue
+            stats = MMBotUserMatchStats(guild_id=guild_id, user_id=user_id, match_id=match_id, abandoned=False, **stats)
+            recent = [match for match in rollup.recent if match.match_id != match_id]
+            rollup.recent = deque([stats] + recent, maxlen=RECENT_MATCHES)
+            rollup.avg_stats = average_recent(rollup.recent)
+
+    def invalidate(self, guild_id: int, user_ids: List[int] | None=None):
+        if user_ids is None:
+            for key in [key for key in self.rollups if key[0] == guild_id]:
+                del self.rollups[key]
+            self.ranks.pop(guild_id, None)
+        else:
+            for user_id in user_ids:
+                self.rollups.pop((guild_id, user_id), None)
@@ -0,0 +1,199 @@
+# VALORS Match Making Bot - Discord based match making automation and management service
+# Copyright (C) 2024 99oblivius, <projects@oblivius.dev>
+#
+# This file is part of VALORS Match Making Bot.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asyncio
+import heapq
+import json
+from collections import defaultdict
+from itertools import count
+from time import time
+from typing import Any, Awaitable, Callable, Dict, List, TYPE_CHECKING
+if TYPE_CHECKING:
+    from main import Bot
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config import REDIS_HOST, REDIS_PORT
+from utils.logger import Logger as log
+
+TIMER_TICK = 1.0
+TIMER_CACHE_KEY = "timers"
+
+
+class Timer:
+    __slots__ = ("key", "kind", "when", "payload", "cancelled")
+
+    def __init__(self, key: str, kind: str, when: float, payload: Any=None):
+        self.key       = key
+        self.kind      = kind
+        self.when      = when
+        self.payload   = payload
+        self.cancelled = False
+
+
+class TimerScheduler:
+    def __init__(self, bot: "Bot", tick: float=TIMER_TICK):
+        self.bot = bot
+        self.tick = tick
+        self.handlers: Dict[str, Callable[[List[Timer]], Awaitable[Any]]] = {}
+        self.timers: Dict[str, Timer] = {}
+        self.cache = aioredis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+
+        self._heap: List[tuple] = []
+        self._seq = count()
+        self._stale = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._restored = False
+        self._dirty: Dict[str, str | None] = {}
+        self._persist_task = None
+
+    def register(self, kind: str, handler: Callable[[List[Timer]], Awaitable[Any]]):
+        self.handlers[kind] = handler
+
+    def schedule(self, kind: str, key: str, when: float, payload: Any=None) -> Timer:
+        self._discard(key)
+        timer = Timer(key, kind, when, payload)
+        self.timers[key] = timer
+        heapq.heappush(self._heap, (when, next(self._seq), timer))
+        self._store(timer)
+        if self._heap[0][2] is timer:
+            self._wakeup.set()
+        self.start()
+        return timer
+
+    def cancel(self, key: str) -> bool:
+        if not self._discard(key):
+            return False
+        self._unstore(key)
+        return True
+
+    def get(self, key: str) -> Timer | None:
+        return self.timers.get(key)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        if self._persist_task and not self._persist_task.done():
+            await self._persist_task
+        await self.cache.aclose()
+
+    def _discard(self, key: str) -> bool:
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        timer.cancelled = True
+        self._stale += 1
+        if self._stale > 64 and self._stale > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._stale = 0
+        return True
+
+    def _store(self, timer: Timer):
+        try:
+            self._dirty[timer.key] = json.dumps({ "kind": timer.kind, "when": timer.when, "payload": timer.payload })
+        except TypeError as e:
+            return log.warning(f"Timer {timer.key} not persisted: {repr(e)}")
+        self._persist_soon()
+
+    def _unstore(self, *keys: str):
+        for key in keys:
+            self._dirty[key] = None
+        self._persist_soon()
+
+    def _persist_soon(self):
+        if not self._restored: return
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist())
+
+    async def _persist(self):
+        while self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            pipe = self.cache.pipeline(transaction=False)
+            for key, raw in dirty.items():
+                if raw is None: pipe.hdel(TIMER_CACHE_KEY, key)
+                else: pipe.hset(TIMER_CACHE_KEY, key, raw)
+            try: await pipe.execute()
+            except RedisError as e: log.warning(f"{len(dirty)} timer changes not persisted: {repr(e)}")
+
+    async def restore(self):
+        try:
+            stored = await self.cache.hgetall(TIMER_CACHE_KEY)
+        except RedisError as e:
+            return log.warning(f"Could not restore timers: {repr(e)}")
+        for key, raw in stored.items():
+            if key in self.timers or key in self._dirty: continue
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            timer = Timer(key, data['kind'], data['when'], data.get('payload'))
+            self.timers[key] = timer
+            heapq.heappush(self._heap, (timer.when, next(self._seq), timer))
+        log.debug(f"Restored {len(stored)} timers")
+
+    async def _run(self):
+        if not self._restored:
+            await self.restore()
+            self._restored = True
+            self._persist_soon()
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+                self._stale -= 1
+            delay = max(0, self._heap[0][0] - time()) if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError: pass
+            self._fire_due()
+
+    def _fire_due(self):
+        deadline = time() + self.tick / 2
+        batches: Dict[str, List[Timer]] = defaultdict(list)
+        while self._heap and self._heap[0][0] <= deadline:
+            _, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                self._stale -= 1
+                continue
+            self.timers.pop(timer.key, None)
+            batches[timer.kind].append(timer)
+        if not batches: return
+
+        self._unstore(*(t.key for batch in batches.values() for t in batch))
+
+        for kind, batch in batches.items():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                log.warning(f"No handler for {len(batch)} {kind} timers")
+                continue
+            asyncio.create_task(self._dispatch(kind, handler, batch))
+
+    async def _dispatch(self, kind: str, handler: Callable[[List[Timer]], Awaitable[Any]], batch: List[Timer]):
+        try:
+            await handler(batch)
+        except Exception as e:
+            log.error(f"Timer handler {kind} failed for {len(batch)} timers: {repr(e)}")
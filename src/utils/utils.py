@@ -19,14 +19,12 @@
 import uuid
 from datetime import datetime, timedelta, timezone
 from functools import partial
-from typing import Any, Dict, List, Tuple
-import asyncio
-import base64
-import re
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from utils.avatars import AvatarService
 
 from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
-import aiohttp
 import unicodedata
 
 from nextcord import Embed, Guild, Role, Interaction, Message, Member, RoleTags
@@ -192,59 +190,6 @@ def create_queue_embed(queue_users: List[MMBotQueueUsers]) -> Embed:
     embed.add_field(name=f"{len(queue_users)} in queue", value=f"{'\n'.join(message_lines)}\u2800")
     return embed
 
-async def fetch_avatar(session: aiohttp.ClientSession, cache, url: str, size: tuple):
-    cache_key = f'discord_avatar:{sanitize_url_for_redis(url)}'
-    cached_avatar = cache.get(cache_key)
-    if cached_avatar:
-        try:
-            image_data = base64.b64decode(cached_avatar)
-            image_buffer = BytesIO(image_data)
-            image_buffer.seek(0)
-            img = Image.open(image_buffer)
-            img.load()
-            return img
-        except Exception as e:
-            log.warning(f"Invalid cached avatar for {url}: {repr(e)}")
-            cache.delete(cache_key)
-    
-    try:
-        async with session.get(url.split('?')[0]) as resp:
-            if resp.status == 200:
-                avatar_data = await resp.read()
-                try:
-                    avatar = Image.open(BytesIO(avatar_data))
-                    avatar = avatar.convert('RGBA').resize(size, Image.LANCZOS)
-                    
-                    buffer = BytesIO()
-                    avatar.save(buffer, format="PNG")
-                    buffer.seek(0)
-                    cache.set(cache_key, base64.b64encode(buffer.getvalue()), ex=86400)  # Cache for 1 day
-                    
-                    return avatar
-                except Exception as e:
-                    log.error(f"Failed to process avatar from {url}: {e}")
-            else:
-                log.error(f"Failed to fetch avatar from {url}. Status: {resp.status}")
-    except Exception as e:
-        log.error(f"Error fetching avatar from {url}: {e}")
-    raise ValueError(f"Failed to fetch avatar from {url}")
-
-def sanitize_url_for_redis(url):
-    match = re.search(r'/(\d+)/([a-zA-Z0-9_-]+\.[a-zA-Z0-9]+)', url)
-    if match:
-        return f"{match.group(1)}:{match.group(2)}"
-    return url
-
-async def fetch_all_avatars(cache, guild, players, size):
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for player in players:
-            member = guild.get_member(player.user_id)
-            if member:
-                task = fetch_avatar(session, cache, str(member.display_avatar), size)
-                tasks.append(task)
-        return await asyncio.gather(*tasks)
-
 def create_gradient(width, height, start_color, end_color, horizontal=True):
     base = Image.new('RGBA', (width, height), start_color)
     top = Image.new('RGBA', (width, height), end_color)
@@ -276,7 +221,7 @@ async def log_moderation(interaction: Interaction, channel_id: int, title: str,
     embed.timestamp = datetime.now(timezone.utc)
     await log_channel.send(embed=embed)
 
-async def generate_score_image(cache, guild: Guild, match: MMBotMatches, match_stats: List[MMBotUserMatchStats]):
+async def generate_score_image(avatars: "AvatarService", guild: Guild, match: MMBotMatches, match_stats: List[MMBotUserMatchStats]):
     width, height = 800, 221
     img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
@@ -349,8 +294,8 @@ async def generate_score_image(cache, guild: Guild, match: MMBotMatches, match_s
 
     # Fetch all avatars concurrently
     avatar_size = (row_height - 2, row_height - 2)
-    team_a_avatars = await fetch_all_avatars(cache, guild, team_a, avatar_size)
-    team_b_avatars = await fetch_all_avatars(cache, guild, team_b, avatar_size)
+    all_avatars = await avatars.fetch_all(guild, [s.user_id for s in team_a + team_b], avatar_size)
+    team_a_avatars, team_b_avatars = all_avatars[:len(team_a)], all_avatars[len(team_a):]
 
     # Create large gradients for rows
     left_gradient = create_gradient(width, height, (*left_color[:3], 220), (*left_color[:3], 5))
@@ -23,6 +23,7 @@ import nextcord
 
 from matches import cleanup_match, get_match
 from utils.logger import Logger as log
+from utils.message_scheduler import Lane
 from utils.models import *
 
 
@@ -57,6 +58,9 @@ class AbandonView(nextcord.ui.View):
         
         log.info(f"{interaction.user.display_name} abandoned match {self.match.id}")
         await self.bot.store.add_match_abandons(guild.id, self.match.id, [interaction.user.id], [self.mmr_loss])
+        self.bot.leaderboard.invalidate(guild.id)
+        self.bot.stats_rollups.invalidate(guild.id, [p.user_id for p in instance.players])
+        self.bot.render_cache.invalidate_users(guild.id, [p.user_id for p in instance.players])
         asyncio.create_task(guild.get_channel(self.match.match_thread).send(f"@here Match Abandoned by {interaction.user.mention}{requeued_msg}"))
 
         embed = nextcord.Embed(
@@ -67,11 +71,12 @@ class AbandonView(nextcord.ui.View):
         asyncio.create_task(guild.get_channel(settings.mm_text_channel).send(embed=embed))
         
         try:
-            log_message = await guild.get_channel(settings.mm_log_channel).fetch_message(self.match.log_message)
-            embed = log_message.embeds[0]
+            log_channel = guild.get_channel(settings.mm_log_channel)
+            embed = (await self.bot.messages.embeds(log_channel, self.match.log_message))[0]
             embed.description = f"Match abandoned by {interaction.user.mention}"
-            await log_message.edit(embed=embed)
+            self.bot.messages.edit(log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
         except Exception: pass
+        self.bot.messages.forget(self.match.log_message)
         await interaction.followup.send("You abandoned the match", ephemeral=True)
     
     @nextcord.ui.button(
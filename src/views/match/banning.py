@@ -111,6 +111,8 @@ class BanView(nextcord.ui.View):
                 phase=match.phase)
             log.info(f"{interaction.user.name} wants to ban {banned_map}")
         
+        votes = len(user_bans) - 1 if banned_map in user_bans else len(user_bans) + 1
+        instance.machine.record_vote(match.phase, interaction.user.id, votes)
         await self.bot.debounce(self.update_bans_message, interaction, instance, match)
 
 
@@ -23,6 +23,7 @@ from matches.functions import calculate_mmr_change
 from config import PLACEMENT_MATCHES
 from utils.utils import abandon_cooldown, format_duration
 from utils.logger import Logger as log
+from utils.message_scheduler import Lane
 from utils.models import *
 
 class ForceAbandonView(nextcord.ui.View):
@@ -95,15 +96,18 @@ class ForceAbandonView(nextcord.ui.View):
                     log.info(f"{interaction.user.display_name} abandoned forcefully match {self.match.id} due to lates: {missing_mentions}")
 
                     await self.bot.store.add_match_abandons(interaction.guild.id, self.match.id, [p.user_id for p in self.missing_players], mmr_losses)
+                    self.bot.leaderboard.invalidate(interaction.guild.id)
+                    self.bot.stats_rollups.invalidate(interaction.guild.id)
+                    self.bot.render_cache.clear()
                     await interaction.guild.get_channel(self.match.match_thread).send(f"@here Match Abandoned by Staff")
 
                     log_channel = interaction.guild.get_channel(settings.mm_log_channel)
                     try:
-                        log_message = await log_channel.fetch_message(self.match.log_message)
-                        embed = log_message.embeds[0]
+                        embed = (await self.bot.messages.embeds(log_channel, self.match.log_message))[0]
                         embed.description = f"Match abandoned due to {missing_mentions} being late"
-                        await log_message.edit(embed=embed)
+                        self.bot.messages.edit(log_channel, self.match.log_message, Lane.CRITICAL, embed=embed)
                     except Exception: pass
+                    self.bot.messages.forget(self.match.log_message)
                     await interaction.followup.send("You successfully force abandoned the match", ephemeral=True)
                     self.abandoned = True
         
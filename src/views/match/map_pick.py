@@ -99,6 +99,7 @@ class MapPickView(nextcord.ui.View):
                 map=picked_map)
             log.info(f"{interaction.user.display_name} voted to pick {picked_map}")
         
+        instance.machine.record_vote(match.phase, interaction.user.id, 0 if picked_map in user_picks else 1)
         await self.bot.debounce(self.update_picks_message, interaction, instance, match)
 
 
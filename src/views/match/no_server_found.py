@@ -20,6 +20,7 @@ import asyncio
 import nextcord
 
 from utils.logger import Logger as log
+from utils.message_scheduler import Lane
 from utils.models import *
 from matches.match_states import MatchState
 
@@ -67,12 +68,12 @@ class NoServerFoundView(nextcord.ui.View):
         match = await self.bot.store.get_match(self.match_id)
         log_channel = interaction.guild.get_channel(settings.mm_log_channel)
         try:
-            log_message = await log_channel.fetch_message(match.log_message)
-            embed = log_message.embeds[0]
+            embed = (await self.bot.messages.embeds(log_channel, match.log_message))[0]
             embed.description = f"Match terminated by {interaction.user.mention}"
-            await log_message.edit(embed=embed)
+            self.bot.messages.edit(log_channel, match.log_message, Lane.CRITICAL, embed=embed)
         except Exception:
             pass
+        self.bot.messages.forget(match.log_message)
         await interaction.followup.send("Match terminated", ephemeral=True)
         log.info(f"{interaction.user.display_name} terminated match {self.match_id}")
         self.done_event.set()
\ No newline at end of file
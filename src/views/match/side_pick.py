@@ -98,6 +98,7 @@ class SidePickView(nextcord.ui.View):
                 side=pick)
             log.info(f"{interaction.user.display_name} voted for {pick}")
         
+        instance.machine.record_vote(match.phase, interaction.user.id, 0 if pick in (p.name for p in user_picks) else 1)
         await self.bot.debounce(self.update_side_message, interaction, match)
 
 
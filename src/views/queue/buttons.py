@@ -104,10 +104,12 @@ class QueueButtonsView(nextcord.ui.View):
         return instance
     
     async def update_queue_message(self, interaction: nextcord.Interaction):
-        queue_users = await self.bot.store.get_queue_users(interaction.channel.id)
+        queue_users = self.bot.queue_manager.queued_users(interaction.channel.id)
         asyncio.create_task(self.bot.queue_manager.update_presence(len(queue_users)))
         if not ((msg := interaction.message) and msg.embeds): return
-        await interaction.edit(embeds=[interaction.message.embeds[0], create_queue_embed(queue_users)])
+        embeds = [msg.embeds[0], create_queue_embed(queue_users)]
+        self.bot.messages.store(msg.id, embeds)
+        await interaction.edit(embeds=embeds)
 
     async def ready_callback(self, interaction: nextcord.Interaction):
         lock_id = f'{interaction.channel.id}'
@@ -115,30 +117,26 @@ class QueueButtonsView(nextcord.ui.View):
             self.ready_lock[lock_id] = asyncio.Lock()
         
         settings = await self.bot.settings_cache(interaction.guild.id)
-        user_platforms = await self.bot.store.get_user_platforms(interaction.guild.id, interaction.user.id)
-        if not user_platforms:
+        queue_manager = self.bot.queue_manager
+        verified, registered, region = await queue_manager.get_eligibility(interaction.guild.id, interaction.user.id)
+        if not verified:
             return await interaction.response.send_message("Verify with at least one platform.", ephemeral=True)
         
-        in_queue = False
         if not settings:
             return await interaction.response.send_message("Settings not found.", ephemeral=True)
         
-        user = await self.bot.store.get_user(interaction.guild.id, interaction.user.id)
-        if not user:
+        if not registered:
             return await interaction.response.send_message("You are not registered.", ephemeral=True)
-        if not user.region:
+        if not region:
             return await interaction.response.send_message("You must select your region.", ephemeral=True)
         
-        blocked_users = await self.bot.store.get_user_blocks(interaction.guild.id)
-        blocked_user = next((u for u in blocked_users if u.user_id == user.user_id), None)
-        if blocked_user:
+        if blocked_until := queue_manager.blocked_until(interaction.user.id):
             return await interaction.response.send_message(
-                f"You will be unblocked from this queue <t:{int(blocked_user.expiration.timestamp())}:R>", ephemeral=True)
+                f"You will be unblocked from this queue <t:{int(blocked_until.timestamp())}:R>", ephemeral=True)
         
-        in_match = await self.bot.store.is_user_in_match(interaction.user.id)
-        if in_match:
+        if await queue_manager.is_in_match(interaction.user.id):
             return await interaction.response.send_message("Your current match has not ended yet.", ephemeral=True)
-        previous_abandons, last_abandon = await self.bot.store.get_abandon_count_last_period(interaction.guild.id, interaction.user.id)
+        previous_abandons, last_abandon = await queue_manager.get_abandons(interaction.guild.id, interaction.user.id)
         cooldown = abandon_cooldown(previous_abandons, last_abandon)
         if cooldown > 0:
             embed = nextcord.Embed(
@@ -151,26 +149,25 @@ class QueueButtonsView(nextcord.ui.View):
         expiry = int(datetime.now(timezone.utc).timestamp()) + 60 * int(periods[slot_id][1])
         
         async with self.ready_lock[f'{interaction.channel.id}']:
-            queue_users = await self.bot.store.get_queue_users(interaction.channel.id)
-            total_in_queue = len(queue_users)
-            if total_in_queue + 1 > MATCH_PLAYER_COUNT:
+            in_queue = interaction.user.id in queue_manager.active_users
+            queue_users = [user_id for user_id in queue_manager.active_users if user_id != interaction.user.id]
+            total_in_queue = len(queue_manager.active_users)
+            if not in_queue and total_in_queue + 1 > MATCH_PLAYER_COUNT:
                 log.info(f"{interaction.user.display_name} wanted to queue but was overtaken")
                 return await interaction.response.send_message("Someone else just got in.\nBetter luck next time", ephemeral=True)
-            self.bot.queue_manager.add_user(interaction.user.id, expiry)
-            in_queue = await self.bot.store.upsert_queue_user(
-                user_id=interaction.user.id, 
-                guild_id=interaction.guild.id, 
-                queue_channel=interaction.channel.id, 
-                queue_expiry=expiry)
+            queue_manager.queue_user(interaction.guild.id, interaction.channel.id, interaction.user.id, expiry)
             if not in_queue:
                 total_in_queue += 1
-                asyncio.create_task(self.bot.queue_manager.notify_queue_count(interaction.guild.id, settings, total_in_queue))
+                asyncio.create_task(queue_manager.notify_queue_count(interaction.guild.id, settings, total_in_queue))
             log.info(f"{interaction.user.display_name} has queued up")
             
             if total_in_queue == MATCH_PLAYER_COUNT:
-                self.bot.queue_manager.remove_user(interaction.user.id)
-                for user in queue_users: self.bot.queue_manager.remove_user(user.user_id)
+                self.bot.server_choices.hold_roster(queue_users + [interaction.user.id])
+                queue_manager.remove_user(interaction.user.id)
+                for user_id in queue_users: queue_manager.remove_user(user_id)
+                queue_manager.hold_match_players(queue_users + [interaction.user.id])
 
+                await queue_manager.flush()
                 match_id = await self.bot.store.unqueue_add_match_users(settings, interaction.channel.id)
                 await self.bot.debounce(self.update_queue_message, interaction)
                 loop = asyncio.get_event_loop()
@@ -179,30 +176,24 @@ class QueueButtonsView(nextcord.ui.View):
         await self.bot.debounce(self.update_queue_message, interaction, _delay=2.)
     
     async def unready_callback(self, interaction: nextcord.Interaction):
-        if not await self.bot.store.in_queue(interaction.guild.id, interaction.user.id):
+        if interaction.user.id not in self.bot.queue_manager.active_users:
             return await interaction.response.send_message("You are not queued up",ephemeral=True)
-        self.bot.queue_manager.remove_user(interaction.user.id)
-        await self.bot.store.unqueue_user(interaction.channel.id, interaction.user.id)
+        self.bot.queue_manager.unqueue_user(interaction.channel.id, interaction.user.id)
         log.info(f"{interaction.user.display_name} has left queue")
         await self.bot.debounce(self.update_queue_message, interaction)
     
     async def stats_callback(self, interaction: nextcord.Interaction):
         user = interaction.user
-        summary_stats = await self.bot.store.get_user_summary_stats(interaction.guild.id, user.id)
-        if not summary_stats:
+        rollup, ranking, ranks = await self.bot.stats_rollups.get(interaction.guild, user.id)
+        if not rollup:
             return await interaction.response.send_message(f"No stats found for {user.mention}.", ephemeral=True)
 
-        recent_matches = await self.bot.store.get_recent_match_stats(interaction.guild.id, user.id, 10)
-        avg_stats = await self.bot.store.get_avg_stats_last_n_games(interaction.guild.id, user.id, 10)
-        leaderboard = await self.bot.store.get_leaderboard(interaction.guild.id)
-        ranks = await self.bot.store.get_ranks(interaction.guild.id)
-        user_data = await self.bot.store.get_user(interaction.guild.id, user.id)
-        embed = create_stats_embed(interaction.guild, user, user_data, leaderboard, summary_stats, avg_stats, recent_matches, ranks)
+        embed = create_stats_embed(interaction.guild, user, rollup.user, ranking, rollup.summary, rollup.avg_stats, rollup.recent, ranks)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
     
     async def lfg_callback(self, interaction: nextcord.Interaction):
-        if not await self.bot.store.in_queue(interaction.guild.id, interaction.user.id):
+        if interaction.user.id not in self.bot.queue_manager.active_users:
             return await interaction.response.send_message("You must be in queue to ping",ephemeral=True)
         
         settings = await self.bot.settings_cache(interaction.guild.id)
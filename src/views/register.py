@@ -49,8 +49,7 @@ class MMHideView(nextcord.ui.View):
         try: await self.hide_msg.delete()
         except: pass
         await interaction.user.remove_roles(self.verified_role)
-        self.bot.queue_manager.remove_user(interaction.user.id)
-        await self.bot.store.unqueue_user(interaction.channel.id, interaction.user.id)
+        self.bot.queue_manager.unqueue_user(interaction.channel.id, interaction.user.id)
 
     @nextcord.ui.button(label="Cancel", style=nextcord.ButtonStyle.grey)
     async def do_not_hide_mm(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
@@ -80,6 +79,8 @@ class RegionSelect(nextcord.ui.Select):
             guild_id=interaction.guild.id, 
             user_id=interaction.user.id, 
             region=self.values[0])
+        self.bot.queue_manager.invalidate_user(interaction.user.id)
+        self.bot.render_cache.invalidate_users(interaction.guild.id, [interaction.user.id])
         await self.bot.store.upsert(MMBotUserSummaryStats, 
             guild_id=interaction.guild.id, 
             user_id=interaction.user.id)